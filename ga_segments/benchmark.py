@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+""" Benchmark of the throughput and the quality of GA_segments and NC.
+
+The results are written in the schemas of results/experiments, so they can be compared with the stored baselines:
+the evolution of each centroid as 'time, fitness' (see 'save_time' of 'GA_segments') and the classification as
+'dataset,batch_size,classes,error,inertia,tiempo'. A summary with the DTW calls and generations per second and the peak
+memory of each run is also written. The DTW calls are those counted by the DTW functions ('dtw.counters'), so the
+distances abandoned or skipped by the lower bounds are not counted. The lengths and the fitness are given per element
+of the series, so datasets of series of different lengths ('SeriesSet') are also measured; of them, only the DTW,
+since GA_segments needs series of the same length.
+
+Example::
+
+    python -m ga_segments.benchmark --data data/50words_TRAIN --synthetic --out results/benchmark
+"""
+import argparse
+import csv
+import os
+import random
+import time
+
+import numpy as np
+
+from .ga import GA_segments
+from .nc import NC
+from .segmentsf import dtw
+from .segmentsf.dataset import SeriesSet, load_ucr
+
+
+NC_FIELDS = ['dataset', 'batch_size', 'classes', 'error', 'inertia', 'tiempo']
+SUMMARY_FIELDS = ['dataset', 'case', 'series', 'length', 'generations', 'time', 'gens_per_s', 'dtw_calls',
+                  'dtw_calls_per_s', 'predict_time', 'predict_dtw_calls', 'predict_dtw_calls_per_s', 'peak_rss_mb',
+                  'fitness', 'error']
+
+
+def cbf(n=30, length=128, seed=0):
+    """ Function that generates the synthetic dataset Cylinder-Bell-Funnel (Saito, 1994): three classes of series with
+    a plateau, an increasing ramp or a decreasing ramp of random position and length, plus gaussian noise.
+
+    :param n: Number of series of each class.
+    :param length: Length of the series.
+    :param seed: Seed of the generator.
+
+    :return: Series (2-D array).
+    :return: Classes (1, 2 or 3).
+    """
+    rng = np.random.RandomState(seed)
+    t = np.arange(length)
+    X, y = [], []
+    for c in (1, 2, 3):
+        for _ in range(n):
+            a = rng.randint(length // 8, length // 4)
+            b = a + rng.randint(length // 4, 3 * length // 4)
+            inside = (t >= a) & (t <= b)
+            if c == 1:
+                shape = inside * 1.
+            elif c == 2:
+                shape = inside * (t - a) / float(b - a)
+            else:
+                shape = inside * (b - t) / float(b - a)
+            X.append((6 + rng.normal()) * shape + rng.normal(size=length))
+            y.append(c)
+    return np.array(X), np.array(y, dtype=np.float64)
+
+
+def lengths(X):
+    """ Function that returns the length of each series of X (2-D array or 'SeriesSet'). """
+    if isinstance(X, SeriesSet):
+        return X.lengths()
+    return np.full(len(X), np.shape(X)[1])
+
+
+def take(X, idx):
+    """ Function that returns the series of X (2-D array or 'SeriesSet') of the indexes idx, in the type of X. """
+    if isinstance(X, SeriesSet):
+        return X.take(idx)
+    return X[idx]
+
+
+def split(X, y, test_size=0.3, seed=0):
+    """ Function that splits a dataset in a train and a test set, with the same proportion of each class.
+
+    :return: X_train, y_train, X_test, y_test.
+    """
+    rng = np.random.RandomState(seed)
+    test = np.zeros(len(y), dtype=bool)
+    for c in np.unique(y):
+        idx = np.flatnonzero(y == c)
+        test[rng.permutation(idx)[:int(round(test_size * len(idx)))]] = True
+    train, test = np.flatnonzero(~test), np.flatnonzero(test)
+    return take(X, train), y[train], take(X, test), y[test]
+
+
+def peak_rss():
+    """ Peak resident memory (MB) of the process and of its finished children until now, or nan if it is not
+    available. It never decreases, so the peak of a run is only exact if it is the first one of the process.
+    """
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return kb / 1024.
+
+
+def seed_all(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def measure(function, *args):
+    """ Function that calls function(*args) and measures it.
+
+    :return: Result of the call.
+    :return: Time of the call.
+    :return: DTW distances calculated during the call (see 'dtw.counters'), including those of the worker processes
+    of the genetic algorithm and of 'NC.fit'.
+    """
+    calls = dtw.counters['calls']
+    t = time.time()
+    result = function(*args)
+    return result, time.time() - t, dtw.counters['calls'] - calls
+
+
+def bench_dtw(S, window=None, constraint='sakoe_chiba', repeat=3):
+    """ Function that measures the DTW distances per second of the native library, as the best of repeat runs of
+    'dtw.dtw_batch' of each series of S against the whole set. If the series of S have different lengths, the distances
+    are calculated by 'dtw.dtw_cdist' in a single thread.
+
+    :return: Distances per second.
+    """
+    if not isinstance(S, SeriesSet):
+        S = np.ascontiguousarray(S, dtype=np.float64)
+    best = np.inf
+    for _ in range(repeat):
+        t = time.time()
+        if isinstance(S, SeriesSet):
+            dtw.dtw_cdist(S, S, window, constraint, n_jobs=1)
+        else:
+            for x in S:
+                dtw.dtw_batch(x, S, window=window, constraint=constraint)
+        best = min(best, time.time() - t)
+    return len(S) * len(S) / best
+
+
+def bench_ga(name, S, params_ga, seed=0):
+    """ Function that calculates the centroid of S with GA_segments and measures it.
+
+    :param name: Name of the case.
+    :param S: Set of series.
+    :param params_ga: Parameters of 'GA_segments'. save_time is activated.
+    :param seed: Seed of the random generators.
+
+    :return: Row of the summary. The length is the mean length of the series, and the fitness is divided by the sum of
+    the lengths.
+    :return: Evolution of the fitness of the best individual (list of dictionaries with 'time' and 'fitness').
+    """
+    seed_all(seed)
+    ga = GA_segments(**dict(params_ga, save_time=True))
+    (_, fitness, log), elapsed, calls = measure(ga.calculate_centroids, S)
+
+    generations = log[-1]['gen']
+    row = {
+        'case': name,
+        'series': len(S),
+        'length': np.mean(lengths(S)),
+        'generations': generations,
+        'time': elapsed,
+        'gens_per_s': generations / elapsed,
+        'dtw_calls': calls,
+        'dtw_calls_per_s': calls / elapsed,
+        'peak_rss_mb': peak_rss(),
+        'fitness': fitness / np.sum(lengths(S)),
+    }
+    return row, ga.timesg
+
+
+def bench_nc(name, X_train, y_train, X_test, y_test, params_ga, seed=0, **params_nc):
+    """ Function that fits NC with the train set and classifies the test set.
+
+    :param name: Name of the case.
+    :param params_ga: Parameters of 'GA_segments'.
+    :param seed: Seed of NC.
+    :param params_nc: Other parameters of NC.
+
+    :return: Row of the summary. The fitness is the inertia of NC divided by the sum of the lengths of the series.
+    The time and the DTW calls are those of the fit, and those of the classification of the test set are given in the
+    columns predict_*.
+    """
+    seed_all(seed)
+    nc = NC(params_ga=params_ga, seed=seed, **params_nc)
+    _, elapsed, calls = measure(nc.fit, X_train, y_train)
+    labels, elapsed_predict, calls_predict = measure(nc.predict, X_test)
+
+    row = {
+        'case': name,
+        'series': len(X_train),
+        'length': np.mean(lengths(X_train)),
+        'time': elapsed,
+        'dtw_calls': calls,
+        'dtw_calls_per_s': calls / elapsed,
+        'predict_time': elapsed_predict,
+        'predict_dtw_calls': calls_predict,
+        'predict_dtw_calls_per_s': calls_predict / elapsed_predict,
+        'peak_rss_mb': peak_rss(),
+        'fitness': nc.inertia / np.sum(lengths(X_train)),
+        'error': 1. - np.mean(labels == y_test),
+    }
+    return row
+
+
+def write_trace(path, trace):
+    """ Function that writes the evolution of the fitness in the schema 'time, fitness' of results/experiments.
+    """
+    with open(path, 'w') as f:
+        f.write('time, fitness\n')
+        for point in trace:
+            f.write('{:.5f}, {:.5f}\n'.format(point['time'], point['fitness']))
+
+
+def write_rows(path, fields, rows):
+    """ Function that writes the rows (dictionaries) in a CSV file with the given columns.
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def datasets(paths, synthetic=True, seed=0):
+    """ Datasets of the benchmark: CBF if synthetic is True and the UCR files of paths. If the file NAME_TEST exists
+    next to NAME_TRAIN, it is the test set, otherwise the file is split.
+
+    :return: List of tuples (name, X_train, y_train, X_test, y_test).
+    """
+    result = []
+    if synthetic:
+        X, y = cbf(seed=seed)
+        result.append(('CBF',) + split(X, y, seed=seed))
+    for path in paths:
+        name = os.path.basename(path)
+        X, y = load_ucr(path)
+        if name.endswith('_TRAIN') and os.path.exists(path[:-len('_TRAIN')] + '_TEST'):
+            result.append((name[:-len('_TRAIN')], X, y) + load_ucr(path[:-len('_TRAIN')] + '_TEST'))
+        else:
+            result.append((name[:-len('_TRAIN')] if name.endswith('_TRAIN') else name,) + split(X, y, seed=seed))
+    return result
+
+
+def run(paths, out, synthetic=True, batch_sizes=(0.1,), params_ga=None, seed=0, verbose=True):
+    """ Function that runs the benchmark and writes its results in the directory out: NAME_BATCH_segments.csv with the
+    evolution of the centroid of the train set of each dataset ('full' if the whole set is evaluated), segmentsNC.csv
+    with the classification and summary.csv with the measures of every run.
+
+    :param paths: Files of the UCR archive.
+    :param out: Directory of the results.
+    :param synthetic: If True, the synthetic dataset CBF is also used.
+    :param batch_sizes: Values of batch_size of GA_segments. The whole set (batch_evaluate = False) is always used.
+    :param params_ga: Parameters of 'GA_segments' common to all the runs.
+    :param seed: Seed of the datasets and of the random generators.
+
+    :return: Rows of the summary.
+    """
+    params_ga = dict(params_ga or {})
+    if not os.path.isdir(out):
+        os.makedirs(out)
+
+    summary = []
+    nc_rows = []
+    for name, X_train, y_train, X_test, y_test in datasets(paths, synthetic, seed):
+        sample = take(X_train, np.arange(min(50, len(X_train))))
+        summary.append({'dataset': name, 'case': 'dtw', 'series': len(sample), 'length': np.mean(lengths(sample)),
+                        'dtw_calls_per_s': bench_dtw(sample)})
+
+        # GA_segments calculates centroids of series of the same length
+        if len(np.unique(lengths(X_train))) > 1:
+            if verbose:
+                print(name, 'series of different lengths: only the DTW is measured')
+            continue
+
+        for batch in (None,) + tuple(batch_sizes):
+            params = dict(params_ga, batch_evaluate=batch is not None, batch_size=batch or 0.1)
+            case = 'full' if batch is None else str(batch)
+
+            row, trace = bench_ga('ga ' + case, X_train, params, seed)
+            row['dataset'] = name
+            summary.append(row)
+            write_trace(os.path.join(out, '{}_{}_segments.csv'.format(name, case)), trace)
+
+            row = bench_nc('nc ' + case, X_train, y_train, X_test, y_test, params, seed)
+            row['dataset'] = name
+            summary.append(row)
+            nc_rows.append({'dataset': name, 'batch_size': case, 'classes': len(np.unique(y_train)),
+                            'error': row['error'], 'inertia': row['fitness'], 'tiempo': row['time']})
+
+            if verbose:
+                print(name, case, 'ga: {:.1f} s'.format(summary[-2]['time']),
+                      'nc: {:.1f} s, error {:.4f}'.format(row['time'], row['error']))
+
+    write_rows(os.path.join(out, 'segmentsNC.csv'), NC_FIELDS, nc_rows)
+    write_rows(os.path.join(out, 'summary.csv'), SUMMARY_FIELDS, summary)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of GA_segments and NC.')
+    parser.add_argument('--data', nargs='*', default=[], help='Files of the UCR archive.')
+    parser.add_argument('--synthetic', action='store_true', help='Use the synthetic dataset CBF.')
+    parser.add_argument('--out', default='benchmark', help='Directory of the results.')
+    parser.add_argument('--batch-sizes', nargs='*', type=float, default=[0.1])
+    parser.add_argument('--pop-size', type=int, default=50)
+    parser.add_argument('--ngen', type=int, default=50)
+    parser.add_argument('--distance', default='dtw')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not args.data and not args.synthetic:
+        parser.error('no dataset given (--data or --synthetic)')
+
+    params_ga = {'pop_size': args.pop_size, 'ngen': args.ngen, 'distance': args.distance}
+    run(args.data, args.out, args.synthetic, args.batch_sizes, params_ga, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import time
-import multiprocessing
 
 from deap import base
 from deap import creator
@@ -12,6 +11,17 @@ import numpy as np
 import random
 
 
+def create_types():
+    """Function that creates the types of the fitness and of the individuals in the module 'deap.creator'. The types
+    are global to the process, so they are only created if they do not exist yet: several GAs can be run in the same
+    process, and each process of a pool creates its own types.
+    """
+    if not hasattr(creator, 'FitnessMin'):
+        creator.create('FitnessMin', base.Fitness, weights=(-1.0,))
+    if not hasattr(creator, 'Individual') or not issubclass(creator.Individual, individual.SeriesArray):
+        creator.create('Individual', individual.SeriesArray, fitness=creator.FitnessMin)
+
+
 class GA_segments:
     """Class that contains the function of the genetic algorithm to calculate the center of a set of series using DTW as a
     measure of distance.
@@ -25,8 +35,24 @@ class GA_segments:
                  selparams=None,
                  batch_evaluate=False,
                  batch_size=0.1,
+                 coreset_evaluate=False,
+                 coreset_params=None,
                  verbose=False,
                  multi_jobs=False,
+                 n_jobs=None,
+                 distance='dtw',
+                 window=None,
+                 cache_size=100000,
+                 early_abandon=False,
+                 warm_params=None,
+                 precision='float64',
+                 multiscale=False,
+                 multiscale_params=None,
+                 stop_params=None,
+                 align_params=None,
+                 memetic=False,
+                 memetic_params=None,
+                 observers=None,
                  save_time=False):
         """
         :param pop_size: Population size.
@@ -36,8 +62,66 @@ class GA_segments:
         :param batch_evaluate: This parameter indicate if the fitness is calculated with batches or not.
         :param batch_size: Proportion of the dataset used as batch in the fitness evaluation in each generation. Only
         used if batch_evaluate = True. The range of this parameter is (0, 1].
+        :param coreset_evaluate: If True, the fitness is calculated w.r.t. a representative subset of the dataset that
+        grows as the population converges (see 'coreset.Coreset'). At the end, the individuals of the hall of fame are
+        ranked w.r.t. the whole dataset. If True, batch_evaluate is ignored.
+        :param coreset_params: Parameters of 'coreset.Coreset': initial size, growth, patience, tol and n_segments.
         :param verbose: Verbosity level.
-        :param multi_jobs: If True, the evolution process use all cores. If False use one core.
+        :param multi_jobs: If True, the fitness of the population is evaluated in parallel by a pool of processes. If
+        False use one core.
+        :param n_jobs: Number of processes used when multi_jobs = True. If None, all cores are used.
+        :param distance: Distance used in the fitness and in the alignment of the crossover. It can be 'dtw',
+        'sakoe_chiba' or 'itakura' (DTW constrained to a window of that shape) or 'fastdtw'.
+        :param window: Radius of the window of 'sakoe_chiba' and 'itakura', in samples (int) or as a fraction of the
+        length of the series (float). For 'fastdtw' it is the fraction used to calculate the radius. Not used by 'dtw'.
+        If None, the default of the distance is used: 0.1 for 'sakoe_chiba' and 'itakura' and 0.01 for 'fastdtw' (see
+        'dtw.WINDOWS').
+        :param cache_size: Maximum number of fitness values kept in the cache, so that an individual is not evaluated
+        twice w.r.t. the same subset of series. If 0 or None, the cache is not used.
+        :param early_abandon: If True, the evaluation of an offspring is abandoned as soon as its fitness exceeds the
+        worst fitness of the individuals selected as parents in the generation, since it would hardly survive the next
+        selection. Its fitness is then a lower bound greater than that fitness, so it is worse than the best fitness
+        and it is kept out of the hall of fame. Not used with batch_evaluate, where the population is evaluated w.r.t. a
+        different batch in each generation.
+        :param warm_params: Parameters of the warm start of 'calculate_centroids': 'ngen', generations of the
+        evolution, and 'old_size', number of old series evaluated for each new series.
+        :param precision: Precision of the DTW of the fitness, 'float64' or 'float32' (see 'dtw.PRECISIONS'). With
+        'float32' the normalized series are stored in float32 and the fitness is calculated by the float32 kernel,
+        which is faster but has rounding errors. Not used by 'fastdtw'.
+        :param multiscale: If True, the population first evolves on the PAA of the series (see 'coreset.paa') at coarser
+        lengths, and the best individuals of each level, interpolated to the next length, start the evolution of the
+        next level, up to the full length. Since the cost of DTW is quadratic, the generations of the coarse levels are
+        much cheaper. Not used with the warm start.
+        :param multiscale_params: Parameters of the multiscale evolution: 'levels', number of levels including the full
+        length, 'factor', ratio between the lengths of two consecutive levels, 'min_length', minimum length of a
+        level (shorter levels are skipped), and 'final_ngen', proportion of the generations at the full length. The
+        other generations are divided among the coarse levels.
+        :param stop_params: Criteria that stop the evolution before ngen generations: 'time', budget in seconds of the
+        evolution of 'calculate_centroids', 'stall', number of generations without a relative improvement greater
+        than 'tol' of the best fitness of the hall of fame, and 'target', fitness at which the centroid is good enough.
+        None disables a criterion. The fitness is the one used by the evolution, i.e. w.r.t. the normalized series
+        (and w.r.t. the subset with coreset_evaluate or batch_evaluate). With multiscale, 'stall' ends each level and
+        'target' only applies to the full length.
+        :param align_params: Parameters of the alignment of the crossover (see 'alignment.Aligner'): 'cache_size',
+        number of alignments of pairs of parents kept, so they are not computed again if the pair mates again (0 or
+        None to not keep them), and 'window', radius of the band of the alignment with 'dtw' and 'fastdtw' (None for
+        the unconstrained alignment). The constrained distances align with their own window.
+        :param memetic: If True, the best individuals of the population are refined with DTW Barycenter Averaging (see
+        'dba.refine') every few generations, w.r.t. the series with which the population is evaluated. A refined
+        individual replaces the original one only if its fitness is better.
+        :param memetic_params: Parameters of the refinement: 'interval', generations between two refinements, 'k',
+        number of individuals refined, and 'n_iter', iterations of DBA applied to each one.
+        :param observers: Functions called by 'ag' at the end of each generation with a dictionary: the record of the
+        logbook, 'times', time in seconds of each phase of the generation ('select', 'clone', 'mate', 'mutate',
+        'evaluate', 'halloffame', 'stats' and, if they are used, 'refine', 'reevaluate' and 'measure'), 'time', total
+        time of the generation, 'dtw_calls' and 'dtw_cells', DTW distances and cells of their cost matrices calculated
+        in the generation (see 'dtw.counters'), including those of the workers, and, if the alignments of the crossover
+        are kept (see align_params), 'align_hits' and 'align_misses', alignments of pairs of parents found in and added
+        to the cache in the generation. E.g. 'profiling.JSONLinesWriter' exports them to a file. They must be
+        picklable to be used by the island model.
+        :param save_time: If True, the time and the fitness of the best individual w.r.t. the original series are stored
+        in timesg every few generations (the time of the measures is not included). The fitness is only calculated
+        again when the best individual changes.
         """
         self.pop_size = pop_size
         self.ngen = ngen
@@ -47,6 +131,15 @@ class GA_segments:
         self.batch_size = batch_size
         self.verbose = verbose
         self.multi_jobs = multi_jobs
+        self.n_jobs = n_jobs
+        self.distance = distance
+        self.window = dtw.default_window(distance, window)
+        self.cache_size = cache_size
+        self.cache = None
+        self.early_abandon = early_abandon
+        self.precision = precision
+        dtw.precision_dtype(precision)
+        self.multiscale = multiscale
         self.save_time = save_time
 
         if mutparams is None:
@@ -66,23 +159,89 @@ class GA_segments:
         else:
             self.selparams = selparams
 
+        self.coreset_evaluate = coreset_evaluate
+        if coreset_params is None:
+            self.coreset_params = {
+                'size': 0.05,
+                'growth': 2.,
+                'patience': 5,
+                'tol': 1e-3,
+                'n_segments': 16,
+            }
+        else:
+            self.coreset_params = coreset_params
+
+        if warm_params is None:
+            self.warm_params = {
+                'ngen': 20,
+                'old_size': 1.,
+            }
+        else:
+            self.warm_params = warm_params
+
+        if multiscale_params is None:
+            self.multiscale_params = {
+                'levels': 3,
+                'factor': 2,
+                'min_length': 16,
+                'final_ngen': 0.25,
+            }
+        else:
+            self.multiscale_params = multiscale_params
+
+        if stop_params is None:
+            self.stop_params = {
+                'time': None,
+                'stall': None,
+                'tol': 0.,
+                'target': None,
+            }
+        else:
+            self.stop_params = stop_params
+        self.deadline = None
+        self.stop_reason = None
+
+        if align_params is None:
+            self.align_params = {
+                'cache_size': 10000,
+                'window': None,
+            }
+        else:
+            self.align_params = align_params
+
+        self.memetic = memetic
+        if memetic_params is None:
+            self.memetic_params = {
+                'interval': 10,
+                'k': 1,
+                'n_iter': 1,
+            }
+        else:
+            self.memetic_params = memetic_params
+
+        self.observers = list(observers) if observers else []
+        self.profiler = profiling.Profiler()
+
     def varAnd(self, population, toolbox):
         """The population is modified by applying, in the first place, the crossing function. Then the mutation is applied.
          The modified population is returned.
         """
-        offspring = [toolbox.clone(ind) for ind in population]
+        with self.profiler.phase('clone'):
+            offspring = [toolbox.clone(ind) for ind in population]
 
         # Apply crossover and mutation on the offspring
-        for i in range(1, len(offspring), 2):
-            if random.random() < self.cxpb:
-                offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1],
-                                                              offspring[i])
-                del offspring[i - 1].fitness.values, offspring[i].fitness.values
-
-        for i in range(len(offspring)):
-            if random.random() < self.mutpb:
-                offspring[i], = toolbox.mutate(offspring[i])
-                del offspring[i].fitness.values
+        with self.profiler.phase('mate'):
+            for i in range(1, len(offspring), 2):
+                if random.random() < self.cxpb:
+                    offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1],
+                                                                  offspring[i])
+                    del offspring[i - 1].fitness.values, offspring[i].fitness.values
+
+        with self.profiler.phase('mutate'):
+            for i in range(len(offspring)):
+                if random.random() < self.mutpb:
+                    offspring[i], = toolbox.mutate(offspring[i])
+                    del offspring[i].fitness.values
 
         return offspring
 
@@ -102,11 +261,14 @@ class GA_segments:
         it is modified by the function 'varAnd'. Finally, new individuals are reevaluated (those who have an
         invalid fitness), in case of an evaluation without subsets. In the case of an evaluation with subsets, all
         individuals will be taken as if they had invalid fitness for all to be reevaluated. Once this process is
-        finished, the next generation begins.
+        finished, the next generation begins. In the case of an evaluation with a coreset, the subset only changes when
+        it grows, and then the whole population and the hall of fame are reevaluated.
 
         :param population: List of individuals.
         :param S: Lista de series de las cuáles se calcula el centroide.
         :param toolbox: Object of the class 'deap.base.Toolbox' that contains the operators of mutation, crossover, etc.
+        The function 'evaluate_population(individuals, idx)' evaluates a group of individuals w.r.t. the series of S
+        given by the indexes idx (all of them if idx is None).
         :param stats: Object of the class 'deap.tools.Statistics' that conatins stats about the evolutionary process.
         :param halloffame: Object of the class 'deap.tools.HallOfFame' that contains the best individuals obtained in
         the evolutionary process.
@@ -115,7 +277,9 @@ class GA_segments:
         :return Object of the class 'deap.tools.Logbook' with information about the evolutionary process.
         """
         logbook = tools.Logbook()
-        logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+        logbook.header = ['gen', 'nevals'] + (['hits', 'misses'] if self.cache is not None else []) + \
+            (['subset'] if self.coreset_evaluate else []) + (['abandoned'] if self._abandons() else []) + \
+            (['refined'] if self.memetic else []) + (stats.fields if stats else [])
 
         if self.save_time:
             step = int(0.05 / self.batch_size)
@@ -123,82 +287,147 @@ class GA_segments:
                 step = 1
             tmedida = 0
             self.timesg = []
+            measure = {}
 
-        if self.batch_evaluate:
+        core = None
+        if self.coreset_evaluate:
+            core = coreset.Coreset(S, **self.coreset_params)
+        elif self.batch_evaluate:
             batch_n = int(self.batch_size*len(S))
             if batch_n < 1:
                 batch_n = 1
 
-        if not self.batch_evaluate:
+        if core is not None:
+            invalid_ind = [ind for ind in population if not ind.fitness.valid]
+            S_selection = core.subset()
+        elif not self.batch_evaluate:
             invalid_ind = [ind for ind in population if not ind.fitness.valid]
-            S_selection = S
+            S_selection = None
         else:
             invalid_ind = [ind for ind in population]
-            S_selection = random.sample(S, batch_n)
+            S_selection = random.sample(range(len(S)), batch_n)
 
-        for ind in invalid_ind:
-            ind.fitness.values = toolbox.evaluate(ind, S_selection)
+        start = self._start_generation(toolbox)
+        counters = self._cache_counters()
+        with self.profiler.phase('evaluate'):
+            fitnesses = toolbox.evaluate_population(invalid_ind, S_selection)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
 
         if halloffame is not None:
-            halloffame.update(population)
+            with self.profiler.phase('halloffame'):
+                halloffame.update(population)
 
-        record = stats.compile(population) if stats else {}
+        with self.profiler.phase('stats'):
+            record = stats.compile(population) if stats else {}
+        record.update(self._cache_record(counters))
+        if core is not None:
+            record['subset'] = core.size
+        if self._abandons():
+            record['abandoned'] = 0
+        if self.memetic:
+            record['refined'] = 0
         logbook.record(gen=0, nevals=len(invalid_ind), **record)
         if self.verbose:
             print(logbook.stream)
 
         if self.save_time:
             t1 = time.time()
-            ind_mejor = toolbox.selBest(population)[0]
-            ind_mejor = NS.desnormalize([ind_mejor])[0]
-            fmejor = (fitness.fitness_dtw(ind_mejor, Stime)[0] / len(Stime)) / len(Stime[0])
+            with self.profiler.phase('measure'):
+                fmejor = self.measure(population, toolbox, Stime, NS, measure)
             self.timesg.append({'time':0,
                                 'fitness':fmejor})
             print('[0]', 't:', 0, 'f:', fmejor)
+        self._notify(logbook[-1], start)
+
+        self.stop_reason = None
+        best, best_gen = self._best_fitness(population, halloffame), 0
 
         # Begin the generational process
         for gen in range(1, self.ngen + 1):
+            self.stop_reason = self._stop_reason(gen, best, best_gen)
+            if self.stop_reason is not None:
+                if self.verbose:
+                    print('Stopped before the generation {} ({})'.format(gen, self.stop_reason))
+                break
+
+            start = self._start_generation(toolbox)
+
             # Select the next generation individuals
-            offspring = toolbox.select(population, len(population))
+            with self.profiler.phase('select'):
+                offspring = toolbox.select(population, len(population))
+
+            # offspring worse than every individual that survived the selection do not need their exact fitness
+            cutoff = self._cutoff(offspring)
 
             # Vary the pool of individuals
             offspring = self.varAnd(offspring, toolbox)
 
             # Evaluate the individuals with an invalid fitness
-            if not self.batch_evaluate:
+            if core is not None:
                 invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-                S_selection = S
+            elif not self.batch_evaluate:
+                invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+                S_selection = None
             else:
                 invalid_ind = [ind for ind in offspring]
-                S_selection = random.sample(S, batch_n)
-
-            # avoids the repetition of evaluations
-            individuos_evaluados = []
-            for ind in invalid_ind:
-                if not ind in individuos_evaluados:
-                    ind.fitness.values = toolbox.evaluate(ind, S_selection)
-                    individuos_evaluados.append(ind)
-                else:
-                    ind.fitness.values = individuos_evaluados[individuos_evaluados.index(ind)].fitness.values
-
-            # Update the hall of fame with the generated individuals
+                S_selection = random.sample(range(len(S)), batch_n)
+
+            # the individuals are evaluated together, so they can be distributed among the workers. The cache avoids
+            # the repetition of evaluations
+            counters = self._cache_counters()
+            abandoned = dtw.counters['abandoned']
+            with self.profiler.phase('evaluate'):
+                fitnesses = toolbox.evaluate_population(invalid_ind, S_selection, cutoff)
+            for ind, fit in zip(invalid_ind, fitnesses):
+                ind.fitness.values = fit
+
+            # Update the hall of fame with the generated individuals. The fitness of an abandoned offspring is only a
+            # lower bound, so it does not enter the hall of fame
             if halloffame is not None:
-                halloffame.update(offspring)
+                with self.profiler.phase('halloffame'):
+                    halloffame.update([ind for ind in offspring if ind.fitness.values[0] <= cutoff])
 
             # Replace the current population by the offspring
             population[:] = offspring
 
+            # memetic step: the best individuals are refined with DBA
+            if self.memetic and gen % self.memetic_params['interval'] == 0:
+                with self.profiler.phase('refine'):
+                    refined = self.refine(population, S, S_selection, toolbox, halloffame)
+
             # Append the current generation statistics to the logbook
-            record = stats.compile(population) if stats else {}
+            with self.profiler.phase('stats'):
+                record = stats.compile(population) if stats else {}
+            record.update(self._cache_record(counters))
+            if core is not None:
+                record['subset'] = core.size
+            if self._abandons():
+                record['abandoned'] = dtw.counters['abandoned'] - abandoned
+            if self.memetic:
+                record['refined'] = refined if gen % self.memetic_params['interval'] == 0 else 0
             logbook.record(gen=gen, nevals=len(invalid_ind), **record)
             if self.verbose:
                 print(logbook.stream)
 
+            # When the population converges the subset grows, so the fitness values are no longer comparable
+            if core is not None and core.update(min(ind.fitness.values[0] for ind in population)):
+                S_selection = core.subset()
+                with self.profiler.phase('reevaluate'):
+                    self.reevaluate(population, toolbox, halloffame, S_selection)
+                best, best_gen = np.inf, gen
+
+            # the stall is measured w.r.t. the best fitness until now. A bounded fitness is greater than the cutoff, and
+            # so than the best one, so it is never taken as an improvement or as the target
+            fit = self._best_fitness(population, halloffame)
+            if fit < best * (1. - self.stop_params.get('tol', 0.)) or best == np.inf:
+                best_gen = gen
+            best = min(best, fit)
+
             if self.save_time and gen % step == 0:
                 t2 = time.time()
-                ind_mejor = toolbox.selBest(population)[0]
-                ind_mejor = NS.desnormalize([ind_mejor])[0]
-                fmejor = (fitness.fitness_dtw(ind_mejor, Stime)[0] / len(Stime)) / len(Stime[0])
+                with self.profiler.phase('measure'):
+                    fmejor = self.measure(population, toolbox, Stime, NS, measure)
 
                 tmedida += time.time() - t2
                 ttotal = time.time() - t1 - tmedida
@@ -206,8 +435,136 @@ class GA_segments:
 
                 print('[{0}]'.format(gen), 't:', ttotal, 'f:', fmejor)
 
+            self._notify(logbook[-1], start)
+
         return population, logbook
 
+    def measure(self, population, toolbox, Stime, NS, last):
+        """Fitness of the best individual of the population w.r.t. the original series, divided by their number and
+        length. It is only calculated if the best individual is not the one of the last measure.
+        :param last: Dictionary with the last measured individual and its fitness, which is updated.
+        """
+        ind_mejor = np.asarray(toolbox.selBest(population)[0])
+        if 'ind' not in last or not np.array_equal(last['ind'], ind_mejor):
+            C = NS.desnormalize([ind_mejor])[0]
+            last['ind'] = ind_mejor.copy()
+            last['fitness'] = (toolbox.evaluate(C, Stime)[0] / len(Stime)) / len(Stime[0])
+        return last['fitness']
+
+    def _start_generation(self, toolbox):
+        """Start of a generation for the observers: the time, the DTW counters and the hits and misses of the
+        alignments of the crossover. The times of the phases are started again.
+        """
+        self.profiler.pop()
+        aligner = getattr(toolbox, 'aligner', None)
+        if aligner is not None and aligner.maxsize:
+            aligns = aligner, aligner.hits, aligner.misses
+        else:
+            aligns = None
+        return time.time(), dtw.counters['calls'], dtw.counters['cells'], aligns
+
+    def _notify(self, record, start):
+        """Sends the event of the generation started at start (see '_start_generation') to the observers."""
+        if not self.observers:
+            return
+        t, calls, cells, aligns = start
+        event = dict(record)
+        event['times'] = self.profiler.pop()
+        event['time'] = time.time() - t
+        event['dtw_calls'] = dtw.counters['calls'] - calls
+        event['dtw_cells'] = dtw.counters['cells'] - cells
+        if aligns is not None:
+            aligner, hits, misses = aligns
+            event['align_hits'] = aligner.hits - hits
+            event['align_misses'] = aligner.misses - misses
+        for observer in self.observers:
+            observer(event)
+
+    def _best_fitness(self, population, halloffame):
+        """Best fitness of the hall of fame, or of the population if there is not a hall of fame."""
+        if halloffame is not None and len(halloffame) > 0:
+            return halloffame[0].fitness.values[0]
+        return min(ind.fitness.values[0] for ind in population)
+
+    def _stop_reason(self, gen, best, best_gen):
+        """Criterion of stop_params by which the evolution stops before the generation gen, or None."""
+        if self.deadline is not None and time.time() >= self.deadline:
+            return 'time'
+        stall = self.stop_params.get('stall')
+        if stall is not None and gen - 1 - best_gen >= stall:
+            return 'stall'
+        target = self.stop_params.get('target')
+        if target is not None and best <= target:
+            return 'target'
+        return None
+
+    def refine(self, population, S, idx, toolbox, halloffame):
+        """The memetic_params['k'] best individuals of the population are refined with 'toolbox.refine' w.r.t. the
+        series of S given by the indexes idx (all of them if idx is None). Each refined individual replaces the
+        original one if its fitness is better.
+
+        :return Number of individuals replaced.
+        """
+        best = sorted(range(len(population)), key=lambda i: population[i].fitness.values[0])
+        best = best[:self.memetic_params['k']]
+        Sr = S if idx is None else S[idx]
+        candidates = [toolbox.refine(population[i], Sr) for i in best]
+        fitnesses = toolbox.evaluate_population(candidates, idx)
+
+        refined = 0
+        for i, ind, fit in zip(best, candidates, fitnesses):
+            ind.fitness.values = fit
+            if fit[0] < population[i].fitness.values[0]:
+                population[i] = ind
+                refined += 1
+        if halloffame is not None:
+            halloffame.update(candidates)
+        return refined
+
+    def reevaluate(self, population, toolbox, halloffame, idx):
+        """The population and the hall of fame are evaluated again w.r.t. a new subset of series.
+        :param idx: Indexes of the series of the new subset. If None, the whole set is used.
+        """
+        members = [toolbox.clone(ind) for ind in halloffame] if halloffame is not None else []
+        individuals = population + members
+        fitnesses = toolbox.evaluate_population(individuals, idx)
+        for ind, fit in zip(individuals, fitnesses):
+            ind.fitness.values = fit
+
+        if halloffame is not None:
+            halloffame.clear()
+            halloffame.update(individuals)
+
+    def rerank(self, halloffame, toolbox):
+        """The individuals of the hall of fame are evaluated w.r.t. the whole set of series.
+        :return The best individual of the hall of fame w.r.t. the whole set.
+        """
+        fitnesses = toolbox.evaluate_population(list(halloffame), None)
+        return halloffame[int(np.argmin([fit[0] for fit in fitnesses]))]
+
+    def _abandons(self):
+        """True if the evaluation of the offspring can be abandoned."""
+        return self.early_abandon and (self.coreset_evaluate or not self.batch_evaluate)
+
+    def _cutoff(self, selected):
+        """Fitness from which the evaluation of an offspring is abandoned: the worst fitness of the individuals
+        selected as parents of the generation."""
+        if not self._abandons():
+            return np.inf
+        return max(ind.fitness.values[0] for ind in selected)
+
+    def _cache_counters(self):
+        """Hits and misses of the fitness cache until now."""
+        if self.cache is None:
+            return None
+        return self.cache.hits, self.cache.misses
+
+    def _cache_record(self, counters):
+        """Hits and misses of the fitness cache since the moment given by counters, to be added to the logbook."""
+        if self.cache is None:
+            return {}
+        return {'hits': self.cache.hits - counters[0], 'misses': self.cache.misses - counters[1]}
+
     def register_toolbox(self, Sn):
         """Register the operators.
         :param Sn: Normalized series of which the centroid is calculated.
@@ -215,60 +572,247 @@ class GA_segments:
         :return Object of the class:'deap.base.Toolbox'.
         """
         # substitutes the relative value of displacement by the number of elements to be displaced based on the set of
-        # given series.
-        self.mutparams['desp'] = int(self.mutparams['desp'] * len(Sn[0]))
-        if self.mutparams['desp'] < 2:
-        	self.mutparams['desp'] = 2
+        # given series. self.mutparams is not modified, so the GA can calculate several centroids.
+        mutparams = dict(self.mutparams)
+        mutparams['desp'] = int(mutparams['desp'] * len(Sn[0]))
+        if mutparams['desp'] < 2:
+        	mutparams['desp'] = 2
 
         toolbox = base.Toolbox()
         toolbox.register('generate', generate.sample_generate, S=Sn)
         toolbox.register('population', tools.initRepeat, list, toolbox.generate)
-        toolbox.register('evaluate', fitness.fitness_dtw)
-        toolbox.register('mutate', mutation.mutation, **self.mutparams)
-        toolbox.register('mate', crossover.crossover)
+        cache_size = self.align_params.get('cache_size')
+        if self.distance == 'fastdtw':
+            toolbox.register('evaluate', fitness.fitness_fastdtw, vp=self.window)
+            aligner = alignment.Aligner(cache_size, window=self.align_params.get('window'))
+        elif self.distance == 'dtw':
+            toolbox.register('evaluate', fitness.fitness_dtw, precision=self.precision)
+            aligner = alignment.Aligner(cache_size, window=self.align_params.get('window'))
+        elif self.distance in dtw.CONSTRAINTS:
+            toolbox.register('evaluate', fitness.fitness_dtw, window=self.window, constraint=self.distance,
+                             precision=self.precision)
+            aligner = alignment.Aligner(cache_size, window=self.window, constraint=self.distance)
+        else:
+            raise Exception('Error: Unknown distance {}'.format(self.distance))
+        toolbox.register('mate', crossover.crossover, aligner=aligner)
+        toolbox.aligner = aligner
+        toolbox.register('refine', dba.refine, n_iter=self.memetic_params['n_iter'], window=aligner.window,
+                         constraint=aligner.constraint)
+        toolbox.register('mutate', mutation.mutation, **mutparams)
         toolbox.register('select', tools.selTournament, **self.selparams)
         toolbox.register('selBest', tools.selBest, k=1)
         return toolbox
 
-    def calculate_centroids(self, S):
+    def working_set(self, Sn):
+        """Normalized series in the type of the precision of the fitness, so they are not converted in each evaluation.
+        The centroids are still desnormalized in float64.
+        """
+        if self.distance == 'fastdtw':
+            return Sn
+        return np.ascontiguousarray(Sn, dtype=dtw.precision_dtype(self.precision))
+
+    def create_evaluator(self, Sn, toolbox):
+        """Create the object that evaluates the population. If multi_jobs = True, the evaluation is distributed among
+        a pool of n_jobs processes, each of which keeps its own copy of Sn.
+        The fitness values are kept in a new cache of cache_size entries.
+        :param Sn: Normalized series of which the centroid is calculated.
+        :param toolbox: Object of the class:'deap.base.Toolbox' with the fitness function registered as 'evaluate'.
+
+        :return Object of the class:'evaluation.Evaluator'.
+        """
+        self.cache = cache.FitnessCache(self.cache_size) if self.cache_size else None
+        if self.multi_jobs:
+            return evaluation.PoolEvaluator(Sn, toolbox.evaluate, cache=self.cache, n_jobs=self.n_jobs)
+        return evaluation.Evaluator(Sn, toolbox.evaluate, cache=self.cache)
+
+    def calculate_centroids(self, S, init=None, new=None):
         """Function that calculates the centroid of a set of time series. First register the operators and then the
         evolutionary process is performed.
+
+        The evolution can start from previous centroids (warm start), e.g. when new series are added to a set whose
+        centroid is known. The population is then formed by the series of init and by mutations of them, it evolves
+        during warm_params['ngen'] generations and it is evaluated w.r.t. the new series and a sample of the old ones.
+        The centroid is the individual of the hall of fame that is best w.r.t. the whole set.
+
+        The evolution can stop before ngen generations by the criteria of stop_params; the criterion is then stored in
+        stop_reason. The time budget counts from the call to this function, but the final evaluation of the centroid is
+        done after it.
+
+        With multiscale = True (and without init), the evolution goes through the levels of 'multiscale_levels' and
+        the logbook contains the generations of all of them, with the length of each one.
         :param S: Set of series from which the centroid is calculated.
+        :param init: Series from which the evolution starts (e.g. the previous hall of fame). If None, the population
+        is generated from S.
+        :param new: Indexes of the new series of S, w.r.t. which the warm start is evaluated. If None, the whole set is
+        used. Only used with init.
 
         :returns: The centroid of S.
         :returns: Centroid fitness.
         :returns: Object of the class: 'deap.tools.Logbook' with information about the evolutionary process.
         """
-        if isinstance(S, np.ndarray):
-            S = S.tolist()
+        budget = self.stop_params.get('time')
+        self.deadline = time.time() + budget if budget is not None else None
+
+        S = np.asarray(S, dtype=np.float64)
 
         NS = normalizacion.Normalize()
-        Sn = NS.normalize(S)
+        Sn = self.working_set(NS.normalize(S))
 
-        creator.create('FitnessMin', base.Fitness, weights=(-1.0,))
-        creator.create('Individual', list, fitness=creator.FitnessMin)
+        create_types()
 
         toolbox = self.register_toolbox(Sn)
 
-        if self.multi_jobs:
-            pool = multiprocessing.Pool()
-            toolbox.register('map', pool.map)
+        ngen = self.ngen
+        Se = Sn
+        levels = None
+        if init is None and self.multiscale:
+            levels = self.multiscale_levels(len(Sn[0]))
+        elif init is None:
+            pop = toolbox.population(n=self.pop_size)
+        else:
+            pop = self.warm_population(NS.normalize(init, update=False), toolbox)
+            self.ngen = self.warm_params['ngen']
+            if new is not None:
+                Se = Sn[self.warm_subset(len(Sn), new)]
 
-        pop = toolbox.population(n=self.pop_size)
-        hof = tools.HallOfFame(3)
+        hof = tools.HallOfFame(3, similar=np.array_equal)
         stats = tools.Statistics(lambda ind: ind.fitness.values)
         stats.register("avg", np.mean)
         stats.register("std", np.std)
         stats.register("min", np.min)
         stats.register("max", np.max)
 
-        _, log = self.ag(pop, Sn, toolbox, stats=stats, halloffame=hof, Stime=S, NS=NS)
+        # the pool is closed when the evolution finishes, or terminated if it fails
+        # the normalized series are a contiguous array, so the DTW library reads them without copying
+        try:
+            if levels is not None:
+                seeds, log = self.multiscale_evolution(Sn, levels[:-1], stats)
+                pop = toolbox.population(n=self.pop_size) if seeds is None else self.warm_population(seeds, toolbox)
+                self.ngen = levels[-1][1]
+
+            with self.create_evaluator(Se, toolbox) as evaluator:
+                toolbox.register('evaluate_population', evaluator.map)
+                _, level_log = self.ag(pop, Se, toolbox, stats=stats, halloffame=hof, Stime=S, NS=NS)
+                log = level_log if levels is None else self.join_logbooks(log, level_log, len(Sn[0]))
+
+                # the hall of fame may have been evaluated only w.r.t. a subset
+                if Se is not Sn:
+                    C = hof[int(np.argmin([toolbox.evaluate(ind, Sn)[0] for ind in hof]))]
+                elif self.coreset_evaluate:
+                    C = self.rerank(hof, toolbox)
+                else:
+                    C = hof[0]
+        finally:
+            self.ngen = ngen
+            self.deadline = None
 
-        C = hof[0]
+        # the hall of fame is kept for a later warm start
+        self.halloffame = NS.desnormalize([np.asarray(ind) for ind in hof])
         C = NS.desnormalize([C])[0]
-        fitness_mejor = fitness.fitness_dtw(C, S)[0]
-
-        if self.multi_jobs:
-            pool.close()
+        fitness_mejor = toolbox.evaluate(C, S)[0]
 
         return C, fitness_mejor, log
+
+    def multiscale_levels(self, length):
+        """Levels of the multiscale evolution of a set of series of the given length, from the coarsest to the full
+        length. The lengths are length / factor^k, k = levels - 1, ..., 0, without those shorter than min_length.
+        :param length: Length of the series.
+
+        :return List of pairs (length, generations) of each level. The last one is the full length.
+        """
+        params = self.multiscale_params
+        lengths = []
+        for k in range(params['levels'] - 1, 0, -1):
+            m = int(length / params['factor'] ** k)
+            if params['min_length'] <= m < length and (not lengths or m > lengths[-1]):
+                lengths.append(m)
+        if not lengths:
+            return [(length, self.ngen)]
+
+        ngen_final = min(self.ngen, max(1, int(round(params['final_ngen'] * self.ngen))))
+        ngen_coarse = self.ngen - ngen_final
+        levels = [(m, ngen_coarse // len(lengths) + (1 if k < ngen_coarse % len(lengths) else 0))
+                  for k, m in enumerate(lengths)]
+        return levels + [(length, ngen_final)]
+
+    def multiscale_evolution(self, Sn, levels, stats):
+        """Evolution on the coarse levels of the multiscale evolution. Each level evolves on the PAA of Sn, starting
+        from the best individuals of the previous level interpolated to its length. save_time is not used in these
+        levels. If the time budget is exhausted, the remaining levels only evaluate their initial population.
+        :param Sn: Normalized series.
+        :param levels: Pairs (length, generations) of the coarse levels.
+        :param stats: Object of the class 'deap.tools.Statistics'.
+
+        :return The hall of fame and the final population of the last level, best first, interpolated to the length of
+        Sn (None if there are no levels).
+        :return Object of the class: 'deap.tools.Logbook' with the generations of all the levels.
+        """
+        log = None
+        seeds = None
+        save_time = self.save_time
+        stop_params = self.stop_params
+        self.save_time = False
+        self.stop_params = dict(stop_params, target=None)
+        try:
+            for length, ngen in levels:
+                Sc = self.working_set(coreset.paa(Sn, length))
+                toolbox = self.register_toolbox(Sc)
+                if seeds is None:
+                    pop = toolbox.population(n=self.pop_size)
+                else:
+                    pop = self.warm_population([interpolation.interpolate(x, length) for x in seeds], toolbox)
+
+                hof = tools.HallOfFame(3, similar=np.array_equal)
+                self.ngen = ngen
+                with self.create_evaluator(Sc, toolbox) as evaluator:
+                    toolbox.register('evaluate_population', evaluator.map)
+                    pop, level_log = self.ag(pop, Sc, toolbox, stats=stats, halloffame=hof)
+                log = self.join_logbooks(log, level_log, length)
+                seeds = [np.asarray(ind) for ind in list(hof) + tools.selBest(pop, len(pop))]
+        finally:
+            self.save_time = save_time
+            self.stop_params = stop_params
+
+        if seeds is None:
+            return None, log
+        return [interpolation.interpolate(x, len(Sn[0])) for x in seeds], log
+
+    def join_logbooks(self, log, level_log, length):
+        """Appends the generations of a level of the multiscale evolution to the logbook log (None at the first
+        level), after the previous ones and with the length of the level.
+        """
+        if log is None:
+            log = tools.Logbook()
+            log.header = ['length'] + level_log.header
+            start = 0
+        else:
+            start = log[-1]['gen']
+        for record in level_log:
+            log.record(length=length, **dict(record, gen=start + record['gen']))
+        return log
+
+    def warm_population(self, init, toolbox):
+        """Population of a warm start: the series of init and mutations of them.
+        :param init: Normalized series.
+        :param toolbox: Object of the class:'deap.base.Toolbox'.
+
+        :return List of pop_size individuals.
+        """
+        pop = [creator.Individual(x) for x in init[:self.pop_size]]
+        while len(pop) < self.pop_size:
+            ind, = toolbox.mutate(creator.Individual(random.choice(init)))
+            pop.append(ind)
+        return pop
+
+    def warm_subset(self, n, new):
+        """Indexes of the series evaluated in a warm start: the new ones and a sample of warm_params['old_size']
+        old series for each new one.
+        :param n: Number of series.
+        :param new: Indexes of the new series.
+
+        :return Sorted list of indexes.
+        """
+        new = set(int(i) for i in new)
+        old = [i for i in range(n) if i not in new]
+        k = min(len(old), int(np.ceil(self.warm_params['old_size'] * len(new))))
+        return sorted(new.union(random.sample(old, k)))
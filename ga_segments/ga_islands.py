@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import random
+import traceback
+
+from deap import creator
+from deap import tools
+
+from .ga import GA_segments, create_types
+from .segmentsf import *
+
+import numpy as np
+
+
+TOPOLOGIES = ('ring', 'full')
+
+
+def _island(ga, i, S, seed, inboxes, outboxes, results):
+    """ Function executed by the process of each island. The population evolves during 'migration_interval'
+    generations with 'GA_segments.ag', then its best individuals are sent to the neighbour islands and the worst ones
+    are replaced by the individuals received from them.
+
+    The individuals of the hall of fame and the logbook are put in the queue results. If the evolution fails, the
+    traceback is put instead, so the main process does not wait forever.
+    """
+    try:
+        random.seed(seed)
+        np.random.seed(seed)
+        create_types()
+
+        toolbox = ga.register_toolbox(S)
+        pop = toolbox.population(n=ga.pop_size)
+        hof = tools.HallOfFame(3, similar=np.array_equal)
+        stats = tools.Statistics(lambda ind: ind.fitness.values)
+        stats.register("avg", np.mean)
+        stats.register("std", np.std)
+        stats.register("min", np.min)
+        stats.register("max", np.max)
+
+        logbook = tools.Logbook()
+        ngen = ga.ngen
+        with ga.create_evaluator(S, toolbox) as evaluator:
+            toolbox.register('evaluate_population', evaluator.map)
+
+            gen = 0
+            while True:
+                ga.ngen = min(ga.migration_interval, ngen - gen)
+                pop, log = ga.ag(pop, S, toolbox, stats=stats, halloffame=hof)
+                if logbook.header is None:
+                    logbook.header = ['island'] + log.header
+                for record in log:
+                    # the generation 0 of each epoch only evaluates the immigrants
+                    if gen == 0 or record['gen'] > 0:
+                        logbook.record(island=i, **dict(record, gen=gen + record['gen']))
+                gen += ga.ngen
+                if gen >= ngen:
+                    break
+
+                emigrants = [np.asarray(ind) for ind in tools.selBest(pop, ga.migration_size)]
+                for queue in outboxes:
+                    queue.put(emigrants)
+                immigrants = [x for queue in inboxes for x in queue.get()][:len(pop) - 1]
+
+                # the immigrants replace the worst individuals, and are evaluated w.r.t. the data of the island
+                pop.sort(key=lambda ind: ind.fitness.values[0])
+                pop[len(pop) - len(immigrants):] = [creator.Individual(x) for x in immigrants]
+
+        results.put((i, [np.asarray(ind) for ind in hof], logbook, None))
+    except Exception:
+        results.put((i, None, None, traceback.format_exc()))
+
+
+class GA_segments_islands(GA_segments):
+    """ Island model of the genetic algorithm of 'GA_segments'. The population is divided in n_islands
+    sub-populations of pop_size individuals that evolve in separate processes with the same operators. Every
+    migration_interval generations, each island sends its migration_size best individuals to its neighbours, whose
+    worst individuals are replaced by them. With the 'ring' topology the neighbour of the island i is the island i + 1;
+    with the 'full' topology every island is a neighbour of the others.
+
+    The islands only wait for each other at the migrations. Each island can evaluate w.r.t. its own shard of the set of
+    series. At the end, the best individuals of all the islands are compared w.r.t. the whole set.
+    """
+    def __init__(self,
+                 n_islands=4,
+                 migration_interval=10,
+                 migration_size=2,
+                 topology='ring',
+                 shard=False,
+                 seed=None,
+                 **params_ga):
+        """
+        :param n_islands: Number of islands (and processes).
+        :param migration_interval: Generations between two migrations.
+        :param migration_size: Number of individuals that each island sends to each neighbour.
+        :param topology: 'ring' or 'full'.
+        :param shard: If True, the island i evaluates its individuals w.r.t. the series i, i + n_islands, ... of the
+        set. If False, all the islands use the whole set.
+        :param seed: Seed from which the seeds of the islands are derived. If None, they are drawn from 'random'.
+        :param params_ga: Parameters of 'GA_segments' used by each island. pop_size is the size of each island. The
+        islands evaluate in one core and do not use the coreset, the multiscale evolution, the stop criteria (they must
+        run the same generations between migrations) nor save_time.
+        """
+        super().__init__(**params_ga)
+        if topology not in TOPOLOGIES:
+            raise Exception('Error: Unknown topology {}'.format(topology))
+        if n_islands < 1:
+            raise Exception('Error: n_islands must be greater than 0')
+
+        self.n_islands = n_islands
+        self.migration_interval = max(1, migration_interval)
+        self.migration_size = migration_size
+        self.topology = topology
+        self.shard = shard
+        self.seed = seed
+
+        # the coreset is restarted in each call of 'ag', so it is not used between migrations
+        self.multi_jobs = False
+        self.coreset_evaluate = False
+        self.multiscale = False
+        self.stop_params = dict(self.stop_params, time=None, stall=None, target=None)
+        self.save_time = False
+
+    def neighbours(self, i):
+        """ Islands to which the island i sends its emigrants.
+        """
+        if self.topology == 'ring':
+            return [(i + 1) % self.n_islands] if self.n_islands > 1 else []
+        return [j for j in range(self.n_islands) if j != i]
+
+    def calculate_centroids(self, S, init=None, new=None):
+        """Function that calculates the centroid of a set of time series with the island model.
+        :param S: Set of series from which the centroid is calculated.
+        :param init, new: The warm start is not supported by the island model, so init must be None.
+
+        :returns: The centroid of S.
+        :returns: Centroid fitness.
+        :returns: Object of the class: 'deap.tools.Logbook' with the generations of all the islands.
+        """
+        if init is not None:
+            raise Exception('Error: The island model does not support the warm start')
+
+        S = np.asarray(S, dtype=np.float64)
+
+        NS = normalizacion.Normalize()
+        Sn = self.working_set(NS.normalize(S))
+        create_types()
+
+        if self.seed is not None:
+            seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(self.seed).spawn(self.n_islands)]
+        else:
+            seeds = [random.randrange(2 ** 32) for _ in range(self.n_islands)]
+
+        # a queue for each pair of neighbour islands, so the immigrants are always received in the same order
+        queues = {(i, j): multiprocessing.Queue() for i in range(self.n_islands) for j in self.neighbours(i)}
+        results = multiprocessing.Queue()
+        processes = []
+        for i in range(self.n_islands):
+            Si = np.ascontiguousarray(Sn[i::self.n_islands]) if self.shard and len(Sn) >= self.n_islands else Sn
+            inboxes = [queues[(j, i)] for j in range(self.n_islands) if (j, i) in queues]
+            outboxes = [queues[(i, j)] for j in self.neighbours(i)]
+            processes.append(multiprocessing.Process(target=_island,
+                                                     args=(self, i, Si, seeds[i], inboxes, outboxes, results)))
+
+        members = [None] * self.n_islands
+        logbooks = [None] * self.n_islands
+        finished = False
+        try:
+            for p in processes:
+                p.start()
+            for _ in processes:
+                i, hof, logbook, error = results.get()
+                if error is not None:
+                    raise Exception('Error: The island {} failed\n{}'.format(i, error))
+                members[i] = hof
+                logbooks[i] = logbook
+            finished = True
+        finally:
+            # if an island fails, its neighbours would wait forever for its emigrants
+            for p in processes:
+                if not finished and p.is_alive():
+                    p.terminate()
+                p.join()
+
+        log = tools.Logbook()
+        log.header = logbooks[0].header
+        for logbook in logbooks:
+            log.extend(logbook)
+
+        # the best individuals of the islands are compared w.r.t. the whole set
+        toolbox = self.register_toolbox(Sn)
+        candidates = [x for hof in members for x in hof]
+        fitnesses = [toolbox.evaluate(x, Sn)[0] for x in candidates]
+        C = candidates[int(np.argmin(fitnesses))]
+        self.halloffame = NS.desnormalize([candidates[j] for j in np.argsort(fitnesses)[:3]])
+
+        C = NS.desnormalize([C])[0]
+        fitness_mejor = toolbox.evaluate(C, S)[0]
+
+        return C, fitness_mejor, log
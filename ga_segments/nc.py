@@ -1,10 +1,75 @@
 # -*- coding: utf-8 -*-
 
+import json
+import multiprocessing
+import random
+from collections import deque
+
 import numpy as np
 import matplotlib.pyplot as plt
 from .ga import GA_segments
-from .ga_coop import GA_segments_coop
+from .ga_islands import GA_segments_islands
 from .segmentsf import dtw
+from .segmentsf import storage
+from .segmentsf.dataset import SeriesSet
+from .segmentsf.normalizacion import mean_std
+from .segmentsf.search import CentroidSearch
+
+
+def _fit_class(args):
+    """ Function that calculates the centroid of a class. It is executed by the processes of the pool of 'NC.fit', so
+    it receives everything it needs as arguments.
+
+    :return: Index of the class, centroid, inertia and hall of fame of the genetic algorithm.
+    """
+    i, S, ga, params_ga, seed, init, new = args
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    if ga == 'simple':
+        GA = GA_segments(**params_ga)
+    elif ga == 'coop':
+        # ga_coop is imported only when it is used, so NC can be imported without it
+        from .ga_coop import GA_segments_coop
+        GA = GA_segments_coop(**params_ga)
+    elif ga == 'islands':
+        GA = GA_segments_islands(**params_ga)
+    else:
+        raise Exception('Error: Unknown genetic algorithm {}'.format(ga))
+
+    if init is None:
+        centroid, inertia, _ = GA.calculate_centroids(S=S)
+    else:
+        centroid, inertia, _ = GA.calculate_centroids(S=S, init=init, new=new)
+    return i, centroid, inertia, getattr(GA, 'halloffame', [centroid])
+
+
+def _fit_class_counted(args):
+    """ Function executed by the processes of the pool of 'NC.fit' (see '_fit_class'). The increments of the DTW
+    counters of the process ('dtw.counters') are returned with the result, so they are added to the counters of the
+    main process.
+    """
+    before = dict(dtw.counters)
+    result = _fit_class(args)
+    return result, {key: dtw.counters[key] - value for key, value in before.items()}
+
+
+# classifier used by the processes of the pool of 'NC.predict_stream'
+_model = None
+
+
+def _init_predict_worker(distance, window, centroids, classes):
+    global _model
+    _model = NC(distance=distance, window=window)
+    _model.centroids = centroids
+    _model.classes = classes
+    _model.search = _model._search(centroids)
+
+
+def _predict_chunk(args):
+    X, fuzzy = args
+    return _model._predict_chunk(X, fuzzy)
 
 
 class NC:
@@ -12,15 +77,33 @@ class NC:
     centroid of the class closest to each series.
     """
 
-    def __init__(self, ga='simple', params_ga={}, verbose=0):
+    def __init__(self, ga='simple', params_ga={}, verbose=0, distance='dtw', window=None, n_jobs=1, seed=None):
         """
-        :param ga: The genetic algorithm that is used. It can be 'simple' or 'coop'.
+        :param ga: The genetic algorithm that is used. It can be 'simple', 'coop' or 'islands' (see
+        'GA_segments_islands', whose parameters are also given in params_ga).
         :param params_ga: Parameters of genetic algorithm.
         :param verbose
+        :param distance: Distance used to calculate the centroids and to classify. It can be 'dtw', 'sakoe_chiba' or
+        'itakura' (DTW constrained to a window of that shape) or 'fastdtw'. It can be overwritten for the genetic
+        algorithm in params_ga.
+        :param window: Radius of the window of 'sakoe_chiba' and 'itakura', in samples (int) or as a fraction of the
+        length of the series (float). For 'fastdtw' it is the fraction used to calculate the radius. If None, the
+        default of the distance is used (see 'dtw.WINDOWS').
+        :param n_jobs: Number of processes that calculate the centroids of the classes at the same time, and of threads
+        that calculate the distances in the predictions. If None, all cores are used. With more than one process, the
+        genetic algorithms evaluate in one core (multi_jobs = False). With the 'islands' algorithm the classes are
+        always calculated one after the other, since its islands are processes and the processes of a pool cannot
+        start other processes.
+        :param seed: If it is not None, the random generators are initialized for each class with a seed derived from
+        it and from the class, so the centroids do not depend on n_jobs nor on the order in which the classes finish.
         """
         self.verbose = verbose
+        self.n_jobs = n_jobs
+        self.seed = seed
         self.ga = ga
         self.params_ga = params_ga
+        self.distance = distance
+        self.window = dtw.default_window(distance, window)
 
     def fit(self, X, y):
         """ Function that calculates the centroids of each class.
@@ -30,29 +113,142 @@ class NC:
         """
         if not isinstance(X, np.ndarray):
             X = np.array(X)
+        y = np.asarray(y)
 
         self.classes = np.unique(y)
-        self.centroids = []
-        inertia_total = 0
+        if len(y) and np.all(y[:-1] <= y[1:]):
+            # the series of each class are contiguous (e.g. 'dataset.load_ucr' with sort=True), so they are not copied
+            bounds = np.searchsorted(y, self.classes, side='left'), np.searchsorted(y, self.classes, side='right')
+            self.series = [X[a:b] for a, b in zip(*bounds)]
+        else:
+            self.series = [X[y == c] for c in self.classes]
+        self.n_updates = 0
+
+        seeds = [None] * len(self.classes)
+        if self.seed is not None:
+            seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(self.seed).spawn(len(self.classes))]
+
+        jobs = [(i, S, seeds[i], None, None) for i, S in enumerate(self.series)]
+
+        self.centroids = [None] * len(self.classes)
+        self.inertias = [0.] * len(self.classes)
+        self.halloffames = [None] * len(self.classes)
+        self._train(jobs)
+
+
+    def partial_fit(self, X, y):
+        """ Function that updates the centroids with new series. The centroid of each class with new series is
+        calculated again starting from its previous hall of fame (see 'GA_segments.calculate_centroids'), so the
+        evolution is much shorter. The centroids of new classes are calculated from scratch, and the classes without
+        new series are not changed. If the classifier has not been fitted, it is fitted with X. A classifier created
+        by 'load' cannot be updated, since the file does not contain the series nor the halls of fame of the training.
+
+        :param X: New series.
+        :param y: Class to which each new series belongs.
+        """
+        if not getattr(self, 'centroids', None):
+            return self.fit(X, y)
+        if getattr(self, 'series', None) is None or getattr(self, 'halloffames', None) is None:
+            raise Exception('Error: A warm update needs the training state (series and halls of fame), which a loaded '
+                            'model does not have. Fit it again with the series')
+
+        if not isinstance(X, np.ndarray):
+            X = np.array(X)
+
+        classes = np.union1d(self.classes, np.unique(y))
+        old = {c: i for i, c in enumerate(self.classes)}
+        series, centroids, inertias, halloffames = [], [], [], []
+        for c in classes:
+            i = old.get(c)
+            series.append(self.series[i] if i is not None else X[:0])
+            centroids.append(self.centroids[i] if i is not None else None)
+            inertias.append(self.inertias[i] if i is not None else 0.)
+            halloffames.append(self.halloffames[i] if i is not None else None)
+
+        self.n_updates += 1
+        seeds = [None] * len(classes)
+        if self.seed is not None:
+            sequence = np.random.SeedSequence([self.seed, self.n_updates])
+            seeds = [int(s.generate_state(1)[0]) for s in sequence.spawn(len(classes))]
+
+        jobs = []
+        for i, c in enumerate(classes):
+            Xc = X[y == c]
+            if not len(Xc):
+                continue
+            n_old = len(series[i])
+            series[i] = np.concatenate([series[i], Xc]) if n_old else Xc
+            if n_old:
+                jobs.append((i, series[i], seeds[i], halloffames[i], range(n_old, len(series[i]))))
+            else:
+                jobs.append((i, series[i], seeds[i], None, None))
+
+        self.classes = classes
+        self.series = series
+        self.centroids = centroids
+        self.inertias = inertias
+        self.halloffames = halloffames
+        self._train(jobs)
+
+
+    def _train(self, jobs):
+        """ Function that calculates the centroids of the classes of jobs, in parallel if n_jobs > 1, and updates the
+        centroids, the inertia and the search.
+
+        :param jobs: List of (index of the class, series, seed, initial series, indexes of the new series).
+        """
+        params_ga = {'distance': self.distance, 'window': self.window}
+        if 'distance' in self.params_ga and 'window' not in self.params_ga:
+            # the genetic algorithm uses the default window of its own distance
+            params_ga['window'] = None
+        params_ga.update(self.params_ga)
+
+        n_jobs = self.n_jobs or multiprocessing.cpu_count()
+        if self.ga == 'islands':
+            # the islands run in their own processes, which the processes of a pool cannot start, so the classes are
+            # calculated one after the other
+            n_jobs = 1
+        if n_jobs > 1:
+            # the processes of the pool cannot create their own pools
+            params_ga['multi_jobs'] = False
+
+        jobs = [(i, S, self.ga, params_ga, seed, init, new) for i, S, seed, init, new in jobs]
 
-        for i, c in enumerate(self.classes):
-            if self.ga == 'simple':
-                GA = GA_segments(**self.params_ga)
-            elif self.ga == 'coop':
-                GA = GA_segments_coop(**self.params_ga)
+        updated = []
+        if n_jobs > 1 and len(jobs) > 1:
+            # the largest classes are calculated first, so the processes do not wait for a long class at the end
+            jobs.sort(key=lambda job: len(job[1]), reverse=True)
+            pool = multiprocessing.Pool(min(n_jobs, len(jobs)))
+            try:
+                for result, counters in pool.imap_unordered(_fit_class_counted, jobs):
+                    for key, value in counters.items():
+                        dtw.counters[key] += value
+                    updated.append(self._update(*result))
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for job in jobs:
+                updated.append(self._update(*_fit_class(job)))
 
-            mask = y == c
-            S = X[mask]
-            centroid, inertia, _ = GA.calculate_centroids(S=S)
-            self.centroids.append(centroid)
+        if self.verbose > 1:
+            for i in sorted(updated):
+                self._plot(i, self.centroids[i])
 
-            if self.verbose > 1:
-                self._plot(i, centroid)
-            if self.verbose > 0:
-                self._print(i, inertia)
+        # the inertias are added in the order of the classes, so the total does not depend on the order of the jobs
+        self.inertia = sum(self.inertias)
 
-            inertia_total += inertia
-            self.inertia = inertia_total
+        self.search = self._search(self.centroids)
+
+
+    def _update(self, i, centroid, inertia, halloffame):
+        self.centroids[i] = centroid
+        self.inertias[i] = inertia
+        self.halloffames[i] = halloffame
+        if self.verbose > 0:
+            self._print(i, inertia)
+        return i
 
 
     def predict(self, X):
@@ -64,14 +260,14 @@ class NC:
         if not self.centroids:
             raise Exception('Error: Fit the data first')
     
-        if not isinstance(X, np.ndarray):
+        if not isinstance(X, (np.ndarray, SeriesSet)):
             X = np.array(X)
     
         self.labels = np.zeros(len(X))
-        for i, x in enumerate(X):
-            dists = [dtw.dtw(x, c)[0] for c in self.centroids]
-            class_index = np.argmin(dists)
-            self.labels[i] = self.classes[class_index]
+        if len(X):
+            self.labels[:] = self.classes[self._nearest(self.search, self.centroids, X)]
+
+        return self.labels
     
     
     def fit_predict(self, X_train, y, X_test):
@@ -99,14 +295,10 @@ class NC:
         :return: Class of each series of X.
         """
         self.labels = np.zeros(len(X))
+        search = self._search(C)
     
-        for i, x in enumerate(X):
-            min_d = np.inf
-            for j, c in enumerate(C):
-                d = dtw.dtw(x, c)[0]
-                if d < min_d:
-                    min_d = d
-                    self.labels[i] = j
+        if len(X):
+            self.labels[:] = self._nearest(search, C, X)
     
         return self.labels
     
@@ -122,18 +314,15 @@ class NC:
         if not self.centroids:
             raise Exception('Error: Fit the data first')
     
-        if not isinstance(X, np.ndarray):
+        if not isinstance(X, (np.ndarray, SeriesSet)):
             X = np.array(X)
     
         self.fuzzy_labels = []
-        for x in X:
-            dists = [dtw.dtw(x, c)[0] for c in self.centroids]
-            total = sum(dists)
-            creencias_x = [1 - d / total for d in dists]
-            total_creen = sum(creencias_x)
-            creencias_x_norm = [cree / total_creen for cree in creencias_x]
-            self.fuzzy_labels.append(creencias_x_norm)
+        for dists in self._distances(X, self.centroids):
+            self.fuzzy_labels.append(self._membership(dists.tolist()))
         self.fuzzy_labels = np.array(self.fuzzy_labels)
+
+        return self.fuzzy_labels
     
     
     def fit_fuzzy_predict(self, X_train, y, X_test):
@@ -159,18 +348,55 @@ class NC:
         :return: Probability of belonging to each class.
         """
         self.fuzzy_labels = []
-        for x in X:
-            dists = [dtw.dtw(x, c)[0] for c in C]
-            total = sum(dists)
-            creencias_x = [1 - d / total for d in dists]
-            total_creen = sum(creencias_x)
-            creencias_x_norm = [cree / total_creen for cree in creencias_x]
-            self.fuzzy_labels.append(creencias_x_norm)
+        for dists in self._distances(X, C):
+            self.fuzzy_labels.append(self._membership(dists.tolist()))
         self.fuzzy_labels = np.array(self.fuzzy_labels)
     
         return self.fuzzy_labels
     
     
+    def predict_stream(self, chunks, fuzzy=False, n_jobs=1, prefetch=2):
+        """ Function that classifies a set of series given by chunks, e.g. 'stream.chunks(X)' for a memory-mapped
+        array X or the series of 'stream.read_chunks(path)' for a file. The result of each chunk is yielded as soon as
+        it is calculated, so only a few chunks are in memory at the same time.
+
+        :param chunks: Iterator of chunks of series.
+        :param fuzzy: If True, the degree of belief of belonging to each class is also calculated (see
+        :meth:`fuzzy_predict`). Then all the distances are calculated, instead of only the necessary ones.
+        :param n_jobs: Number of processes that classify the chunks. If None, all cores are used.
+        :param prefetch: Number of chunks read ahead by process when n_jobs > 1.
+
+        :return: Iterator of pairs (classes, beliefs) of each chunk, in the order of the chunks. beliefs is None if
+        fuzzy = False.
+        """
+        if not getattr(self, 'centroids', None):
+            raise Exception('Error: Fit the data first')
+
+        n_jobs = n_jobs or multiprocessing.cpu_count()
+        if n_jobs == 1:
+            for X in chunks:
+                yield self._predict_chunk(X, fuzzy)
+            return
+
+        centroids = [np.asarray(c) for c in self.centroids]
+        pool = multiprocessing.Pool(n_jobs, initializer=_init_predict_worker,
+                                    initargs=(self.distance, self.window, centroids, self.classes))
+        try:
+            # the chunks are read only when there is a free place, so the memory is bounded. They are sent as they
+            # are, as in the serial case, so the chunks of series of different lengths (lists or 'SeriesSet') are valid
+            pending = deque()
+            for X in chunks:
+                pending.append(pool.apply_async(_predict_chunk, ((X, fuzzy),)))
+                if len(pending) >= n_jobs * prefetch:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+
     def score(self, X_test, y):
         """ Function that calculates the accuracy of the classification.
     
@@ -183,6 +409,144 @@ class NC:
         return (self.labels == y).sum() / float(y.shape[0])
     
     
+    def save(self, path):
+        """ Function that stores the classifier in a binary file (see 'storage.save_arrays'): the centroids, the
+        classes, the mean and standard deviation of each class, the envelopes of the centroids used by the search and
+        the parameters and inertias of the training.
+
+        :param path: Path of the file.
+        """
+        if not getattr(self, 'centroids', None):
+            raise Exception('Error: Fit the data first')
+
+        lengths = [len(c) for c in self.centroids]
+        arrays = {
+            'centroids': np.concatenate([np.asarray(c, dtype=np.float64) for c in self.centroids]),
+            'offsets': np.cumsum([0] + lengths),
+        }
+
+        numeric = np.asarray(self.classes).dtype.kind in 'biuf'
+        if numeric:
+            arrays['classes'] = np.asarray(self.classes, dtype=np.float64)
+
+        series = getattr(self, 'series', None)
+        if series is not None:
+            stats = [mean_std(np.asarray(S, dtype=np.float64)) for S in series]
+            arrays['media'] = [m for m, _ in stats]
+            arrays['std'] = [d for _, d in stats]
+
+        sizes = []
+        if self.search is not None:
+            for size, (U, L) in sorted(self.search.envelopes.items()):
+                arrays['U_{}'.format(size)] = U
+                arrays['L_{}'.format(size)] = L
+                sizes.append(int(size))
+
+        meta = {
+            'ga': self.ga,
+            'params_ga': self.params_ga,
+            'distance': self.distance,
+            'window': self.window,
+            'classes': None if numeric else [str(c) for c in self.classes],
+            'classes_dtype': np.asarray(self.classes).dtype.str,
+            'envelopes': sizes,
+            'inertia': float(self.inertia),
+            'inertias': [float(i) for i in getattr(self, 'inertias', [])],
+            'n_series': [len(S) for S in series] if series is not None else None,
+        }
+        storage.save_arrays(path, arrays, json.loads(json.dumps(meta, default=str)))
+
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Function that creates a classifier from a file written by :meth:`save`. The centroids and the envelopes
+        are views of the memory-mapped file, so nothing is calculated nor copied.
+
+        :param path: Path of the file.
+        :param mmap: If False, the file is read into memory.
+
+        :return: Object of the class 'NC' ready to predict. It cannot be updated with 'partial_fit' (see it).
+        """
+        arrays, meta = storage.load_arrays(path, mmap=mmap)
+
+        nc = cls(ga=meta['ga'], params_ga=meta['params_ga'], distance=meta['distance'], window=meta['window'])
+        offsets = arrays['offsets'].astype(np.int64)
+        nc.centroids = [arrays['centroids'][offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        if meta['classes'] is None:
+            nc.classes = arrays['classes'].astype(np.dtype(meta['classes_dtype']))
+        else:
+            nc.classes = np.array(meta['classes'], dtype=np.dtype(meta['classes_dtype']))
+        if 'media' in arrays:
+            nc.media, nc.std = arrays['media'], arrays['std']
+        nc.inertia = meta['inertia']
+        nc.inertias = meta['inertias']
+        nc.meta = meta
+
+        envelopes = {size: (arrays['U_{}'.format(size)], arrays['L_{}'.format(size)]) for size in meta['envelopes']}
+        nc.search = nc._search(nc.centroids, envelopes)
+        return nc
+
+
+    def _distance(self, x, c):
+        """ Distance between the series x and the centroid c according to the distance of the classifier.
+        """
+        if self.distance == 'fastdtw':
+            return dtw.fastdtw(x, c, radius=max(1, int(len(x) * self.window)))[0]
+        if self.distance == 'dtw':
+            return dtw.dtw_distance(x, c)
+        return dtw.dtw_distance(x, c, window=self.window, constraint=self.distance)
+
+
+    def _predict_chunk(self, X, fuzzy):
+        """ Classes and, if fuzzy = True, degrees of belief of the series of a chunk.
+        """
+        if not fuzzy:
+            return self.classes[self._nearest(self.search, self.centroids, X)], None
+
+        dists = self._distances(X, self.centroids)
+        index = np.argmin(dists, axis=1)
+        return self.classes[index], np.array([self._membership(d) for d in dists.tolist()])
+
+
+    def _membership(self, dists):
+        """ Degree of belief of belonging to each class given the distances to the centroids.
+        """
+        total = sum(dists)
+        creencias_x = [1 - d / total for d in dists]
+        total_creen = sum(creencias_x)
+        return [cree / total_creen for cree in creencias_x]
+
+
+    def _search(self, C, envelopes=None):
+        """ Object that finds the nearest centroid among C with lower bounds. FastDTW is not supported, so None is
+        returned in that case and the search is exhaustive.
+        """
+        if self.distance == 'fastdtw':
+            return None
+        if self.distance == 'dtw':
+            return CentroidSearch(C, envelopes=envelopes)
+        return CentroidSearch(C, window=self.window, constraint=self.distance, envelopes=envelopes)
+
+
+    def _distances(self, X, C, nearest=False, search=None):
+        """ Matrix of distances between the series of X and the centroids of C. The DTW distances are calculated in
+        n_jobs native threads (see 'dtw.dtw_cdist'). If nearest = True, only the minimum of each row is exact, and the
+        lower bounds of search, if any, avoid calculating most of the distances.
+        """
+        if self.distance == 'fastdtw':
+            return np.array([[self._distance(x, c) for c in C] for x in X]).reshape(len(X), len(C))
+        window, constraint = (None, 'sakoe_chiba') if self.distance == 'dtw' else (self.window, self.distance)
+        lower_bounds = search.bounds(X) if nearest and search is not None else None
+        return dtw.dtw_cdist(X, C, window, constraint, nearest=nearest, lower_bounds=lower_bounds,
+                             n_jobs=self.n_jobs)
+
+
+    def _nearest(self, search, C, X):
+        """ Index of the centroid of C nearest to each series of X.
+        """
+        return np.argmin(self._distances(X, C, nearest=True, search=search), axis=1)
+
+
     def _print(self, n, inertia):
         print('Error class[{}]: {:.3f}'.format(n, inertia))
         print('-' * 25)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+from . import alignment
+from . import cache
+from . import coreset
+from . import crossover
+from . import dataset
+from . import dba
+from . import dtw
+from . import evaluation
+from . import fitness
+from . import generate
+from . import individual
+from . import interpolation
+from . import mutation
+from . import normalizacion
+from . import profiling
+from . import search
+from . import storage
+from . import stream
@@ -0,0 +1,422 @@
+/* Python extension module of the DTW library of dtwf.c. The series are read from any C-contiguous object of the
+   buffer protocol (NumPy arrays, array.array, memoryview) without copying them, and the warping paths are returned as
+   bytearrays of C ints, which NumPy reads without copying (numpy.frombuffer). The computations run without the GIL. */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include "dtwf.c"
+
+
+/* Type of the elements of a series. */
+#define DOUBLE 'd'
+#define FLOAT 'f'
+
+
+static char buffer_type(Py_buffer *view){
+  /* Returns DOUBLE or FLOAT if the buffer contains elements of that type in native order, 0 otherwise. */
+  const char *f = view->format != NULL ? view->format : "B";
+
+  if(f[0] == '@' || f[0] == '=' || f[0] == '<'){
+    f++;
+  }
+  if(f[0] == 'd' && f[1] == 0 && view->itemsize == sizeof(double)){
+    return DOUBLE;
+  }
+  if(f[0] == 'f' && f[1] == 0 && view->itemsize == sizeof(float)){
+    return FLOAT;
+  }
+  return 0;
+}
+
+
+static int get_series(PyObject *obj, Py_buffer *view, char *type, int writable){
+  /* Gets the buffer of a series of doubles or floats. If type is 0 it receives the type of the series, otherwise the
+     series must be of that type. Returns -1 with an exception if the object is not valid. */
+  char t;
+
+  if(PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0)) < 0){
+    return -1;
+  }
+  t = buffer_type(view);
+  if(t == 0 || (*type != 0 && t != *type)){
+    PyErr_SetString(PyExc_TypeError, *type == FLOAT ? "Error: A contiguous buffer of float32 is expected" :
+                    "Error: A contiguous buffer of float64 is expected");
+    PyBuffer_Release(view);
+    return -1;
+  }
+  *type = t;
+  return 0;
+}
+
+
+static int get_ints(PyObject *obj, Py_buffer *view, Py_ssize_t itemsize, int writable){
+  /* Gets the buffer of a vector of signed integers of itemsize bytes (sizeof(int) or sizeof(long)). Returns -1 with an
+     exception if the object is not valid. */
+  const char *f;
+
+  if(PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0)) < 0){
+    return -1;
+  }
+  f = view->format != NULL ? view->format : "B";
+  if(f[0] == '@' || f[0] == '=' || f[0] == '<'){
+    f++;
+  }
+  if(f[0] == 0 || f[1] != 0 || strchr("ilq", f[0]) == NULL || view->itemsize != itemsize){
+    PyErr_SetString(PyExc_TypeError, itemsize == sizeof(int) ? "Error: A contiguous buffer of C ints is expected" :
+                    "Error: A contiguous buffer of C longs is expected");
+    PyBuffer_Release(view);
+    return -1;
+  }
+  return 0;
+}
+
+
+static Py_ssize_t length(Py_buffer *view){
+  return view->len / view->itemsize;
+}
+
+
+static int valid_offsets(long *offsets, int n, Py_ssize_t size){
+  /* Returns 1 if the offsets of the n series are increasing and inside a buffer of size elements, 0 otherwise. */
+  int k;
+
+  if(n < 0 || offsets[0] < 0 || offsets[n] > size){
+    return 0;
+  }
+  for(k=0;k<n;k++){
+    if(offsets[k] > offsets[k+1]){
+      return 0;
+    }
+  }
+  return 1;
+}
+
+
+static PyObject *path_result(struct Result result){
+  /* Tuple (distance, w1, w2) with the indexes of the warping path in two bytearrays of C ints. */
+  PyObject *w1 = PyByteArray_FromStringAndSize((char *)result.w1, sizeof(int)*(Py_ssize_t)result.size);
+  PyObject *w2 = PyByteArray_FromStringAndSize((char *)result.w2, sizeof(int)*(Py_ssize_t)result.size);
+
+  free(result.w1);
+  free(result.w2);
+  if(w1 == NULL || w2 == NULL){
+    Py_XDECREF(w1);
+    Py_XDECREF(w2);
+    return NULL;
+  }
+  return Py_BuildValue("dNN", result.D, w1, w2);
+}
+
+
+static PyObject *py_distance(PyObject *self, PyObject *args){
+  /* distance(x, y, radius, type, cutoff): dtw_distance, or dtw_distance_f32 if the series are float32. */
+  PyObject *ox, *oy;
+  Py_buffer x, y;
+  int radius, type;
+  double cutoff, d;
+  char t = 0;
+
+  if(!PyArg_ParseTuple(args, "OOiid", &ox, &oy, &radius, &type, &cutoff)){
+    return NULL;
+  }
+  if(get_series(ox, &x, &t, 0) < 0){
+    return NULL;
+  }
+  if(get_series(oy, &y, &t, 0) < 0){
+    PyBuffer_Release(&x);
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  if(t == FLOAT){
+    d = dtw_distance_f32(x.buf, y.buf, length(&x), length(&y), radius, type, (float)cutoff);
+    d = isinf(d) ? HUGE_VAL : d;
+  }
+  else{
+    d = dtw_distance(x.buf, y.buf, length(&x), length(&y), radius, type, cutoff);
+  }
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&x);
+  PyBuffer_Release(&y);
+  return PyFloat_FromDouble(d);
+}
+
+
+static PyObject *py_path(PyObject *self, PyObject *args){
+  /* path(x, y, radius, type): dtw. */
+  PyObject *ox, *oy;
+  Py_buffer x, y;
+  int radius, type;
+  struct Result result;
+  char t = DOUBLE;
+
+  if(!PyArg_ParseTuple(args, "OOii", &ox, &oy, &radius, &type)){
+    return NULL;
+  }
+  if(get_series(ox, &x, &t, 0) < 0){
+    return NULL;
+  }
+  if(get_series(oy, &y, &t, 0) < 0){
+    PyBuffer_Release(&x);
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  result = dtw(x.buf, y.buf, length(&x), length(&y), radius, type);
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&x);
+  PyBuffer_Release(&y);
+  return path_result(result);
+}
+
+
+static PyObject *py_fastdtw(PyObject *self, PyObject *args){
+  /* fastdtw(x, y, radius): fastdtw. */
+  PyObject *ox, *oy;
+  Py_buffer x, y;
+  int radius;
+  struct Result result;
+  char t = DOUBLE;
+
+  if(!PyArg_ParseTuple(args, "OOi", &ox, &oy, &radius)){
+    return NULL;
+  }
+  if(get_series(ox, &x, &t, 0) < 0){
+    return NULL;
+  }
+  if(get_series(oy, &y, &t, 0) < 0){
+    PyBuffer_Release(&x);
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  result = fastdtw(x.buf, y.buf, length(&x), length(&y), radius);
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&x);
+  PyBuffer_Release(&y);
+  return path_result(result);
+}
+
+
+static PyObject *py_batch(PyObject *self, PyObject *args){
+  /* batch(c, S, size_s, D, radius, type, cutoff): dtw_batch, or dtw_batch_f32 if the series are float32. S contains
+     the series of length size_s one after the other. D is None or a writable buffer of float64 for the distances.
+     Returns the sum and the number of distances calculated before it was abandoned. */
+  PyObject *oc, *oS, *oD;
+  Py_buffer c, S, D;
+  int size_s, radius, type, n, n_done = 0;
+  double cutoff, total;
+  char t = 0, td = DOUBLE;
+  double *pD = NULL;
+
+  if(!PyArg_ParseTuple(args, "OOiOiid", &oc, &oS, &size_s, &oD, &radius, &type, &cutoff)){
+    return NULL;
+  }
+  if(get_series(oc, &c, &t, 0) < 0){
+    return NULL;
+  }
+  if(get_series(oS, &S, &t, 0) < 0){
+    PyBuffer_Release(&c);
+    return NULL;
+  }
+  n = size_s > 0 ? length(&S) / size_s : 0;
+  if(oD != Py_None){
+    if(get_series(oD, &D, &td, 1) < 0){
+      PyBuffer_Release(&c);
+      PyBuffer_Release(&S);
+      return NULL;
+    }
+    if(length(&D) < n){
+      PyErr_SetString(PyExc_ValueError, "Error: The buffer of the distances is too small");
+      PyBuffer_Release(&c);
+      PyBuffer_Release(&S);
+      PyBuffer_Release(&D);
+      return NULL;
+    }
+    pD = D.buf;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  if(t == FLOAT){
+    total = dtw_batch_f32(c.buf, length(&c), S.buf, n, size_s, pD, radius, type, cutoff, &n_done);
+  }
+  else{
+    total = dtw_batch(c.buf, length(&c), S.buf, n, size_s, pD, radius, type, cutoff, &n_done);
+  }
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&c);
+  PyBuffer_Release(&S);
+  if(pD != NULL){
+    PyBuffer_Release(&D);
+  }
+  return Py_BuildValue("di", total, n_done);
+}
+
+
+static PyObject *py_envelope(PyObject *self, PyObject *args){
+  /* envelope(c, size_q, radius, type, U, L): envelope. U and L are writable buffers of float64 of length size_q. */
+  PyObject *oc, *oU, *oL;
+  Py_buffer c, U, L;
+  int size_q, radius, type;
+  char t = DOUBLE;
+
+  if(!PyArg_ParseTuple(args, "OiiiOO", &oc, &size_q, &radius, &type, &oU, &oL)){
+    return NULL;
+  }
+  if(get_series(oc, &c, &t, 0) < 0){
+    return NULL;
+  }
+  if(get_series(oU, &U, &t, 1) < 0){
+    PyBuffer_Release(&c);
+    return NULL;
+  }
+  if(get_series(oL, &L, &t, 1) < 0){
+    PyBuffer_Release(&c);
+    PyBuffer_Release(&U);
+    return NULL;
+  }
+  if(length(&U) < size_q || length(&L) < size_q){
+    PyErr_SetString(PyExc_ValueError, "Error: The buffers of the envelopes are too small");
+  }
+  else{
+    Py_BEGIN_ALLOW_THREADS
+    envelope(c.buf, length(&c), size_q, radius, type, U.buf, L.buf);
+    Py_END_ALLOW_THREADS
+  }
+
+  PyBuffer_Release(&c);
+  PyBuffer_Release(&U);
+  PyBuffer_Release(&L);
+  if(PyErr_Occurred()){
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+
+static PyObject *py_cdist(PyObject *self, PyObject *args){
+  /* cdist(A, offsets_a, B, offsets_b, D, window, relative, type, cutoff, nearest, lb, order, n_threads): dtw_cdist, or
+     dtw_cdist_f32 if the series are float32. The offsets are buffers of C longs (len(offsets) - 1 series) and D is a
+     writable buffer of float64 (n x m). lb (float64) and order (C ints) are None or buffers of n x m elements. */
+  PyObject *oA, *ooa, *oB, *oob, *oD, *olb, *oorder;
+  Py_buffer A = {0}, offsets_a = {0}, B = {0}, offsets_b = {0}, D = {0}, lb = {0}, order = {0};
+  double window, cutoff;
+  int relative, type, nearest, n_threads, n, m;
+  long *pa, *pb;
+  char t = 0, td = DOUBLE;
+
+  if(!PyArg_ParseTuple(args, "OOOOOdiidiOOi", &oA, &ooa, &oB, &oob, &oD, &window, &relative, &type, &cutoff,
+                       &nearest, &olb, &oorder, &n_threads)){
+    return NULL;
+  }
+  if(get_series(oA, &A, &t, 0) < 0 || get_series(oB, &B, &t, 0) < 0 || get_series(oD, &D, &td, 1) < 0 ||
+     get_ints(ooa, &offsets_a, sizeof(long), 0) < 0 || get_ints(oob, &offsets_b, sizeof(long), 0) < 0 ||
+     (olb != Py_None && get_series(olb, &lb, &td, 0) < 0) ||
+     (oorder != Py_None && get_ints(oorder, &order, sizeof(int), 0) < 0)){
+    goto done;
+  }
+
+  n = (int)length(&offsets_a) - 1;
+  m = (int)length(&offsets_b) - 1;
+  pa = offsets_a.buf;
+  pb = offsets_b.buf;
+  if(!valid_offsets(pa, n, length(&A)) || !valid_offsets(pb, m, length(&B))){
+    PyErr_SetString(PyExc_ValueError, "Error: The offsets do not match the series");
+    goto done;
+  }
+  if(length(&D) < (Py_ssize_t)n*m || (lb.obj != NULL && length(&lb) < (Py_ssize_t)n*m) ||
+     (order.obj != NULL && length(&order) < (Py_ssize_t)n*m)){
+    PyErr_SetString(PyExc_ValueError, "Error: The buffers of the distances or the bounds are too small");
+    goto done;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  if(t == FLOAT){
+    dtw_cdist_f32(A.buf, pa, n, B.buf, pb, m, D.buf, window, relative, type, cutoff, nearest, lb.buf, order.buf,
+                  n_threads);
+  }
+  else{
+    dtw_cdist(A.buf, pa, n, B.buf, pb, m, D.buf, window, relative, type, cutoff, nearest, lb.buf, order.buf,
+              n_threads);
+  }
+  Py_END_ALLOW_THREADS
+
+done:
+  /* the buffers that were not obtained have a NULL object, and releasing them does nothing */
+  PyBuffer_Release(&A);
+  PyBuffer_Release(&offsets_a);
+  PyBuffer_Release(&B);
+  PyBuffer_Release(&offsets_b);
+  PyBuffer_Release(&D);
+  PyBuffer_Release(&lb);
+  PyBuffer_Release(&order);
+  if(PyErr_Occurred()){
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+
+static PyObject *py_segments(PyObject *self, PyObject *args){
+  /* segments(w1, w2, starts): alignment_segments. w1 and w2 are buffers of C ints, and starts a writable one with
+     space for max(len(w1), 1) elements. Returns the number of segments. */
+  PyObject *ow1, *ow2, *ostarts;
+  Py_buffer w1 = {0}, w2 = {0}, starts = {0};
+  Py_ssize_t size;
+  int n = 0;
+
+  if(!PyArg_ParseTuple(args, "OOO", &ow1, &ow2, &ostarts)){
+    return NULL;
+  }
+  if(get_ints(ow1, &w1, sizeof(int), 0) < 0 || get_ints(ow2, &w2, sizeof(int), 0) < 0 ||
+     get_ints(ostarts, &starts, sizeof(int), 1) < 0){
+    goto done;
+  }
+  size = length(&w1);
+  if(length(&w2) != size){
+    PyErr_SetString(PyExc_ValueError, "Error: The indexes of the alignment have different lengths");
+  }
+  else if(length(&starts) < (size > 0 ? size : 1)){
+    PyErr_SetString(PyExc_ValueError, "Error: The buffer of the segments is too small");
+  }
+  else{
+    Py_BEGIN_ALLOW_THREADS
+    n = alignment_segments(w1.buf, w2.buf, (int)size, starts.buf);
+    Py_END_ALLOW_THREADS
+  }
+
+done:
+  PyBuffer_Release(&w1);
+  PyBuffer_Release(&w2);
+  PyBuffer_Release(&starts);
+  if(PyErr_Occurred()){
+    return NULL;
+  }
+  return PyLong_FromLong(n);
+}
+
+
+static PyMethodDef methods[] = {
+  {"distance", py_distance, METH_VARARGS, "DTW distance without the warping path."},
+  {"path", py_path, METH_VARARGS, "DTW distance and warping path."},
+  {"fastdtw", py_fastdtw, METH_VARARGS, "FastDTW distance and warping path."},
+  {"batch", py_batch, METH_VARARGS, "Sum of the squared DTW distances between a series and a set of series."},
+  {"envelope", py_envelope, METH_VARARGS, "Envelopes of a series for LB_Keogh."},
+  {"cdist", py_cdist, METH_VARARGS, "DTW distances between two sets of series, in native threads."},
+  {"segments", py_segments, METH_VARARGS, "Alignment segments of a warping path."},
+  {NULL, NULL, 0, NULL}
+};
+
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT, "_dtwf", "DTW library of dtwf.c.", -1, methods
+};
+
+
+PyMODINIT_FUNC PyInit__dtwf(void){
+  return PyModule_Create(&module);
+}
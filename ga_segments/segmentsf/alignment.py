@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .dtw import dtw, segments
+
+
+def align(G1, G2, window=None, constraint='sakoe_chiba'):
+    """ Function that aligns two individuals with DTW and splits the warping path in alignment segments.
+
+    :param window: Radius of the window of the constrained DTW. None for the unconstrained DTW.
+    :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+
+    :return: Indexes of G1 of the warping path (int32 array).
+    :return: Indexes of G2 of the warping path (int32 array).
+    :return: Positions of the path where each alignment segment starts (see 'dtw.segments').
+    """
+    _, W = dtw(G1, G2, window=window, constraint=constraint)
+    return W[0], W[1], segments(W[0], W[1])
+
+
+class Aligner:
+    """ Class that aligns the parents of the crossover and keeps the alignments of the last pairs of parents, so they
+    are not computed again when the same pair mates again (e.g. individuals that survive several generations). The
+    entries are identified by a digest of the genes of both parents, in order. When the cache is full, the least
+    recently used entry is discarded.
+
+    With a window, the alignment is banded: only the cells of the window are computed, even if the fitness uses the
+    unconstrained DTW.
+    """
+    def __init__(self, maxsize=10000, window=None, constraint='sakoe_chiba'):
+        """
+        :param maxsize: Maximum number of alignments kept. If 0 or None, they are not kept.
+        :param window: Radius of the window of the alignment (see 'dtw.window_args'). None for the unconstrained DTW.
+        :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+        """
+        self.maxsize = maxsize
+        self.window = window
+        self.constraint = constraint
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(G1, G2):
+        """ Function that identifies the pair of parents (G1, G2).
+        """
+        h = hashlib.blake2b(np.asarray(G1, dtype=np.float64).tobytes(), digest_size=16)
+        h.update(hashlib.blake2b(np.asarray(G2, dtype=np.float64).tobytes(), digest_size=16).digest())
+        return h.digest()
+
+    def align(self, G1, G2):
+        """ Function that returns the alignment of G1 and G2 (see 'align'). The returned arrays are shared with the
+        cache, so they must not be modified.
+        """
+        if not self.maxsize:
+            return align(G1, G2, self.window, self.constraint)
+
+        key = self.key(G1, G2)
+        alignment = self.entries.get(key)
+        if alignment is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return alignment
+
+        self.misses += 1
+        alignment = align(G1, G2, self.window, self.constraint)
+        self.entries[key] = alignment
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return alignment
+
+    def __len__(self):
+        return len(self.entries)
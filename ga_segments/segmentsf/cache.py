@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FitnessCache:
+    """ Class that stores the fitness of the evaluated individuals, so that an individual that has already been
+    evaluated w.r.t. the same subset of series is not evaluated again. The entries are identified by a digest of the
+    genes of the individual and of the indexes of the subset. When the cache is full, the least recently used entry is
+    discarded.
+    """
+    def __init__(self, maxsize=100000):
+        """
+        :param maxsize: Maximum number of entries.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def subset_key(idx):
+        """ Function that identifies a subset of series by its indexes. None (the whole set) is identified by b''.
+        """
+        if idx is None:
+            return b''
+        return hashlib.blake2b(np.asarray(idx, dtype=np.int64).tobytes(), digest_size=16).digest()
+
+    @staticmethod
+    def key(individual, subset_key=b''):
+        """ Function that identifies an individual evaluated w.r.t. the subset given by subset_key.
+        """
+        h = hashlib.blake2b(np.asarray(individual, dtype=np.float64).tobytes(), digest_size=16)
+        h.update(subset_key)
+        return h.digest()
+
+    def get(self, key):
+        """ Function that returns the fitness stored with the key, or None if it is not in the cache.
+        """
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
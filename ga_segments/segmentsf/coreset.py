@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+
+
+def paa(S, n_segments):
+    """ Function that reduces each series of S with the Piecewise Aggregate Approximation: the series is split in
+    n_segments segments of (almost) the same length and each segment is replaced by its mean.
+
+    :param S: Set of time series of the same length (2-D array).
+    :param n_segments: Number of segments.
+
+    :return: Reduced set (2-D array of n_segments columns).
+    """
+    S = np.asarray(S, dtype=np.float64)
+    n_segments = max(1, min(n_segments, S.shape[1]))
+    bounds = np.linspace(0, S.shape[1], n_segments + 1).astype(int)
+    return np.add.reduceat(S, bounds[:-1], axis=1) / np.diff(bounds)
+
+
+class Coreset:
+    """ Class that selects a representative subset of a set of series and grows it while the evolution advances.
+
+    The series are ordered as the seeds of k-medoids++: after a random first one, each series is chosen with a
+    probability proportional to the squared distance to the nearest series already chosen. The distance is the
+    euclidean distance between the PAA of the series, which is much cheaper than DTW. The subset is always a prefix of
+    this order, so every subset contains the previous ones.
+
+    The subset starts with a fraction 'size' of the set. When the best fitness of the population has not improved more
+    than a relative 'tol' during 'patience' generations, the subset grows by a factor 'growth', until it contains the
+    whole set.
+    """
+    def __init__(self, S, size=0.05, growth=2., patience=5, tol=1e-3, n_segments=16):
+        """
+        :param S: Set of time series of the same length.
+        :param size: Initial size of the subset, as a proportion of S. The range of this parameter is (0, 1].
+        :param growth: Factor by which the size of the subset is multiplied when the population converges.
+        :param patience: Generations without improvement after which the population is considered converged.
+        :param tol: Minimum relative improvement of the best fitness.
+        :param n_segments: Number of segments of the PAA used to compare the series.
+        """
+        self.n = len(S)
+        self.growth = growth
+        self.patience = patience
+        self.tol = tol
+
+        self.X = paa(S, n_segments)
+        self.order = []
+        self.min_d = np.full(self.n, np.inf)
+
+        self.size = 0
+        self.resize(max(1, int(size * self.n)))
+
+    def resize(self, size):
+        """ Function that extends the order of the series until it contains 'size' series.
+        """
+        self.size = min(size, self.n)
+        while len(self.order) < self.size:
+            if not self.order:
+                j = random.randrange(self.n)
+            else:
+                total = self.min_d.sum()
+                if total > 0:
+                    j = int(np.searchsorted(np.cumsum(self.min_d), random.random() * total, side='right'))
+                    j = min(j, self.n - 1)
+                else:
+                    # all the remaining series are copies of the chosen ones
+                    chosen = set(self.order)
+                    j = random.choice([i for i in range(self.n) if i not in chosen])
+            self.order.append(j)
+            self.min_d = np.minimum(self.min_d, ((self.X - self.X[j]) ** 2).sum(axis=1))
+            self.min_d[j] = 0
+
+        self.best = np.inf
+        self.stall = 0
+
+    def subset(self):
+        """ Function that returns the indexes of the current subset, or None if it is the whole set.
+        """
+        if self.size >= self.n:
+            return None
+        return self.order[:self.size]
+
+    def update(self, best):
+        """ Function that is called after each generation with the best fitness of the population. It grows the subset
+        when the population has converged.
+
+        :param best: Best fitness of the population w.r.t. the current subset.
+
+        :return: True if the subset has grown, so the population must be evaluated again.
+        """
+        if best < self.best * (1 - self.tol):
+            self.best = best
+            self.stall = 0
+        else:
+            self.stall += 1
+
+        if self.stall >= self.patience and self.size < self.n:
+            self.resize(max(self.size + 1, int(self.size * self.growth)))
+            return True
+        return False
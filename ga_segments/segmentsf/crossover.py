@@ -1,43 +1,37 @@
 # -*- coding: utf-8 -*-
 
-from .dtw import dtw
+from .alignment import align
 from .interpolation import interpolate
 import random
 
 
-def crossover(G1, G2):
+def crossover(G1, G2, window=None, constraint='sakoe_chiba', aligner=None):
     """Function that crosses two individuals. First, the alignment segments are calculated. Then, it is randomly chosen
     which sequence of segments will be crossed. Finally they are exchanged interpolating the crossed parts so that the
     resulting individuals have the same length as their parents.
 
+    :param window: Radius of the window of the constrained DTW used in the alignment. None for the unconstrained DTW.
+    :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+    :param aligner: Object of the class 'alignment.Aligner' that computes (and keeps) the alignment. If None, it is
+    computed with window and constraint.
+
     :return: Descendant 1.
     :return: Descendant 2.
     """
 
-    _, W = dtw(G1, G2)
-    W1 = W[0]
-    W2 = W[1]
-    PCs, pc = [], [0]
-    for i in range(1, len(W1)-1):
-
-        if W1[i] != W1[i-1] and W2[i] != W2[i-1] and (W1[i] == W1[i+1] or W2[i] == W2[i+1]):
-            if pc:
-                PCs.append(pc)
-            pc = [i]
-
-        elif W1[i] != W1[i+1] and W2[i] != W2[i+1] and (W1[i] == W1[i-1] or W2[i] == W2[i-1]):
-            PCs.append(pc)
-            pc = [i]
-        else:
-            pc.append(i)
-    PCs.append(pc + [len(W1)-1])
-
-    c1 = random.randint(0, len(PCs)-1)
-    c2 = random.randint(0, len(PCs)-1)
+    if aligner is not None:
+        W1, W2, starts = aligner.align(G1, G2)
+    else:
+        W1, W2, starts = align(G1, G2, window, constraint)
+
+    c1 = random.randint(0, len(starts)-1)
+    c2 = random.randint(0, len(starts)-1)
     if c1 > c2:
         c1, c2 = c2, c1
 
-    pi, pf = PCs[c1][0], PCs[c2][-1]
+    # the segments c1 to c2 are exchanged
+    pi = starts[c1]
+    pf = starts[c2+1]-1 if c2+1 < len(starts) else len(W1)-1
     pi1, pf1 = W1[pi], W1[pf]+1
     pi2, pf2 = W2[pi], W2[pf]+1
 
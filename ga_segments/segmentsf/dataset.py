@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import numpy as np
+
+from . import storage
+from .dtw import precision_dtype
+
+
+class SeriesSet:
+    """ Class that contains a set of series of different lengths stored one after the other in a single array. The
+    series i is data[offsets[i]:offsets[i + 1]], so the series are views of data and the set can be memory-mapped.
+    The DTW functions that receive sets ('dtw.dtw_cdist') use data and offsets directly, without copying them.
+    """
+    def __init__(self, data, offsets):
+        """
+        :param data: Elements of all the series (1-D array).
+        :param offsets: Position in data where each series starts, followed by the length of data (1-D array of
+        len(set) + 1 integers).
+        """
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if isinstance(i, (list, np.ndarray)):
+            idx = np.arange(len(self))[i]
+            return [self[j] for j in idx]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('Error: Index {} out of range'.format(i))
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, idx):
+        """ Function that returns the series of the indexes idx (integers or a boolean mask) as a new set. """
+        series = [self[i] for i in np.arange(len(self))[idx]]
+        data = np.concatenate(series) if series else np.asarray(self.data[:0])
+        return SeriesSet(data, offsets_of([len(x) for x in series]))
+
+
+def as_series_set(data, offsets):
+    """ Function that returns the series of data (see 'SeriesSet') as a matrix, a view of data, if all of them have the
+    same length, and as a 'SeriesSet' otherwise.
+    """
+    lengths = np.diff(offsets)
+    if len(lengths) and np.all(lengths == lengths[0]):
+        return data.reshape(len(lengths), int(lengths[0]))
+    return SeriesSet(data, offsets)
+
+
+def parse_row(line):
+    """ Function that parses a line of a file of the UCR archive: the class followed by the values of the series,
+    separated by commas or blanks. The NaN at the end of the series (padding of the variable-length datasets) are
+    removed.
+
+    :param line: Line of the file.
+
+    :return: Class, or None if the line is blank.
+    :return: Series (float64 array).
+    """
+    row = np.array(line.replace(',', ' ').split(), dtype=np.float64)
+    if len(row) == 0:
+        return None, row
+    valid = np.flatnonzero(~np.isnan(row[1:]))
+    return row[0], row[1:valid[-1] + 2 if len(valid) else 1]
+
+
+def parse_chunks(path, size=1000):
+    """ Function that parses a file of the UCR archive (see 'parse_row') by chunks of consecutive series, so only one
+    chunk is in memory.
+
+    :param path: Path of the file.
+    :param size: Number of series of each chunk.
+
+    :return: Iterator of tuples (classes, elements of the series one after the other, lengths of the series) of each
+    chunk, as float64, float64 and int64 arrays.
+    """
+    with open(path) as f:
+        labels, series = [], []
+        for line in f:
+            label, x = parse_row(line)
+            if label is None:
+                continue
+            labels.append(label)
+            series.append(x)
+            if len(series) == size:
+                yield np.array(labels), np.concatenate(series), np.array([len(x) for x in series], dtype=np.int64)
+                labels, series = [], []
+        if series:
+            yield np.array(labels), np.concatenate(series), np.array([len(x) for x in series], dtype=np.int64)
+
+
+def offsets_of(lengths):
+    """ Function that returns the offsets of a set of series of the given lengths (see 'SeriesSet'). """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def parse_ucr(path, out=None, dtype=np.float64, size=1000):
+    """ Function that reads a file of the UCR archive: one series per line, with the class in the first column, and
+    the values separated by commas or blanks. The series can have different lengths, and the NaN at the end of a
+    series (padding of the variable-length datasets) are removed. The file is parsed by chunks of series (see
+    'parse_chunks').
+
+    :param path: Path of the file.
+    :param out: Binary file in which the elements of the series are written as they are parsed, instead of keeping
+    them in memory.
+    :param dtype: Type of the elements of the series.
+    :param size: Number of series of each chunk.
+
+    :return: Classes (float64 array).
+    :return: Elements of all the series, one after the other (array of dtype), or None if they are written in out.
+    :return: Offsets of the series in the elements (int64 array of len(classes) + 1 elements).
+    """
+    labels, blocks, lengths = [], [], []
+    for chunk_labels, data, chunk_lengths in parse_chunks(path, size):
+        labels.append(chunk_labels)
+        lengths.append(chunk_lengths)
+        if out is None:
+            blocks.append(data.astype(dtype))
+        else:
+            out.write(data.astype(dtype).tobytes())
+
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.float64)
+    offsets = offsets_of(np.concatenate(lengths) if lengths else [])
+    if out is not None:
+        return labels, None, offsets
+    return labels, np.concatenate(blocks) if blocks else np.empty(0, dtype=dtype), offsets
+
+
+def sort_by_class(labels, data, offsets, out=None):
+    """ Function that sorts a set of series by class, keeping their order within each class.
+
+    :param out: Array in which the sorted elements are written (e.g. a memory-mapped one). If None, a new one is
+    created.
+
+    :return: Classes, elements and offsets of the sorted series.
+    """
+    order = np.argsort(labels, kind='stable')
+    lengths = np.diff(offsets)[order]
+    sorted_offsets = offsets_of(lengths)
+    out = np.empty_like(data) if out is None else out
+    for i, start in zip(order, sorted_offsets[:-1]):
+        out[start:start + offsets[i + 1] - offsets[i]] = data[offsets[i]:offsets[i + 1]]
+    return labels[order], out, sorted_offsets
+
+
+def cache_path(path, dtype, sort=False):
+    """ Path of the binary file in which 'load_ucr' keeps the series of path in the type dtype, sorted by class if
+    sort is True.
+    """
+    return '{}.{}{}.bin'.format(path, np.dtype(dtype).name, '.sorted' if sort else '')
+
+
+def mapped(f, dtype, n, mode):
+    """ Function that memory-maps n elements of type dtype of the binary file f. """
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(f, dtype=dtype, mode=mode, shape=(int(n),))
+
+
+def build_cache(path, binary, dtype, sort, meta):
+    """ Function that writes the binary file of 'load_ucr' for the file path. The series are written in a temporary
+    file as they are parsed, and from it to the binary file by blocks (see 'storage.save_arrays'), so they are never
+    all in memory.
+    """
+    directory = os.path.dirname(os.path.abspath(binary))
+    with tempfile.TemporaryFile(dir=directory) as parsed, tempfile.TemporaryFile(dir=directory) as ordered:
+        labels, _, offsets = parse_ucr(path, out=parsed, dtype=dtype)
+        parsed.flush()
+        data = mapped(parsed, dtype, offsets[-1], 'r')
+        if sort:
+            labels, data, offsets = sort_by_class(labels, data, offsets, mapped(ordered, dtype, offsets[-1], 'w+'))
+        storage.save_arrays(binary, {'labels': labels, 'data': data, 'offsets': offsets}, meta)
+
+
+def load_ucr(path, precision='float64', cache=True, mmap=True, sort=False):
+    """ Function that loads a file of the UCR archive (see 'parse_ucr'). The text is only parsed the first time: the
+    series are kept in a binary file next to it (see 'cache_path' and 'storage.save_arrays') that is memory-mapped in
+    the next calls, so they do not need to read the whole file. The binary file is written again if the text file
+    changes. The text is parsed and the binary file written by chunks (see 'build_cache'), so datasets larger than
+    the memory can be loaded.
+
+    The series are returned as a contiguous matrix if all of them have the same length, which 'GA_segments' and 'NC'
+    use without copying it, and as a 'SeriesSet' otherwise.
+
+    :param path: Path of the file.
+    :param precision: Type of the elements of the series, 'float64' or 'float32' (see 'dtw.PRECISIONS').
+    :param cache: If False, the binary file is neither read nor written.
+    :param mmap: If True, the series are memory-mapped from the binary file. If False, they are read into memory.
+    :param sort: If True, the series are sorted by class (keeping their order within each class), so the series of
+    each class are a contiguous block, e.g. for 'NC.fit'.
+
+    :return: Series (2-D array or 'SeriesSet').
+    :return: Classes.
+    """
+    dtype = precision_dtype(precision)
+    stat = os.stat(path)
+    source = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    binary = cache_path(path, dtype, sort)
+
+    arrays = None
+    if cache and os.path.exists(binary):
+        # a binary file that can not be read (e.g. of another version of the format) is written again
+        try:
+            arrays, meta = storage.load_arrays(binary, mmap=mmap)
+        except Exception:
+            arrays, meta = None, {}
+        if meta.get('source') != source:
+            arrays = None
+
+    if arrays is None and cache:
+        build_cache(path, binary, dtype, sort, {'source': source})
+        arrays, _ = storage.load_arrays(binary, mmap=mmap)
+    elif arrays is None:
+        labels, data, offsets = parse_ucr(path, dtype=dtype)
+        if sort:
+            labels, data, offsets = sort_by_class(labels, data, offsets)
+        arrays = {'labels': labels, 'data': data, 'offsets': offsets}
+
+    return as_series_set(arrays['data'], arrays['offsets']), arrays['labels']
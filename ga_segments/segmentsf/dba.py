@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from deap import creator
+
+from .dtw import dtw
+
+
+def dba_update(C, S, window=None, constraint='sakoe_chiba'):
+    """ Function that applies an iteration of DTW Barycenter Averaging (DBA) to the series C: each element of C is
+    replaced by the mean of the elements of the series of S aligned with it.
+
+    :param C: Series that is refined.
+    :param S: Set of time series.
+    :param window: Radius of the window of the constrained DTW used in the alignments. None for the unconstrained DTW.
+    :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+
+    :return: Refined series (float64 array).
+    """
+    C = np.asarray(C, dtype=np.float64)
+    sums = np.zeros(len(C))
+    counts = np.zeros(len(C))
+    for s in S:
+        s = np.asarray(s, dtype=np.float64)
+        _, (w1, w2) = dtw(C, s, window=window, constraint=constraint)
+        np.add.at(sums, w1, s[w2])
+        np.add.at(counts, w1, 1)
+    return sums / counts
+
+
+def refine(individual, S, n_iter=1, window=None, constraint='sakoe_chiba'):
+    """ Function that refines an individual with n_iter iterations of DBA w.r.t. the set S (see 'dba_update'). The
+    individual is not modified.
+
+    :return: New individual, without fitness.
+    """
+    C = np.asarray(individual)
+    for _ in range(n_iter):
+        C = dba_update(C, S, window=window, constraint=constraint)
+    return creator.Individual(C)
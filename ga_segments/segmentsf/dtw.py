@@ -1,53 +1,305 @@
 # -*- coding: utf-8 -*-
 
-import os
-import ctypes
+import numpy as np
 
+# The extension module built by setup.py (see README). It reads the series from any buffer without copying them.
+from . import _dtwf
 
-class result(ctypes.Structure):
-	_fields_ = [
-		('D', ctypes.c_double),
-		('w1', ctypes.POINTER(ctypes.c_int)),
-		('w2', ctypes.POINTER(ctypes.c_int)),
-		('size', ctypes.c_int)]
 
+# Types of window of the constrained DTW, as defined in dtwf.c.
+CONSTRAINTS = {
+	'sakoe_chiba': 1,
+	'itakura': 2,
+}
 
-dtw_lib = ctypes.cdll.LoadLibrary(os.path.join(os.path.dirname(__file__), 'dtwf.so'))
-dtwf = dtw_lib.dtw
-dtwf.restype = result
 
-fastdtwf = dtw_lib.fastdtw
-fastdtwf.restype = result
+# Default radius of the window of each distance, as a fraction of the length of the series (see 'default_window').
+# 'fastdtw' uses it to calculate its radius, with the value that 'fitness.fitness_fastdtw' had always used.
+WINDOWS = {
+	'sakoe_chiba': 0.1,
+	'itakura': 0.1,
+	'fastdtw': 0.01,
+}
 
-freeptrf = dtw_lib.freeptr
-freeptrf.restype = None
 
+# Precisions of the DTW kernels. 'float32' uses the anti-diagonal kernel of dtwf.c, which is vectorized by the compiler
+# and reads half the memory, at the cost of the rounding errors of float32 (see 'precision_error').
+PRECISIONS = {
+	'float64': np.float64,
+	'float32': np.float32,
+}
 
-def dtw(x, y):
+
+# Number of DTW distances calculated by the functions of this module in the current process, number of cells of
+# their cost matrices (see 'cells') and number of sums of distances abandoned by their cutoff ('dtw_batch'). They are
+# only read and reset by the profiling of the genetic algorithm.
+counters = {
+	'calls': 0,
+	'cells': 0,
+	'abandoned': 0,
+}
+
+
+# Formats of the buffer protocol of the elements of each type.
+BUFFER_FORMATS = {
+	np.float64: ('d', '@d', '=d', '<d'),
+	np.float32: ('f', '@f', '=f', '<f'),
+}
+
+
+def as_array(x, dtype=np.float64):
+	"""Function that returns x as a contiguous array of dtype. If x already is one, it is not copied."""
+	return np.ascontiguousarray(x, dtype=dtype)
+
+
+def as_series(x, dtype=np.float64):
+	"""Function that returns x as a series that the DTW library reads without copying. Any C-contiguous 1-D buffer of
+	dtype (e.g. array.array or memoryview) is used as it is. Otherwise x is converted by 'as_array'.
+	"""
+	if not isinstance(x, np.ndarray):
+		try:
+			view = memoryview(x)
+		except TypeError:
+			return as_array(x, dtype)
+		if view.ndim == 1 and view.c_contiguous and view.format in BUFFER_FORMATS[dtype]:
+			return view
+	return as_array(x, dtype)
+
+
+def precision_dtype(precision):
+	"""Function that returns the type of the elements of a precision."""
+	if precision not in PRECISIONS:
+		raise Exception('Error: Unknown precision {}'.format(precision))
+	return PRECISIONS[precision]
+
+
+def default_window(distance, window=None):
+	"""Function that returns window, or the default window of the distance (see 'WINDOWS') if it is None."""
+	if window is None:
+		return WINDOWS.get(distance)
+	return window
+
+
+def path_arrays(w1, w2):
+	"""Function that returns the alignment computed by the extension module (two bytearrays of C ints) as two int32
+	arrays, without copying it.
+	"""
+	return np.frombuffer(w1, dtype=np.intc), np.frombuffer(w2, dtype=np.intc)
+
+
+def segments(w1, w2):
+	"""Function that splits an alignment in alignment segments: the parts of the warping path between two changes of
+	direction.
+
+	:param w1, w2: alignment between two series (see 'dtw_path').
+
+	:return: positions of the path where each segment starts (int32 array). The first one is 0.
+	"""
+	w1 = np.ascontiguousarray(w1, dtype=np.intc)
+	w2 = np.ascontiguousarray(w2, dtype=np.intc)
+	starts = np.empty(max(len(w1), 1), dtype=np.intc)
+	n = _dtwf.segments(w1, w2, starts)
+	return starts[:n]
+
+
+def cells(size1, size2, radius):
+	"""Function that calculates the number of cells of the cost matrix of the DTW of two series with a window of the
+	given radius (-1 if there is no window). It is an upper bound if the window is 'itakura', and an estimate for
+	fastdtw. 'dtw_batch' and 'dtw_cdist' do not count the distances abandoned by their cutoff.
+	"""
+	if radius < 0:
+		return size1 * size2
+	return size1 * min(size2, 2 * radius + 1)
+
+
+def count(calls, size1, size2, radius):
+	"""Function that adds calls distances between series of lengths size1 and size2 to the counters."""
+	counters['calls'] += calls
+	counters['cells'] += calls * cells(size1, size2, radius)
+
+
+def window_args(window, constraint, size1, size2):
+	"""Function that converts a window into the arguments of the DTW library.
+
+	:param window: Radius of the window. None (no window), number of samples (int) or fraction of the length of the
+	longest series (float).
+	:param constraint: Shape of the window. 'sakoe_chiba' (band of constant radius) or 'itakura' (parallelogram whose
+	radius is maximum in the middle of the series).
+	:param size1: Length of the first series.
+	:param size2: Length of the second series.
+
+	:return: Radius in samples (-1 if there is no window).
+	:return: Type of window.
+	"""
+	if window is None:
+		return -1, 0
+	if constraint not in CONSTRAINTS:
+		raise Exception('Error: Unknown constraint {}'.format(constraint))
+	if isinstance(window, float):
+		window = window * max(size1, size2)
+	return int(window), CONSTRAINTS[constraint]
+
+
+def pack(X, dtype=np.float64):
+	"""Function that stores a set of series in a single contiguous array. If X is a 2-D array of type dtype, or a set
+	whose series are already stored in a single array of type dtype ('dataset.SeriesSet'), it is not copied.
+
+	:return: Contiguous array of type dtype with the elements of all the series.
+	:return: Offsets of the series in the array (long of C), so that the series i is data[offsets[i]:offsets[i+1]].
+	"""
+	if isinstance(X, np.ndarray) and X.ndim == 2:
+		data = as_array(X, dtype).reshape(-1)
+		offsets = np.arange(len(X) + 1, dtype=np.int64) * X.shape[1]
+	elif hasattr(X, 'data') and hasattr(X, 'offsets'):
+		data = as_array(X.data, dtype)
+		offsets = np.asarray(X.offsets, dtype=np.int64)
+	else:
+		X = [as_array(x, dtype) for x in X]
+		data = np.concatenate(X) if X else np.empty(0, dtype=dtype)
+		offsets = np.cumsum([0] + [len(x) for x in X], dtype=np.int64)
+	return data, offsets.astype(np.dtype('long'), copy=False)
+
+
+def dtw_cdist(X, Y, window=None, constraint='sakoe_chiba', cutoff=np.inf, nearest=False, lower_bounds=None,
+			  n_jobs=None, precision='float64'):
+	"""Function that calculates the DTW distance between each series of X and each series of Y in native threads, which
+	run without the GIL.
+
+	:param X: Set of series (2-D array or list of series of different lengths).
+	:param Y: Set of series (2-D array or list of series of different lengths).
+	:param window: Radius of the window that constrains the warping path (see 'window_args'). None for no window.
+	:param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+	:param cutoff: The distances greater than cutoff may be inf.
+	:param nearest: If True, only the minimum of each row is needed: the distance to each series of Y is abandoned
+	as soon as it exceeds the smallest distance of the row found so far. The minimum and its position are exact.
+	:param lower_bounds: Lower bounds of the distances (len(X) x len(Y)), e.g. 'search.CentroidSearch.bounds'. The
+	series of Y of each row are visited in increasing order of their bound, and the distances whose bound exceeds
+	cutoff (or the minimum of the row, if nearest) are not calculated and are inf.
+	:param n_jobs: Number of threads. If None, all cores are used.
+	:param precision: 'float64' or 'float32' (see 'PRECISIONS'). The distances are float64 in both cases.
+
+	:return: Matrix of distances (len(X) x len(Y)).
+	"""
+	dtype = precision_dtype(precision)
+	A, offsets_a = pack(X, dtype)
+	B, offsets_b = pack(Y, dtype)
+	n, m = len(offsets_a) - 1, len(offsets_b) - 1
+	D = np.full((n, m), np.inf)
+	if n == 0 or m == 0:
+		return D
+
+	if window is None:
+		window, relative, wtype = -1., 0, 0
+	else:
+		if constraint not in CONSTRAINTS:
+			raise Exception('Error: Unknown constraint {}'.format(constraint))
+		relative, wtype = int(isinstance(window, float)), CONSTRAINTS[constraint]
+
+	order = None
+	if lower_bounds is not None:
+		lower_bounds = as_array(lower_bounds)
+		order = np.ascontiguousarray(np.argsort(lower_bounds, axis=1, kind='stable'), dtype=np.intc)
+
+	_dtwf.cdist(A, offsets_a, B, offsets_b, D, window, relative, wtype, cutoff, int(nearest), lower_bounds, order,
+				n_jobs or 0)
+
+	# with pruning, the distances skipped by their bound or abandoned are inf, and they are not counted
+	lengths_a, lengths_b = np.diff(offsets_a), np.diff(offsets_b)
+	if window < 0:
+		cells_ab = np.multiply.outer(lengths_a, lengths_b)
+	else:
+		radius = window * np.maximum.outer(lengths_a, lengths_b) if relative else np.full((n, m), window)
+		cells_ab = lengths_a[:, None] * np.minimum(lengths_b[None, :], 2 * radius.astype(int) + 1)
+	if nearest or lower_bounds is not None or cutoff < np.inf:
+		done = np.isfinite(D)
+		counters['calls'] += int(done.sum())
+		counters['cells'] += int(cells_ab[done].sum())
+	else:
+		counters['calls'] += n * m
+		counters['cells'] += int(cells_ab.sum())
+	return D
+
+
+def precision_error(X, Y, window=None, constraint='sakoe_chiba'):
+	"""Function that measures the accuracy of the float32 kernel w.r.t. the float64 one on the pairs of series of X and
+	Y, e.g. before using precision='float32' on a dataset.
+
+	:return: Maximum relative error of the float32 distances.
+	:return: Proportion of the series of X whose nearest series of Y changes.
+	"""
+	D64 = dtw_cdist(X, Y, window, constraint)
+	D32 = dtw_cdist(X, Y, window, constraint, precision='float32')
+	error = np.abs(D32 - D64) / np.maximum(D64, np.finfo(np.float64).tiny)
+	changes = np.mean(np.argmin(D32, axis=1) != np.argmin(D64, axis=1)) if D64.size else 0.
+	return float(error.max()) if error.size else 0., float(changes)
+
+
+def dtw_distance(x, y, window=None, constraint='sakoe_chiba', cutoff=np.inf, precision='float64'):
+	"""Function that calculates the distance DTW between two time series. Only two rows of the cost matrix are kept, so
+	the warping path is not computed. Use it when the alignment is not needed.
+
+	:param window: Radius of the window that constrains the warping path (see 'window_args'). None for no window.
+	:param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+	:param cutoff: The computation is abandoned as soon as the distance is known to be greater than cutoff.
+	:param precision: 'float64' or 'float32' (see 'PRECISIONS').
+
+	:return: Distance between series, or inf if it is greater than cutoff.
+	"""
+	dtype = precision_dtype(precision)
+	x_arr = as_series(x, dtype)
+	y_arr = as_series(y, dtype)
+	radius, wtype = window_args(window, constraint, len(x_arr), len(y_arr))
+	count(1, len(x_arr), len(y_arr), radius)
+
+	return _dtwf.distance(x_arr, y_arr, radius, wtype, cutoff)
+
+
+def envelope(c, size_q, window=None, constraint='sakoe_chiba'):
+	"""Function that calculates the upper and lower envelopes of the series c used by LB_Keogh.
+
+	:param c: Time series.
+	:param size_q: Length of the series that will be compared with c.
+	:param window: Radius of the window that constrains the warping path (see 'window_args'). None for no window.
+	:param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+
+	:return: Upper envelope. Maximum of c in the window of each element of the query.
+	:return: Lower envelope. Minimum of c in the window of each element of the query.
+	"""
+	c_arr = as_series(c)
+	radius, wtype = window_args(window, constraint, size_q, len(c_arr))
+	U = np.empty(size_q, dtype=np.float64)
+	L = np.empty(size_q, dtype=np.float64)
+
+	_dtwf.envelope(c_arr, size_q, radius, wtype, U, L)
+
+	return U, L
+
+
+def dtw_path(x, y, window=None, constraint='sakoe_chiba'):
 	"""Function that calculates the distance DTW and the alignment between two time series.
 
+	:param window: Radius of the window that constrains the warping path (see 'window_args'). None for no window.
+	:param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+
 	:return: Distance between series.
-	:return: alignment between series
+	:return: alignment between series, as two int32 arrays of indexes of x and y.
 	"""
-	x_arr = (ctypes.c_double * len(x))(*x)
-	y_arr = (ctypes.c_double * len(y))(*y)
+	x_arr = as_series(x)
+	y_arr = as_series(y)
 
-	x_len = len(x)
-	y_len = len(y)
+	x_len = len(x_arr)
+	y_len = len(y_arr)
 
-	resultado = dtwf(x_arr, y_arr, x_len, y_len)
-	D = resultado.D
-	size = resultado.size
+	radius, wtype = window_args(window, constraint, x_len, y_len)
+	count(1, x_len, y_len, radius)
 
-	w1, w2 = [], []
-	for i in range(size):
-		w1.append(resultado.w1[i])
-		w2.append(resultado.w2[i])
+	D, w1, w2 = _dtwf.path(x_arr, y_arr, radius, wtype)
 
-	freeptrf(resultado.w1)
-	freeptrf(resultado.w2)
+	return D, path_arrays(w1, w2)
 
-	return D, (w1, w2)
+
+# Alias of dtw_path used by the operators that need the alignment.
+dtw = dtw_path
 
 
 def fastdtw(x, y, radius):
@@ -60,24 +312,52 @@ def fastdtw(x, y, radius):
 	:param radius: window radiud
 
 	:return: Distance between series.
-	:return: alignment between series.
+	:return: alignment between series, as two int32 arrays of indexes of x and y.
 	"""
-	x_arr = (ctypes.c_double * len(x))(*x)
-	y_arr = (ctypes.c_double * len(y))(*y)
+	x_arr = as_series(x)
+	y_arr = as_series(y)
+
+	x_len = len(x_arr)
+	y_len = len(y_arr)
+	count(1, x_len, y_len, radius)
+
+	D, w1, w2 = _dtwf.fastdtw(x_arr, y_arr, radius)
+
+	return D, path_arrays(w1, w2)
 
-	x_len = len(x)
-	y_len = len(y)
 
-	resultado = fastdtwf(x_arr, y_arr, x_len, y_len, radius)
-	D = resultado.D
-	size = resultado.size
+def dtw_batch(x, S, distances=False, window=None, constraint='sakoe_chiba', cutoff=np.inf, precision='float64'):
+	"""Function that calculates the distance DTW between the series x and each series of the set S in a single native
+	call. The warping paths are not computed.
+
+	:param x: Time series.
+	:param S: Set of time series of the same length. A contiguous 2-D array of the type of the precision is used
+	without copying.
+	:param distances: If True, the vector of distances is also returned.
+	:param window: Radius of the window that constrains the warping path (see 'window_args'). None for no window.
+	:param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+	:param cutoff: The computation is abandoned as soon as the sum is known to be greater than cutoff. In that case,
+	a lower bound of the sum not less than cutoff is returned, and the distances not calculated are inf.
+	:param precision: 'float64' or 'float32' (see 'PRECISIONS'). The sum is accumulated in float64 in both cases.
+
+	:return: Sum of the squared distances.
+	:return: Distance between x and each series of S (only if distances = True).
+	"""
+	dtype = precision_dtype(precision)
+	x_arr = as_series(x, dtype)
+	S_arr = as_array(S, dtype)
+
+	n, size_s = S_arr.shape
+	D = np.full(n, np.inf) if distances else None
+	radius, wtype = window_args(window, constraint, size_s, len(x_arr))
 
-	w1, w2 = [], []
-	for i in range(size):
-		w1.append(resultado.w1[i])
-		w2.append(resultado.w2[i])
+	total, n_done = _dtwf.batch(x_arr, S_arr, size_s, D, radius, wtype, cutoff)
 
-	freeptrf(resultado.w1)
-	freeptrf(resultado.w2)
+	# only the distances calculated before the sum was abandoned are counted
+	count(n_done, size_s, len(x_arr), radius)
+	if n_done < n:
+		counters['abandoned'] += 1
 
-	return D, (w1, w2)
+	if distances:
+		return total, D
+	return total
@@ -1,9 +1,16 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <math.h>
+#include <pthread.h>
+#include <unistd.h>
 
 #define INF 9999999;
 
+#define NO_WINDOW 0
+#define SAKOE_CHIBA 1
+#define ITAKURA 2
+
 
 struct Result{
   double D;
@@ -19,7 +26,7 @@ struct Vector{
 };
 
 
-double min(double a, double b, double c){
+static inline double min(double a, double b, double c){
   double minimo;
   if(a<=b && a<=c){
     minimo = a;
@@ -35,21 +42,22 @@ double min(double a, double b, double c){
 }
 
 
-int min2(int a, int b){
+static inline int min2(int a, int b){
   if(a <= b)
     return a;
   return b;
 }
 
-int max2(int a, int b){
+static inline int max2(int a, int b){
   if(a>=b)
     return a;
   return b;
 }
 
 
-double min_arg(double a, double b, double c){
-  double minimo;
+static inline int min_arg(double a, double b, double c){
+  /* Position (0, 1 or 2) of the minimum of a, b and c. */
+  int minimo;
   if(a<=b && a<=c){
     minimo = 0;
   }
@@ -64,7 +72,7 @@ double min_arg(double a, double b, double c){
 }
 
 
-double absolut(double x){
+static inline double absolut(double x){
   if(x<0){
    x *= (-1);
   }
@@ -82,55 +90,59 @@ int* reverse(int *w, int size){
 }
 
 
-double dist(double x1, double x2){
+static inline double dist(double x1, double x2){
   return absolut(x2 - x1);
 }
 
 
 struct Result dtw_(double *s1, double *s2, int size1, int size2, int (*window)[2], int wind){ 
+  /* DTW distance and warping path between s1 and s2. The cost matrix is stored in a single contiguous block of
+     size1 x size2 doubles, the cell (i, j) being M(i, j). */
   int i, j, *w1, *w2, min_pos, iw=1, iw1=size1-1, iw2=size2-1;
   struct Result result; 
   
-  double **dtwmatrix = (double**)malloc(sizeof(double*)*size1);
-  for(int i=0;i<size1;i++){
-  	dtwmatrix[i] = (double*)malloc(sizeof(double)*size2);
-  	memset(dtwmatrix[i], 9999999, sizeof(double)*size2);
-  }
+  double *dtwmatrix = (double*)malloc(sizeof(double)*size1*size2);
+#define M(i, j) dtwmatrix[(long)(i)*size2 + (j)]
 
-  w1 = malloc(sizeof(double)*(size1+size2));
-  w2 = malloc(sizeof(double)*(size1+size2));
-  
-  dtwmatrix[0][0] = dist(s1[0], s2[0]);
+  w1 = malloc(sizeof(int)*(size1+size2));
+  w2 = malloc(sizeof(int)*(size1+size2));
   
   if(wind == 0){
+    M(0, 0) = dist(s1[0], s2[0]);
     for(i=1;i<size1;i++){
-      dtwmatrix[i][0] = dist(s1[i], s2[0]) + dtwmatrix[i-1][0];
+      M(i, 0) = dist(s1[i], s2[0]) + M(i-1, 0);
     }
     for(i=1;i<size2;i++){
-      dtwmatrix[0][i] = dist(s1[0], s2[i]) + dtwmatrix[0][i-1];
+      M(0, i) = dist(s1[0], s2[i]) + M(0, i-1);
     }
     for(i=1;i<size1;i++){
       for(j=1;j<size2;j++){
-				dtwmatrix[i][j] = dist(s1[i], s2[j]) + min(dtwmatrix[i-1][j-1],
-				dtwmatrix[i-1][j],
-				dtwmatrix[i][j-1]);
+				M(i, j) = dist(s1[i], s2[j]) + min(M(i-1, j-1),
+				M(i-1, j),
+				M(i, j-1));
       }
     }
   }
   else{
-    for(i=1;window[i][0]==0;i++){
-      dtwmatrix[i][0] = dist(s1[i], s2[0]) + dtwmatrix[i-1][0];
+    /* the cells outside the window are not reachable */
+    for(i=0;i<size1*size2;i++){
+      dtwmatrix[i] = HUGE_VAL;
+    }
+    M(0, 0) = dist(s1[0], s2[0]);
+
+    for(i=1;i<size1 && window[i][0]==0;i++){
+      M(i, 0) = dist(s1[i], s2[0]) + M(i-1, 0);
     }
 
     for(i=1;i<=window[0][1];i++){
-      dtwmatrix[0][i] = dist(s1[0], s2[i]) + dtwmatrix[0][i-1];
+      M(0, i) = dist(s1[0], s2[i]) + M(0, i-1);
     }
     
     for(i=1;i<size1;i++){
       for(j=max2(1,window[i][0]);j<=window[i][1];j++){
-				dtwmatrix[i][j] = dist(s1[i], s2[j]) + min(dtwmatrix[i-1][j-1],
-				dtwmatrix[i-1][j],
-				dtwmatrix[i][j-1]);
+				M(i, j) = dist(s1[i], s2[j]) + min(M(i-1, j-1),
+				M(i-1, j),
+				M(i, j-1));
       }
     }
   }
@@ -138,9 +150,9 @@ struct Result dtw_(double *s1, double *s2, int size1, int size2, int (*window)[2
   w2[0] = size2-1;
     
   while(iw1>0 && iw2>0){
-  	min_pos = min_arg(dtwmatrix[iw1-1][iw2-1],
-			  dtwmatrix[iw1-1][iw2],
-			  dtwmatrix[iw1][iw2-1]);
+  	min_pos = min_arg(M(iw1-1, iw2-1),
+			  M(iw1-1, iw2),
+			  M(iw1, iw2-1));
 	if(min_pos == 1){
 	  w1[iw] = iw1-1;
 	  w2[iw] = iw2;
@@ -178,21 +190,574 @@ struct Result dtw_(double *s1, double *s2, int size1, int size2, int (*window)[2
   w1 = reverse(w1, iw);
   w2 = reverse(w2, iw);
 
-  result.D = dtwmatrix[size1-1][size2-1];
+  result.D = M(size1-1, size2-1);
   result.w1 = w1;
   result.w2 = w2;
   result.size = iw;
   
-  
-  for(int i=0;i<size1;i++)
-  	free(dtwmatrix[i]);
+#undef M
   free(dtwmatrix);
   
-  
   return result;
 }
 
 
+double dtw_rows_(double *s1, double *s2, int size1, int size2, double *prev, double *curr, double cutoff){
+  /* DTW distance between s1 and s2 keeping only two rows of the cost matrix. prev and curr must have room for size2
+     elements. As every warping path crosses all the rows, the minimum of a row is a lower bound of the distance: if it
+     exceeds cutoff the computation is abandoned and HUGE_VAL is returned. */
+  int i, j;
+  double *tmp, row_min;
+
+  prev[0] = dist(s1[0], s2[0]);
+  for(j=1;j<size2;j++){
+    prev[j] = dist(s1[0], s2[j]) + prev[j-1];
+  }
+  if(prev[0] > cutoff){
+    return HUGE_VAL;
+  }
+  for(i=1;i<size1;i++){
+    curr[0] = dist(s1[i], s2[0]) + prev[0];
+    row_min = curr[0];
+    for(j=1;j<size2;j++){
+      curr[j] = dist(s1[i], s2[j]) + min(prev[j-1], prev[j], curr[j-1]);
+      if(curr[j] < row_min){
+        row_min = curr[j];
+      }
+    }
+    if(row_min > cutoff){
+      return HUGE_VAL;
+    }
+    tmp = prev;
+    prev = curr;
+    curr = tmp;
+  }
+
+  return prev[size2-1];
+}
+
+
+void connect_window(int size1, int size2, int (*w)[2]){
+  /* Adjusts the limits of a window so that it contains at least one warping path from (0, 0) to
+     (size1-1, size2-1). */
+  int i;
+
+  w[0][0] = 0;
+  w[size1-1][1] = size2-1;
+  for(i=0;i<size1;i++){
+    w[i][0] = max2(0, min2(w[i][0], size2-1));
+    w[i][1] = max2(w[i][0], min2(w[i][1], size2-1));
+  }
+  for(i=1;i<size1;i++){
+    w[i][0] = max2(w[i][0], w[i-1][0]);
+    w[i][1] = max2(w[i][1], w[i-1][1]);
+    if(w[i][0] > w[i-1][1]+1){
+      w[i-1][1] = w[i][0]-1;
+    }
+  }
+}
+
+
+void build_window(int size1, int size2, int radius, int type, int (*w)[2]){
+  /* Limits of each row of a constrained DTW. The band follows the diagonal from (0, 0) to (size1-1, size2-1).
+     SAKOE_CHIBA: the band has a constant radius.
+     ITAKURA: parallelogram whose radius grows linearly from 0 at the ends to radius in the middle. */
+  double c, r;
+
+  for(int i=0;i<size1;i++){
+    c = size1 > 1 ? (double)i*(size2-1)/(size1-1) : 0;
+    r = radius;
+    if(type == ITAKURA && size1 > 1){
+      r = 2.0*radius*min2(i, size1-1-i)/(size1-1);
+    }
+    w[i][0] = (int)floor(c - r);
+    w[i][1] = (int)ceil(c + r);
+  }
+  connect_window(size1, size2, w);
+}
+
+
+double dtw_rows_window_(double *s1, double *s2, int size1, int size2, int (*w)[2], double *prev, double *curr,
+                        double cutoff){
+  /* DTW distance between s1 and s2 inside the window w keeping only two rows of the cost matrix. Only the cells of
+     each row inside the window are written, the rest are taken as infinite. The computation is abandoned as in
+     dtw_rows_ when the minimum of a row exceeds cutoff. */
+  int i, j, lo, hi, plo, phi;
+  double *tmp, diag, up, left, row_min;
+
+  prev[0] = dist(s1[0], s2[0]);
+  for(j=1;j<=w[0][1];j++){
+    prev[j] = dist(s1[0], s2[j]) + prev[j-1];
+  }
+  if(prev[0] > cutoff){
+    return HUGE_VAL;
+  }
+  for(i=1;i<size1;i++){
+    lo = w[i][0];
+    hi = w[i][1];
+    plo = w[i-1][0];
+    phi = w[i-1][1];
+    row_min = HUGE_VAL;
+    for(j=lo;j<=hi;j++){
+      diag = (j > plo && j-1 <= phi) ? prev[j-1] : HUGE_VAL;
+      up = (j >= plo && j <= phi) ? prev[j] : HUGE_VAL;
+      left = j > lo ? curr[j-1] : HUGE_VAL;
+      curr[j] = dist(s1[i], s2[j]) + min(diag, up, left);
+      if(curr[j] < row_min){
+        row_min = curr[j];
+      }
+    }
+    if(row_min > cutoff){
+      return HUGE_VAL;
+    }
+    tmp = prev;
+    prev = curr;
+    curr = tmp;
+  }
+
+  return prev[size2-1];
+}
+
+
+static inline float min3f(float a, float b, float c){
+  float m = a < b ? a : b;
+  return m < c ? m : c;
+}
+
+
+float dtw_wavefront_f32(float *s1, float *s2r, int size1, int size2, int (*w)[2], float *buf, float cutoff){
+  /* DTW distance between s1 and s2 in float32. s2r is s2 reversed. The cost matrix is traversed by anti-diagonals
+     (i + j = k): the cells of a diagonal only depend on the two previous diagonals, so the inner loop has no carried
+     dependency and reads s1 and s2r contiguously, which allows the compiler to vectorize it. buf must have room for
+     3*(size1+2) floats: three diagonals indexed by i+1, with infinite cells at both ends.
+     If w is not NULL, only the cells of each diagonal inside the window w are calculated. As every warping path crosses one of any two
+     consecutive diagonals, the computation is abandoned (INFINITY is returned) when the minimum of two consecutive
+     diagonals exceeds cutoff. */
+  float *d2 = buf, *d1 = buf + size1 + 2, *d0 = buf + 2*(size1 + 2), *tmp;
+  float dmin, prev_min = INFINITY;
+  int i, k, ilo, ihi, wlo = 0, whi = 0;
+  float *t2;
+
+  for(i=0;i<3*(size1+2);i++){
+    buf[i] = INFINITY;
+  }
+
+  for(k=0;k<size1+size2-1;k++){
+    if(w == NULL){
+      ilo = max2(0, k-size2+1);
+      ihi = min2(size1-1, k);
+    }
+    else{
+      /* the cells of the window in the diagonal k are the rows i with w[i][0] <= k-i <= w[i][1], an interval that
+         moves forward with k */
+      while(wlo < size1-1 && wlo + w[wlo][1] < k){
+        wlo++;
+      }
+      while(whi < size1-1 && whi + 1 + w[whi+1][0] <= k){
+        whi++;
+      }
+      ilo = wlo;
+      ihi = whi;
+    }
+    t2 = s2r + (size2-1-k);
+    if(k == 0){
+      d0[1] = fabsf(s1[0] - s2r[size2-1]);
+    }
+    else{
+      for(i=ilo;i<=ihi;i++){
+        d0[i+1] = fabsf(s1[i] - t2[i]) + min3f(d2[i], d1[i], d1[i+1]);
+      }
+    }
+    d0[ilo] = INFINITY;
+    d0[ihi+2] = INFINITY;
+
+    dmin = INFINITY;
+    for(i=ilo;i<=ihi;i++){
+      dmin = d0[i+1] < dmin ? d0[i+1] : dmin;
+    }
+    if(dmin > cutoff && prev_min > cutoff){
+      return INFINITY;
+    }
+    prev_min = dmin;
+
+    tmp = d2;
+    d2 = d1;
+    d1 = d0;
+    d0 = tmp;
+  }
+
+  return d1[size1];
+}
+
+
+float dtw_distance_f32(float *s1, float *s2, int size1, int size2, int radius, int type, float cutoff){
+  /* float32 version of dtw_distance, computed by dtw_wavefront_f32. */
+  float d;
+  float *s2r = malloc(sizeof(float)*size2);
+  float *buf = malloc(sizeof(float)*3*(size1+2));
+  int (*w)[2] = NULL;
+  int i;
+
+  for(i=0;i<size2;i++){
+    s2r[i] = s2[size2-1-i];
+  }
+  if(radius >= 0 && type != NO_WINDOW){
+    w = malloc(sizeof(int[2])*size1);
+    build_window(size1, size2, radius, type, w);
+  }
+  d = dtw_wavefront_f32(s1, s2r, size1, size2, w, buf, cutoff);
+
+  free(w);
+  free(buf);
+  free(s2r);
+  return d;
+}
+
+
+double dtw_distance(double *s1, double *s2, int size1, int size2, int radius, int type, double cutoff){
+  /* DTW distance between s1 and s2 without the warping path. If radius >= 0 and type != NO_WINDOW, the warping path
+     is constrained to a window of the given type and radius (in samples). In the unconstrained case, as the distance
+     is symmetric, the rows are built along the shortest series, so only 2*min(size1, size2) doubles are allocated.
+     If the distance is greater than cutoff, HUGE_VAL may be returned instead. */
+  double d;
+
+  if(radius < 0 || type == NO_WINDOW){
+    if(size1 < size2){
+      return dtw_distance(s2, s1, size2, size1, radius, type, cutoff);
+    }
+  }
+
+  double *prev = malloc(sizeof(double)*size2);
+  double *curr = malloc(sizeof(double)*size2);
+  if(radius < 0 || type == NO_WINDOW){
+    d = dtw_rows_(s1, s2, size1, size2, prev, curr, cutoff);
+  }
+  else{
+    int (*w)[2] = malloc(sizeof(int[2])*size1);
+    build_window(size1, size2, radius, type, w);
+    d = dtw_rows_window_(s1, s2, size1, size2, w, prev, curr, cutoff);
+    free(w);
+  }
+  free(prev);
+  free(curr);
+
+  return d;
+}
+
+
+double dtw_batch(double *c, int size_c, double *S, int n, int size_s, double *D, int radius, int type, double cutoff,
+                 int *n_done){
+  /* DTW distance between the series c and each of the n series stored contiguously in S (n x size_s). If D is not
+     NULL the distances are written in it. Returns the sum of the squared distances. The window, if any, is the same
+     for all the series, so it is built only once.
+     The computation is abandoned as soon as the sum is known to exceed cutoff: between two series, or inside the DTW
+     of a series, whose distance can not exceed the square root of what remains until cutoff. In that case a lower
+     bound of the sum (at least cutoff) is returned. If n_done is not NULL, it receives the number of distances
+     calculated (n if the computation has not been abandoned). */
+  double total = 0, d, remaining;
+  int windowed = radius >= 0 && type != NO_WINDOW;
+  int size = windowed ? size_c : min2(size_c, size_s);
+  double *prev = malloc(sizeof(double)*size);
+  double *curr = malloc(sizeof(double)*size);
+  int (*w)[2] = NULL;
+  int k;
+
+  if(windowed){
+    w = malloc(sizeof(int[2])*size_s);
+    build_window(size_s, size_c, radius, type, w);
+  }
+
+  for(k=0;k<n;k++){
+    remaining = cutoff < HUGE_VAL ? sqrt(cutoff - total) : HUGE_VAL;
+    if(windowed){
+      d = dtw_rows_window_(S + (long)k*size_s, c, size_s, size_c, w, prev, curr, remaining);
+    }
+    else if(size_c <= size_s){
+      d = dtw_rows_(S + (long)k*size_s, c, size_s, size_c, prev, curr, remaining);
+    }
+    else{
+      d = dtw_rows_(c, S + (long)k*size_s, size_c, size_s, prev, curr, remaining);
+    }
+    if(d == HUGE_VAL){
+      total = cutoff;
+      break;
+    }
+    if(D != NULL){
+      D[k] = d;
+    }
+    total += d*d;
+    if(total > cutoff){
+      k++;
+      break;
+    }
+  }
+
+  if(n_done != NULL){
+    *n_done = k;
+  }
+  free(w);
+  free(prev);
+  free(curr);
+  return total;
+}
+
+
+struct Cdist{
+  double *A;
+  long *offsets_a;
+  int n;
+  double *B;
+  float *Af;
+  float *Br;
+  long *offsets_b;
+  int m;
+  double *D;
+  double window;
+  int relative;
+  int type;
+  double cutoff;
+  int nearest;
+  double *lb;
+  int *order;
+  int next;
+  pthread_mutex_t lock;
+};
+
+
+void *cdist_worker(void *arg){
+  /* Thread of dtw_cdist. The rows of D are taken one by one from a shared counter, so the threads are balanced even if
+     the series have different lengths. */
+  struct Cdist *t = arg;
+  int windowed = t->window >= 0 && t->type != NO_WINDOW;
+  int i, j, k, size_a, size_b, size, radius, max_b = 0, max_a = 0;
+  double *a, *b, *prev, *curr, cutoff, d;
+  float *buf;
+  int (*w)[2];
+
+  for(j=0;j<t->m;j++){
+    max_b = max2(max_b, (int)(t->offsets_b[j+1] - t->offsets_b[j]));
+  }
+  for(i=0;i<t->n;i++){
+    max_a = max2(max_a, (int)(t->offsets_a[i+1] - t->offsets_a[i]));
+  }
+  size = max2(max_a, max_b);
+  prev = malloc(sizeof(double)*size);
+  curr = malloc(sizeof(double)*size);
+  buf = t->Af != NULL ? malloc(sizeof(float)*3*(max_a+2)) : NULL;
+  w = windowed ? malloc(sizeof(int[2])*max_a) : NULL;
+
+  while(1){
+    pthread_mutex_lock(&t->lock);
+    i = t->next++;
+    pthread_mutex_unlock(&t->lock);
+    if(i >= t->n){
+      break;
+    }
+
+    a = t->A != NULL ? t->A + t->offsets_a[i] : NULL;
+    size_a = t->offsets_a[i+1] - t->offsets_a[i];
+    cutoff = t->cutoff;
+    for(k=0;k<t->m;k++){
+      j = t->order != NULL ? t->order[(long)i*t->m + k] : k;
+      if(t->lb != NULL && t->lb[(long)i*t->m + j] > cutoff){
+        if(t->order != NULL){
+          break;
+        }
+        continue;
+      }
+      b = t->B != NULL ? t->B + t->offsets_b[j] : NULL;
+      size_b = t->offsets_b[j+1] - t->offsets_b[j];
+      if(windowed){
+        radius = t->relative ? (int)(t->window*max2(size_a, size_b)) : (int)t->window;
+        build_window(size_a, size_b, radius, t->type, w);
+      }
+      if(t->Af != NULL){
+        d = dtw_wavefront_f32(t->Af + t->offsets_a[i], t->Br + t->offsets_b[j], size_a, size_b, windowed ? w : NULL,
+                              buf, (float)cutoff);
+        d = isinf(d) ? HUGE_VAL : d;
+      }
+      else if(windowed){
+        d = dtw_rows_window_(a, b, size_a, size_b, w, prev, curr, cutoff);
+      }
+      else if(size_a >= size_b){
+        d = dtw_rows_(a, b, size_a, size_b, prev, curr, cutoff);
+      }
+      else{
+        d = dtw_rows_(b, a, size_b, size_a, prev, curr, cutoff);
+      }
+      t->D[(long)i*t->m + j] = d;
+      if(t->nearest && d < cutoff){
+        cutoff = d;
+      }
+    }
+  }
+
+  free(w);
+  free(buf);
+  free(prev);
+  free(curr);
+  return NULL;
+}
+
+
+void run_cdist(struct Cdist *t, int n_threads){
+  /* Runs the threads of dtw_cdist. */
+  pthread_t *threads;
+  int k, created;
+
+  if(n_threads < 1){
+    n_threads = (int)sysconf(_SC_NPROCESSORS_ONLN);
+  }
+  n_threads = max2(1, min2(n_threads, t->n));
+
+  t->next = 0;
+  pthread_mutex_init(&t->lock, NULL);
+  if(n_threads == 1){
+    cdist_worker(t);
+  }
+  else{
+    threads = malloc(sizeof(pthread_t)*n_threads);
+    for(created=0;created<n_threads;created++){
+      if(pthread_create(&threads[created], NULL, cdist_worker, t) != 0){
+        break;
+      }
+    }
+    /* if a thread can not be created, the calling thread calculates the rows that the others leave */
+    if(created < n_threads){
+      cdist_worker(t);
+    }
+    for(k=0;k<created;k++){
+      pthread_join(threads[k], NULL);
+    }
+    free(threads);
+  }
+  pthread_mutex_destroy(&t->lock);
+}
+
+
+void dtw_cdist(double *A, long *offsets_a, int n, double *B, long *offsets_b, int m, double *D, double window,
+               int relative, int type, double cutoff, int nearest, double *lb, int *order, int n_threads){
+  /* DTW distance between each of the n series of A and each of the m series of B, written in D (n x m). The series i
+     of A is A[offsets_a[i]:offsets_a[i+1]], and the same for B, so they can have different lengths. If window >= 0 and
+     type != NO_WINDOW, the warping paths are constrained to a window of that radius, in samples, or as a fraction of
+     the length of the longest series of each pair if relative is not 0. The distances
+     greater than cutoff may be HUGE_VAL. If nearest is not 0, each row is only exact in its minimum: the distance to
+     each series of B is abandoned when it exceeds the smallest distance of the row found so far (ties included).
+     If lb is not NULL, it contains lower bounds of the distances (n x m), and the distances whose bound exceeds the
+     cutoff (or the smallest distance of the row, if nearest) are not calculated. If order is not NULL, each row of B is
+     visited in the order of the indexes of the same row of order; if they are sorted by increasing bound, the row is
+     finished at the first bound that exceeds the cutoff.
+     The rows are distributed among n_threads threads (all the cores if n_threads < 1). */
+  struct Cdist t = {.A = A, .offsets_a = offsets_a, .n = n, .B = B, .Af = NULL, .Br = NULL, .offsets_b = offsets_b,
+                    .m = m, .D = D, .window = window, .relative = relative, .type = type, .cutoff = cutoff,
+                    .nearest = nearest, .lb = lb, .order = order, .next = 0};
+
+  run_cdist(&t, n_threads);
+}
+
+
+void dtw_cdist_f32(float *A, long *offsets_a, int n, float *B, long *offsets_b, int m, double *D, double window,
+                   int relative, int type, double cutoff, int nearest, double *lb, int *order, int n_threads){
+  /* float32 version of dtw_cdist, computed by dtw_wavefront_f32. */
+  struct Cdist t = {.A = NULL, .offsets_a = offsets_a, .n = n, .B = NULL, .Af = A, .Br = NULL, .offsets_b = offsets_b,
+                    .m = m, .D = D, .window = window, .relative = relative, .type = type, .cutoff = cutoff,
+                    .nearest = nearest, .lb = lb, .order = order, .next = 0};
+  float *Br = malloc(sizeof(float)*(offsets_b[m] > 0 ? offsets_b[m] : 1));
+  long j, k, start, size;
+
+  /* the series of B are reversed once, as dtw_wavefront_f32 reads them backwards */
+  for(j=0;j<m;j++){
+    start = offsets_b[j];
+    size = offsets_b[j+1] - start;
+    for(k=0;k<size;k++){
+      Br[start+k] = B[start+size-1-k];
+    }
+  }
+  t.Br = Br;
+
+  run_cdist(&t, n_threads);
+  free(Br);
+}
+
+
+double dtw_batch_f32(float *c, int size_c, float *S, int n, int size_s, double *D, int radius, int type, double cutoff,
+                     int *n_done){
+  /* float32 version of dtw_batch. The distances are computed in float32 by dtw_wavefront_f32 and added in double. */
+  double total = 0, d, remaining;
+  float *cr = malloc(sizeof(float)*size_c);
+  float *buf = malloc(sizeof(float)*3*(size_s+2));
+  int (*w)[2] = NULL;
+  int k;
+
+  for(k=0;k<size_c;k++){
+    cr[k] = c[size_c-1-k];
+  }
+  if(radius >= 0 && type != NO_WINDOW){
+    w = malloc(sizeof(int[2])*size_s);
+    build_window(size_s, size_c, radius, type, w);
+  }
+
+  for(k=0;k<n;k++){
+    remaining = cutoff < HUGE_VAL ? sqrt(cutoff - total) : HUGE_VAL;
+    d = dtw_wavefront_f32(S + (long)k*size_s, cr, size_s, size_c, w, buf, (float)remaining);
+    if(isinf(d)){
+      total = cutoff;
+      break;
+    }
+    if(D != NULL){
+      D[k] = d;
+    }
+    total += d*d;
+    if(total > cutoff){
+      k++;
+      break;
+    }
+  }
+
+  if(n_done != NULL){
+    *n_done = k;
+  }
+  free(w);
+  free(buf);
+  free(cr);
+  return total;
+}
+
+
+void envelope(double *c, int size_c, int size_q, int radius, int type, double *U, double *L){
+  /* Upper (U) and lower (L) envelopes of the series c for queries of length size_q. U[i] and L[i] are the maximum and
+     the minimum of c inside the window of the row i of the query, so they can be used to calculate LB_Keogh. Without
+     window every row covers the whole series. */
+  int i, j;
+  int (*w)[2] = malloc(sizeof(int[2])*size_q);
+
+  if(radius < 0 || type == NO_WINDOW){
+    for(i=0;i<size_q;i++){
+      w[i][0] = 0;
+      w[i][1] = size_c-1;
+    }
+  }
+  else{
+    build_window(size_q, size_c, radius, type, w);
+  }
+
+  for(i=0;i<size_q;i++){
+    U[i] = c[w[i][0]];
+    L[i] = c[w[i][0]];
+    for(j=w[i][0]+1;j<=w[i][1];j++){
+      if(c[j] > U[i]){
+        U[i] = c[j];
+      }
+      if(c[j] < L[i]){
+        L[i] = c[j];
+      }
+    }
+  }
+
+  free(w);
+}
+
+
 struct Vector reduce_by_half(double *s, int size){
   int limit = size - size%2;
   double* s_reduced = malloc(sizeof(double)*limit/2);
@@ -284,15 +849,37 @@ struct Result fastdtw(double *s1, double *s2, int size1, int size2, int radius){
 }
 
 
-struct Result dtw(double *s1, double *s2, int size1, int size2){
+struct Result dtw(double *s1, double *s2, int size1, int size2, int radius, int type){
   struct Result result;
   int w[1][2];
-  result = dtw_(s1, s2, size1, size2, w, 0); 
+
+  if(radius < 0 || type == NO_WINDOW){
+    result = dtw_(s1, s2, size1, size2, w, 0); 
+  }
+  else{
+    int (*window)[2] = malloc(sizeof(int[2])*size1);
+    build_window(size1, size2, radius, type, window);
+    result = dtw_(s1, s2, size1, size2, window, 1);
+    free(window);
+  }
   
   return result;
 }
 
 
-void freeptr(int *ptr){
-	free(ptr);
+int alignment_segments(int *w1, int *w2, int size, int *starts){
+  /* Splits the warping path (w1, w2) in alignment segments, the parts of the path between two changes of direction
+     (from diagonal to horizontal/vertical or the opposite). Writes in starts the position in the path where each
+     segment starts (the first one is 0) and returns the number of segments. starts must have space for size
+     elements. */
+  int n = 1;
+
+  starts[0] = 0;
+  for(int i=1;i<size-1;i++){
+    if((w1[i] != w1[i-1] && w2[i] != w2[i-1] && (w1[i] == w1[i+1] || w2[i] == w2[i+1])) ||
+       (w1[i] != w1[i+1] && w2[i] != w2[i+1] && (w1[i] == w1[i-1] || w2[i] == w2[i-1]))){
+      starts[n++] = i;
+    }
+  }
+  return n;
 }
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+
+import numpy as np
+
+from . import dtw
+from .fitness import fitness_dtw
+
+
+# State of each worker process. It is loaded once by '_init_worker' when the pool starts, so the series are not sent
+# again with every task.
+_S = None
+_evaluate = None
+
+
+def subset(S, idx):
+    """ Function that returns the series of S given by the indexes idx. If idx is None, S is returned.
+    """
+    if idx is None:
+        return S
+    if isinstance(S, np.ndarray):
+        return S[idx]
+    return [S[i] for i in idx]
+
+
+def evaluate_bounded(evaluate, individual, S, cutoff):
+    """ Function that evaluates an individual passing the cutoff to the fitness function only if it is finite, so
+    fitness functions without early abandoning can also be used. The fitness of an abandoned evaluation is a lower
+    bound not less than cutoff; it is returned greater than cutoff, so that it never ties with an exact fitness and
+    the bounded results can be told apart (fitness > cutoff).
+    """
+    if cutoff < np.inf:
+        fitness = evaluate(individual, S, cutoff=cutoff)
+        if fitness[0] >= cutoff:
+            return max(fitness[0], np.nextafter(cutoff, np.inf)),
+        return fitness
+    return evaluate(individual, S)
+
+
+def _init_worker(S, evaluate):
+    global _S, _evaluate
+    _S = S
+    _evaluate = evaluate
+
+
+def _evaluate_chunk(args):
+    """ Function executed by the workers. Evaluates a chunk of individuals against the subset of series given by its
+    indexes. The increments of the DTW counters of the worker ('dtw.counters') are returned with the fitness values,
+    so they are added to the counters of the main process.
+    """
+    individuals, idx, cutoff = args
+    S = subset(_S, idx)
+    before = dict(dtw.counters)
+    fitnesses = [evaluate_bounded(_evaluate, ind, S, cutoff) for ind in individuals]
+    return fitnesses, {key: dtw.counters[key] - value for key, value in before.items()}
+
+
+class Evaluator:
+    """ Class that evaluates the fitness of a group of individuals w.r.t. a set of series in the current process.
+    """
+    def __init__(self, S, evaluate=fitness_dtw, cache=None):
+        """
+        :param S: Set of series w.r.t. the individuals are evaluated.
+        :param evaluate: Fitness function of the form evaluate(individual, S).
+        :param cache: Object of the class 'cache.FitnessCache'. If None, nothing is cached.
+        """
+        self.S = S
+        self.evaluate = evaluate
+        self.cache = cache
+
+    def map(self, individuals, idx=None, cutoff=np.inf):
+        """ Function that evaluates a group of individuals. If there is a cache, only the individuals that are not in
+        it are evaluated, each of them once even if it is repeated in the group.
+
+        :param individuals: List of individuals.
+        :param idx: Indexes of the series of S used in the evaluation. If None, the whole set is used.
+        :param cutoff: The evaluation of an individual is abandoned when its fitness exceeds cutoff. Its fitness is then
+        a lower bound greater than cutoff (see 'evaluate_bounded'), which is not stored in the cache.
+
+        :return: List with the fitness of each individual.
+        """
+        if self.cache is None:
+            return self._evaluate(individuals, idx, cutoff)
+
+        subset_key = self.cache.subset_key(idx)
+        keys = [self.cache.key(ind, subset_key) for ind in individuals]
+        fitnesses = {}
+        pending = {}
+        for key, ind in zip(keys, individuals):
+            if key in fitnesses or key in pending:
+                continue
+            fitness = self.cache.get(key)
+            if fitness is None:
+                pending[key] = ind
+            else:
+                fitnesses[key] = fitness
+
+        for key, fitness in zip(pending, self._evaluate(list(pending.values()), idx, cutoff)):
+            # a bounded fitness is not the fitness of the individual
+            if fitness[0] < cutoff:
+                self.cache.put(key, fitness)
+            fitnesses[key] = fitness
+
+        self.cache.misses += len(pending)
+        self.cache.hits += len(individuals) - len(pending)
+        return [fitnesses[key] for key in keys]
+
+    def _evaluate(self, individuals, idx, cutoff):
+        S = subset(self.S, idx)
+        return [evaluate_bounded(self.evaluate, ind, S, cutoff) for ind in individuals]
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+
+class PoolEvaluator(Evaluator):
+    """ Class that evaluates the fitness of a group of individuals in parallel with a pool of processes. The set of
+    series is loaded in each worker only once, when the pool is created. In each call the individuals are split in
+    chunks, so each worker receives several individuals and the indexes of the subset only once per chunk.
+    """
+    def __init__(self, S, evaluate=fitness_dtw, cache=None, n_jobs=None, chunks_per_job=4):
+        """
+        :param S: Set of series w.r.t. the individuals are evaluated.
+        :param evaluate: Fitness function of the form evaluate(individual, S). It must be picklable.
+        :param cache: Object of the class 'cache.FitnessCache'. If None, nothing is cached.
+        :param n_jobs: Number of worker processes. If None, all cores are used.
+        :param chunks_per_job: Number of chunks sent to each worker in each call. More chunks balance better the load
+        between workers.
+        """
+        super().__init__(S, evaluate, cache)
+        self.n_jobs = n_jobs if n_jobs is not None else multiprocessing.cpu_count()
+        self.chunks_per_job = chunks_per_job
+        self.pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=(S, evaluate))
+
+    def _evaluate(self, individuals, idx, cutoff):
+        """ The individuals are evaluated in the workers of the pool.
+        """
+        if not individuals:
+            return []
+
+        n_chunks = min(len(individuals), self.n_jobs * self.chunks_per_job)
+        size = -(-len(individuals) // n_chunks)
+        chunks = [([np.asarray(ind) for ind in individuals[i:i + size]], idx, cutoff)
+                  for i in range(0, len(individuals), size)]
+
+        fitnesses = []
+        for chunk, counters in self.pool.map(_evaluate_chunk, chunks):
+            fitnesses.extend(chunk)
+            for key, value in counters.items():
+                dtw.counters[key] += value
+        return fitnesses
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
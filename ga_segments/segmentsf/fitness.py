@@ -1,35 +1,46 @@
 # -*- coding: utf-8 -*-
 
-from .dtw import dtw, fastdtw
+import numpy as np
 
+from .dtw import counters, dtw_batch, fastdtw
 
-def fitness_fastdtw(C, S, vp=0.01):
+
+def fitness_fastdtw(C, S, vp=0.01, cutoff=np.inf):
     """ Function that calculates the fitness of an individual C. To do this, calculate the distance FastDTW between C
     and each serie of the set S.
 
     :param C: Individual.
     :param S: Set of time series.
     :param vp: Window size. Value in the range (0, 1).
+    :param cutoff: The sum stops as soon as it exceeds cutoff, so the fitness is only a lower bound.
 
     :return: Tuple of the form (fitness,) where fitness is the fitness of C w.r.t. the set S.
     """
     fitness = 0
     radio = max(1, int(len(S[0])*vp))
-    for s in S:
+    for i, s in enumerate(S):
         fitness += fastdtw(s, C, radius=radio)[0]**2
+        if fitness > cutoff:
+            if i < len(S) - 1:
+                counters['abandoned'] += 1
+            break
     return fitness,
 
 
-def fitness_dtw(C, S):
+def fitness_dtw(C, S, window=None, constraint='sakoe_chiba', cutoff=np.inf, precision='float64'):
     """ Function that calculates the fitness of an individual C. To do this, calculate the distance DTW between C
-    and each serie of the set S.
+    and each serie of the set S. All the distances are calculated in a single call to the DTW library.
 
     :param C: Individual.
-    :param S: Set of time series.
+    :param S: Set of time series of the same length. If S is a contiguous array of the type of the precision, it is not
+    copied.
+    :param window: Radius of the window of the constrained DTW, in samples (int) or as a fraction of the length of the
+    series (float). None for the unconstrained DTW.
+    :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+    :param cutoff: The evaluation is abandoned as soon as the fitness is known to exceed cutoff, both between two
+    series and inside the DTW of a series. In that case the fitness is a lower bound not less than cutoff.
+    :param precision: Precision of the DTW, 'float64' or 'float32' (see 'dtw.PRECISIONS').
 
     :return: Tuple of the form (fitness,) where fitness is the fitness of C w.r.t. the set S.
     """
-    fitness = 0
-    for s in S:
-        fitness += dtw(s, C)[0]**2
-    return fitness,
+    return dtw_batch(C, S, window=window, constraint=constraint, cutoff=cutoff, precision=precision),
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+import copy
+
+import numpy as np
+
+
+class SeriesArray(np.ndarray):
+    """ Contiguous float64 array used as base class of the individuals ('creator.Individual'). The genes are stored in
+    a single buffer, so the operators work with whole-array operations and the DTW library reads them without copying.
+
+    The class replaces the one that DEAP uses for numpy.ndarray, which builds the arrays from Python lists. The
+    attributes of the individual (e.g. the fitness) are kept when it is copied or pickled.
+    """
+    def __new__(cls, values=()):
+        return np.array(values, dtype=np.float64).view(cls)
+
+    def __deepcopy__(self, memo):
+        copy_ = np.ndarray.copy(self)
+        copy_.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return copy_
+
+    def __reduce__(self):
+        return self.__class__, (np.asarray(self),), self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -9,11 +9,11 @@ def interpolate(x, m):
     :param x: serie.
     :param m: output length of the serie.
 
-    :return: interpolated serie of length m.
+    :return: interpolated serie of length m (float64 array).
     """
     if len(x) == 1:
-        return [x[0]] * m
+        return np.full(m, x[0], dtype=np.float64)
     n = len(x) - 1
     step = n / float(m)
     xs = np.arange(step / 2.0, n, step)
-    return np.interp(xs, range(len(x)), x).tolist()
+    return np.interp(xs, np.arange(len(x)), x)
@@ -19,6 +19,9 @@ def mutation(individual, desp, mu, sigma, sigma_extrem):
 
     Extreme vertical displacement: A gene of the individual is selected and raised or lowered.
 
+    The individual is a float64 array ('individual.SeriesArray'). The vertical displacements modify it in place, the
+    lateral displacement builds a new individual.
+
     :param desp: Maximum size of the displacement.
     :param mu: Average of the Gaussian distribution of the soft vertical mutation.
     :param sigma: Standard deviation of the Gaussian distribution of the soft vertical mutation.
@@ -69,7 +72,7 @@ def mutation(individual, desp, mu, sigma, sigma_extrem):
             s4 = interpolate(individual[c3:c4], len(individual[c3:c4])-d)
             s5 = individual[c4:]
 
-            individual = s1 + s2 + s3 + s4 + s5
+            individual = creator.Individual(np.concatenate((s1, s2, s3, s4, s5)))
 
         elif p < 0.4:
             ant = individual[:]
@@ -88,5 +91,5 @@ def mutation(individual, desp, mu, sigma, sigma_extrem):
         else:
             c = random.randint(0, len(individual)-1)
             individual[c] = individual[c] + random.gauss(mu, sigma_extrem)
-        return creator.Individual(individual),
+        return individual,
         
@@ -2,43 +2,98 @@
 import numpy as np
 
 
+def mean_std(S, chunk_size=2 ** 20):
+    """ Function that calculates the mean and standard deviation of all the elements of a set of time series. The
+    deviation is accumulated by chunks of chunk_size elements, so no temporary array of the size of S is created.
+
+    :param S: Time series set (array, or list of series of different lengths).
+    :return: Mean and standard deviation.
+    """
+    elements = S.reshape(-1) if isinstance(S, np.ndarray) else np.concatenate([np.ravel(s) for s in S])
+    media = np.mean(elements, dtype=np.float64)
+    total = 0.
+    for i in range(0, elements.size, chunk_size):
+        d = elements[i:i + chunk_size] - media
+        total += np.dot(d, d)
+    return media, np.sqrt(total / elements.size)
+
+
 class Normalize:
     """ Class that normalizes and denormalizes sets of time series. For standardization, the mean and standard deviation
      of all elements of all series are used.
+
+    The sets are processed as NumPy arrays with whole-array operations. A set of series of the same length is a 2-D
+    array; a set of series of different lengths is a list of 1-D arrays.
     """
-    def normalize(self, S):
+    # number of elements processed at once when the standard deviation is calculated
+    chunk_size = 2 ** 20
+
+    def __init__(self, dtype=np.float64):
+        """
+        :param dtype: Type of the elements of the normalized series. np.float32 halves the memory of the set.
+        """
+        self.dtype = dtype
+
+    def normalize(self, S, inplace=False, update=True):
         """
         Function that normalizes a set of time series.
         :param S: Time series set.
+        :param inplace: If True and S is an array of type dtype, the result is written in S instead of in a new array.
+        :param update: If False, S is normalized with the mean and standard deviation of the previous set.
         :return: Normalized time series set.
         """
-        elements = []
-        Sn = []
-
-        for s in S:
-            elements.extend(s)
+        S = self._as_set(S)
+        if isinstance(S, list):
+            if update:
+                self.media, self.std = self._mean_std(np.concatenate(S))
+            return [self._normalize(s, inplace) for s in S]
 
-        self.media = np.mean(elements)
-        self.std = np.std(elements)
+        if update:
+            self.media, self.std = self._mean_std(S)
+        return self._normalize(S, inplace)
 
-        for s in S:
-            sn = []
-            for i in range(len(s)):
-                sn.append((self.media - s[i]) / self.std)
-            Sn.append(sn)
-
-        return Sn
-
-    def desnormalize(self, Sn):
+    def desnormalize(self, Sn, inplace=False):
         """
         Function that denormalizes a set of time series, resulting in the original time series.
         :param Sn: Normalized time series set.
+        :param inplace: If True and Sn is an array of type dtype, the result is written in Sn instead of in a new array.
         :return: Unnormalized time series set.
         """
-        S = []
-        for sn in Sn:
-            s = []
-            for i in range(len(sn)):
-                s.append(self.media - self.std * sn[i])
-            S.append(s)
-        return S
+        Sn = self._as_set(Sn)
+        if isinstance(Sn, list):
+            return [self._desnormalize(sn, inplace) for sn in Sn]
+        return self._desnormalize(Sn, inplace)
+
+    def _as_set(self, S):
+        """ The set is converted into a 2-D array if possible. Otherwise, into a list of 1-D arrays.
+        """
+        if isinstance(S, np.ndarray) and S.dtype != object:
+            return S
+        try:
+            return np.asarray(S, dtype=self.dtype)
+        except ValueError:
+            return [np.asarray(s, dtype=self.dtype) for s in S]
+
+    def _mean_std(self, S):
+        """ Mean and standard deviation of all the elements of S (see 'mean_std').
+        """
+        return mean_std(S, self.chunk_size)
+
+    def _out(self, S, inplace):
+        """ Array where the result of an operation on S is written.
+        """
+        if inplace and isinstance(S, np.ndarray) and S.dtype == self.dtype:
+            return S
+        return np.empty(S.shape, dtype=self.dtype)
+
+    def _normalize(self, S, inplace):
+        out = self._out(S, inplace)
+        np.subtract(self.media, S, out=out)
+        np.divide(out, self.std, out=out)
+        return out
+
+    def _desnormalize(self, Sn, inplace):
+        out = self._out(Sn, inplace)
+        np.multiply(Sn, self.std, out=out)
+        np.subtract(self.media, out, out=out)
+        return out
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Profiler:
+    """ Class that accumulates the time spent in each phase of the evolution (e.g. 'select' or 'evaluate'). The times
+    are accumulated until they are collected with 'pop'.
+    """
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def phase(self, name):
+        """ Context in which the time is added to the phase name.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.) + time.time() - start
+
+    def pop(self):
+        """ Function that returns the times accumulated by phase and starts again from zero.
+        """
+        times, self.times = self.times, {}
+        return times
+
+
+def _to_json(value):
+    """ Conversion of the NumPy values that the module json does not know.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError('Error: {} cannot be converted to JSON'.format(type(value).__name__))
+
+
+class JSONLinesWriter:
+    """ Observer of the genetic algorithm (see 'observers' of 'GA_segments') that appends each event to a file as a
+    line of JSON. The file is opened in each event, so the observer can be sent to other processes (e.g. the islands).
+    """
+    def __init__(self, path, append=False):
+        """
+        :param path: Path of the file.
+        :param append: If False, the file is emptied.
+        """
+        self.path = path
+        if not append:
+            open(path, 'w').close()
+
+    def __call__(self, event):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event, default=_to_json) + '\n')
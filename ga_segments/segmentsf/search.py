@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from .dtw import as_array, envelope
+
+
+def lb_kim(x, first, last):
+    """ Function that calculates the lower bound LB_Kim of the DTW distance between the series x and a group of series.
+    Every warping path contains the first and the last pair of elements of both series.
+
+    :param x: Time series.
+    :param first: First element of each series of the group.
+    :param last: Last element of each series of the group.
+
+    :return: Lower bound of the distance between x and each series.
+    """
+    lb = np.abs(first - x[0])
+    if len(x) > 1:
+        lb = lb + np.abs(last - x[-1])
+    return lb
+
+
+def lb_keogh(x, U, L):
+    """ Function that calculates the lower bound LB_Keogh of the DTW distance between the series x and a group of
+    series. Every warping path contains at least one element of each row, so the cost of the element x[i] is at least
+    its distance to the interval [L[i], U[i]].
+
+    :param x: Time series.
+    :param U: Upper envelopes of the group of series, one per row.
+    :param L: Lower envelopes of the group of series, one per row.
+
+    :return: Lower bound of the distance between x and each series.
+    """
+    return (np.maximum(x - U, 0) + np.maximum(L - x, 0)).sum(axis=1)
+
+
+class CentroidSearch:
+    """ Class that calculates the lower bounds of the DTW distances between a set of series and the centroids, with
+    which 'dtw.dtw_cdist' finds the nearest centroid of each series without calculating all the distances. The
+    envelopes of the centroids are calculated once. For each query the lower bounds LB_Kim and LB_Keogh of all the
+    centroids are calculated; 'dtw.dtw_cdist' visits the centroids in increasing order of their bound, abandons each
+    DTW distance as soon as it exceeds the best distance found and stops when the bound of the next centroid is greater
+    than it, so the result is the same as the one of the exhaustive search, ties included.
+    """
+    def __init__(self, C, window=None, constraint='sakoe_chiba', envelopes=None):
+        """
+        :param C: Centroids.
+        :param window: Radius of the window of the constrained DTW. None for the unconstrained DTW.
+        :param constraint: Shape of the window, 'sakoe_chiba' or 'itakura'.
+        :param envelopes: Envelopes already calculated, by length of the query (see 'get_envelopes').
+        """
+        self.C = [as_array(c) for c in C]
+        self.window = window
+        self.constraint = constraint
+        self.first = np.array([c[0] for c in self.C])
+        self.last = np.array([c[-1] for c in self.C])
+        self.envelopes = dict(envelopes or {})
+
+        # the queries usually have the length of the centroids
+        for size in set(len(c) for c in self.C):
+            self.get_envelopes(size)
+
+    def get_envelopes(self, size_q):
+        """ Function that returns the envelopes of the centroids for queries of length size_q. They are calculated the
+        first time that a query of that length is made.
+
+        :return: Upper envelopes.
+        :return: Lower envelopes.
+        """
+        if size_q not in self.envelopes:
+            envelopes = [envelope(c, size_q, self.window, self.constraint) for c in self.C]
+            self.envelopes[size_q] = (np.array([e[0] for e in envelopes]), np.array([e[1] for e in envelopes]))
+        return self.envelopes[size_q]
+
+    def bounds(self, X):
+        """ Function that calculates the lower bounds of the distances between the series of X and the centroids, to
+        be used by 'dtw.dtw_cdist'.
+
+        :param X: Set of series.
+
+        :return: Matrix of bounds (len(X) x number of centroids).
+        """
+        lb = np.empty((len(X), len(self.C)))
+        for i, x in enumerate(X):
+            x = as_array(x)
+            U, L = self.get_envelopes(len(x))
+            lb[i] = np.maximum(lb_kim(x, self.first, self.last), lb_keogh(x, U, L))
+        # the bounds are summed in a different order than the DTW, so they are loosened to absorb rounding errors
+        lb *= 1 - 1e-9
+        return lb
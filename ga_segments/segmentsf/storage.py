@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+
+MAGIC = b'GASEGS\x00\x00'
+VERSION = 1
+# magic, version and length of the header
+PREFIX = struct.Struct('<8sII')
+# types stored as they are; the arrays of other types are stored as float64
+DTYPES = ('<f8', '<f4', '<i8', '<i4')
+# number of elements of an array written at a time
+CHUNK_SIZE = 2**20
+
+
+def save_arrays(path, arrays, meta=None):
+    """ Function that stores a group of arrays in a binary file. The file contains a JSON header, with the position,
+    shape and type of each array and the metadata, followed by a single block with the elements of all the arrays.
+    Every array starts at a multiple of 8 bytes, so it can be memory-mapped. The arrays can be memory-mapped too: they
+    are copied to the file by blocks.
+
+    The file is written in a temporary file of the same directory that then replaces path, so other processes never
+    read a file half written, and those that have the old file memory-mapped keep reading it.
+
+    :param path: Path of the file.
+    :param arrays: Dictionary with the arrays, by name. The arrays of float32, float64, int32 or int64 keep their type,
+    the others are converted into float64.
+    :param meta: Dictionary with metadata that can be converted to JSON.
+    """
+    index = {}
+    offset = 0
+    elements = []
+    for name, a in arrays.items():
+        a = np.asarray(a)
+        dtype = a.dtype.newbyteorder('<').str if a.dtype.kind in 'fi' else None
+        dtype = np.dtype(dtype if dtype in DTYPES else '<f8')
+        index[name] = [offset, list(a.shape), dtype.str]
+        nbytes = a.size * dtype.itemsize
+        offset += nbytes + (-nbytes % 8)
+        elements.append((a.reshape(-1), dtype))
+
+    header = json.dumps({'version': VERSION, 'arrays': index, 'meta': meta or {}}).encode('utf-8')
+    header += b' ' * (-(PREFIX.size + len(header)) % 8)
+
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            # the arrays are written by blocks, so memory-mapped ones are not loaded whole
+            for a, dtype in elements:
+                for start in range(0, len(a), CHUNK_SIZE):
+                    f.write(np.ascontiguousarray(a[start:start + CHUNK_SIZE], dtype=dtype).tobytes())
+                f.write(b'\x00' * (-(a.size * dtype.itemsize) % 8))
+        # mkstemp creates the file only readable by its owner; it gets the permissions of a file created by open
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def load_arrays(path, mmap=True):
+    """ Function that reads a file written by 'save_arrays'. The files of a newer version are rejected.
+
+    :param path: Path of the file.
+    :param mmap: If True, the block of elements is memory-mapped (read-only) instead of read, so the arrays are views
+    of the file that are loaded on demand.
+
+    :return: Dictionary with the arrays, by name.
+    :return: Dictionary with the metadata.
+    """
+    with open(path, 'rb') as f:
+        magic, version, size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise Exception('Error: {} is not a model file'.format(path))
+        if version > VERSION:
+            raise Exception('Error: Version {} of the model file is not supported'.format(version))
+        header = json.loads(f.read(size).decode('utf-8'))
+        if not mmap:
+            data = np.fromfile(f, dtype=np.uint8)
+
+    # position in bytes, shape and type of each array
+    index = {name: (offset, shape, np.dtype(dtype)) for name, (offset, shape, dtype) in header['arrays'].items()}
+
+    if mmap:
+        n = max([offset + int(np.prod(shape)) * dtype.itemsize for offset, shape, dtype in index.values()] + [0])
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=PREFIX.size + size, shape=(n,)) if n else \
+            np.empty(0, dtype=np.uint8)
+
+    arrays = {}
+    for name, (offset, shape, dtype) in index.items():
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = data[offset:offset + nbytes].view(dtype).reshape(shape)
+    return arrays, header['meta']
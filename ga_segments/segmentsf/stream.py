@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from .dataset import as_series_set, offsets_of, parse_chunks
+
+
+def chunks(X, size=1000):
+    """ Function that splits a set of series into chunks of consecutive series. If X is an array (e.g. a memory-mapped
+    one), the chunks are views of it, so only the chunk being processed is loaded.
+
+    :param X: Set of series (array or sequence).
+    :param size: Number of series of each chunk.
+
+    :return: Iterator of chunks.
+    """
+    for i in range(0, len(X), size):
+        yield X[i:i + size]
+
+
+def read_chunks(path, size=1000):
+    """ Function that reads a file of the UCR archive (one series per line, with the class in the first column) by
+    chunks, so the whole file is never in memory. The lines are parsed as in 'dataset.load_ucr' (see
+    'dataset.parse_chunks'), so the values can be separated by commas or blanks and the series can have different
+    lengths.
+
+    :param path: Path of the file.
+    :param size: Number of series of each chunk.
+
+    :return: Iterator of pairs (classes, series) of each chunk, with the series as a 2-D array if all of them have the
+    same length and as a 'dataset.SeriesSet' otherwise.
+    """
+    for labels, data, lengths in parse_chunks(path, size):
+        yield labels, as_series_set(data, offsets_of(lengths))
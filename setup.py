@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from setuptools import setup, Extension
+
+
+# The DTW library of dtwf.c is built as the extension module 'ga_segments.segmentsf._dtwf'.
+dtwf = Extension('ga_segments.segmentsf._dtwf',
+                 sources=['ga_segments/segmentsf/_dtwf.c'],
+                 depends=['ga_segments/segmentsf/dtwf.c'],
+                 extra_compile_args=['-O3', '-pthread'],
+                 extra_link_args=['-pthread'])
+
+with open('requirements.txt') as f:
+    requirements = [line.split('==')[0].strip() for line in f if line.strip()]
+
+setup(name='ga_segments',
+      version='0.1.0',
+      description='An Evolutionary Approach for Efficient Prototyping of Large Time Series Datasets',
+      packages=['ga_segments', 'ga_segments.segmentsf'],
+      ext_modules=[dtwf],
+      install_requires=requirements)
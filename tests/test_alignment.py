@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+""" Alignments of the parents of the crossover kept between generations ('alignment.Aligner'). """
+import random
+
+import numpy as np
+
+from ga_segments.ga import GA_segments
+from ga_segments.segmentsf import alignment
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+def test_aligner():
+    """ A pair of parents is aligned once, in order, and the least recently used alignment is discarded. """
+    G = random_walks(3, 20, 0)
+    aligner = alignment.Aligner(maxsize=2)
+    first = aligner.align(G[0], G[1])
+    assert aligner.align(G[0], G[1]) is first
+    aligner.align(G[1], G[0])
+    aligner.align(G[0], G[2])
+    assert (aligner.hits, aligner.misses, len(aligner)) == (1, 3, 2)
+    for a, b in zip(aligner.align(G[0], G[1]), alignment.align(G[0], G[1])):
+        np.testing.assert_array_equal(a, b)
+    assert (aligner.hits, aligner.misses) == (1, 4)
+
+
+def evolve(S, monkeypatch, **align_params):
+    toolboxes = []
+    register_toolbox = GA_segments.register_toolbox
+
+    def register(self, Sn):
+        toolboxes.append(register_toolbox(self, Sn))
+        return toolboxes[-1]
+
+    monkeypatch.setattr(GA_segments, 'register_toolbox', register)
+    random.seed(0)
+    np.random.seed(0)
+    events = []
+    ga = GA_segments(pop_size=8, ngen=6, align_params=align_params, observers=[events.append])
+    ga.calculate_centroids(S)
+    return toolboxes[0].aligner, events
+
+
+def test_events(monkeypatch):
+    """ The observers receive the hits and misses of the alignments of each generation. """
+    S = random_walks(10, 30, 1)
+    aligner, events = evolve(S, monkeypatch, cache_size=100, window=None)
+    assert len(events) == 7
+    assert events[0]['align_hits'] == events[0]['align_misses'] == 0
+    assert sum(event['align_hits'] for event in events) == aligner.hits
+    assert sum(event['align_misses'] for event in events) == aligner.misses > 0
+
+    _, events = evolve(S, monkeypatch, cache_size=0, window=None)
+    assert all('align_hits' not in event and 'align_misses' not in event for event in events)
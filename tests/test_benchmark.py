@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+""" Benchmark of GA_segments and NC ('benchmark'). """
+import numpy as np
+
+from ga_segments import benchmark
+from ga_segments.segmentsf.dataset import SeriesSet
+
+
+def ragged(n=12, seed=0):
+    rng = np.random.RandomState(seed)
+    series = [np.cumsum(rng.normal(size=rng.randint(20, 30))) for _ in range(n)]
+    return SeriesSet(np.concatenate(series), np.cumsum([0] + [len(x) for x in series])), np.arange(n) % 3 + 1.
+
+
+def test_split_series_set():
+    """ The split of a 'SeriesSet' keeps each series with its class, as the split of a matrix. """
+    X, y = ragged()
+    # the elements of each series are its index
+    X = SeriesSet(np.concatenate([np.full(len(x), i, dtype=np.float64) for i, x in enumerate(X)]), X.offsets)
+    M = np.array([np.full(5, i) for i in range(len(y))], dtype=np.float64)
+
+    X_train, y_train, X_test, y_test = benchmark.split(X, y)
+    M_train, _, M_test, _ = benchmark.split(M, y)
+    assert isinstance(X_train, SeriesSet) and isinstance(X_test, SeriesSet)
+    assert len(X_train) + len(X_test) == len(X)
+    assert sorted(np.unique(y_test)) == [1., 2., 3.]
+    for S, labels, R in ((X_train, y_train, M_train), (X_test, y_test, M_test)):
+        index = [int(x[0]) for x in S]
+        np.testing.assert_array_equal(labels, y[index])
+        np.testing.assert_array_equal(benchmark.lengths(S), X.lengths()[index])
+        np.testing.assert_array_equal(R[:, 0], index)
+
+
+def test_run(tmp_path):
+    """ A dataset of the same length runs every case, and one of different lengths only the DTW. """
+    X, y = ragged()
+    path = str(tmp_path / 'ragged_TRAIN')
+    width = max(X.lengths())
+    with open(path, 'w') as f:
+        for label, x in zip(y, X):
+            f.write(','.join([str(label)] + [repr(float(v)) for v in x] + ['NaN'] * (width - len(x))) + '\n')
+
+    summary = benchmark.run([path], str(tmp_path / 'out'), synthetic=True, batch_sizes=(),
+                            params_ga={'pop_size': 6, 'ngen': 2}, verbose=False)
+    cases = [(row['dataset'], row['case']) for row in summary]
+    assert cases == [('CBF', 'dtw'), ('CBF', 'ga full'), ('CBF', 'nc full'), ('ragged', 'dtw')]
+    X_train = benchmark.split(X, y)[0]
+    assert summary[-1]['length'] == np.mean(X_train.lengths()) and summary[-1]['dtw_calls_per_s'] > 0
+    assert all(np.isfinite(row['fitness']) for row in summary[1:3])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+""" Evaluation of the population w.r.t. a growing coreset of the series (GA_segments(coreset_evaluate=True)). """
+import random
+
+import numpy as np
+import pytest
+
+from ga_segments.ga import GA_segments
+from ga_segments.segmentsf import dtw
+from ga_segments.segmentsf.coreset import Coreset
+from ga_segments.segmentsf.fitness import fitness_dtw
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    return random_walks(40, 40, 0)
+
+
+def test_seeds_cover_clusters():
+    """ The first series of the order are taken from different clusters. """
+    random.seed(0)
+    centers = np.array([0., 100., 200.])
+    S = centers.repeat(10)[:, None] + np.random.RandomState(0).normal(size=(30, 20))
+    core = Coreset(S, size=0.1)
+    assert sorted(np.round(S[core.subset(), 0] / 100.)) == [0., 1., 2.]
+
+
+def test_growth():
+    """ The subset grows after patience generations without improvement, and every subset contains the previous
+    ones, until it is the whole set. """
+    random.seed(0)
+    core = Coreset(random_walks(20, 30, 1), size=0.1, growth=2., patience=2, tol=0.)
+    subsets = [list(core.subset())]
+    assert len(subsets[0]) == 2
+    assert not core.update(10.)
+    assert not core.update(9.)
+    grown = [core.update(9.) for _ in range(2)]
+    assert grown == [False, True]
+    subsets.append(list(core.subset()))
+    assert len(subsets[1]) == 4 and subsets[1][:2] == subsets[0]
+    while core.subset() is not None:
+        core.update(9.)
+    assert sorted(core.order) == list(range(20))
+
+
+def evolve(S, **params):
+    random.seed(0)
+    np.random.seed(0)
+    ga = GA_segments(pop_size=10, ngen=12, **params)
+    calls = dtw.counters['calls']
+    C, fitness, log = ga.calculate_centroids(S)
+    return ga, C, fitness, log, dtw.counters['calls'] - calls
+
+
+def test_evolution(series):
+    params = {'size': 0.1, 'growth': 2., 'patience': 2, 'tol': 1e-3, 'n_segments': 8}
+    ga, C, fitness, log, calls = evolve(series, coreset_evaluate=True, coreset_params=params)
+    _, _, _, _, full_calls = evolve(series)
+
+    subsets = log.select('subset')
+    assert subsets[0] == 4 and all(a <= b for a, b in zip(subsets, subsets[1:]))
+    assert calls < full_calls
+    # the centroid is the best individual of the hall of fame w.r.t. the whole set
+    assert fitness == pytest.approx(min(fitness_dtw(h, series)[0] for h in ga.halloffame))
+    assert fitness == pytest.approx(fitness_dtw(C, series)[0])
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Loading of the files of the UCR archive and their binary cache ('dataset.load_ucr'). """
+import os
+
+import numpy as np
+import pytest
+
+from ga_segments.segmentsf import dataset
+
+
+def write_ucr(path, labels, series, delimiter=','):
+    with open(path, 'w') as f:
+        for label, x in zip(labels, series):
+            f.write(delimiter.join(['{:g}'.format(label)] + [repr(float(v)) for v in x]) + '\n')
+
+
+@pytest.fixture
+def fixed(tmp_path):
+    """ File of series of the same length. """
+    rng = np.random.RandomState(0)
+    labels, series = rng.randint(1, 4, size=30).astype(np.float64), rng.normal(size=(30, 20))
+    path = str(tmp_path / 'fixed_TRAIN')
+    write_ucr(path, labels, series)
+    return path, labels, series
+
+
+@pytest.fixture
+def variable(tmp_path):
+    """ File of series of different lengths, padded with NaN as the variable-length datasets of the archive. """
+    rng = np.random.RandomState(1)
+    lengths = [5, 12, 8, 1, 12, 3]
+    labels = np.array([2., 1., 2., 3., 1., 3.])
+    series = [rng.normal(size=length) for length in lengths]
+    padded = [np.concatenate([x, np.full(12 - len(x), np.nan)]) for x in series]
+    path = str(tmp_path / 'variable_TRAIN')
+    write_ucr(path, labels, padded, delimiter=' ')
+    return path, labels, series
+
+
+@pytest.mark.parametrize('precision', ['float64', 'float32'])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(fixed, precision, mmap):
+    path, labels, series = fixed
+    for _ in range(2):
+        X, y = dataset.load_ucr(path, precision=precision, mmap=mmap)
+        assert isinstance(X, np.ndarray) and X.shape == series.shape and X.dtype == np.dtype(precision)
+        np.testing.assert_array_equal(X, series.astype(precision))
+        np.testing.assert_array_equal(y, labels)
+        assert os.path.exists(dataset.cache_path(path, np.dtype(precision)))
+
+
+def test_cache_is_used(fixed):
+    """ The second call reads the binary file, without parsing the text again. """
+    path, labels, series = fixed
+    dataset.load_ucr(path)
+    binary = dataset.cache_path(path, np.float64)
+    modified = os.stat(binary).st_mtime_ns
+    X, _ = dataset.load_ucr(path)
+    assert os.stat(binary).st_mtime_ns == modified
+    assert isinstance(X.base, np.memmap) or isinstance(X, np.memmap)
+
+
+def test_variable_lengths(variable):
+    path, labels, series = variable
+    for cache in (True, False):
+        X, y = dataset.load_ucr(path, cache=cache)
+        assert isinstance(X, dataset.SeriesSet)
+        assert len(X) == len(series)
+        np.testing.assert_array_equal(X.lengths(), [len(x) for x in series])
+        np.testing.assert_array_equal(X.offsets, np.cumsum([0] + [len(x) for x in series]))
+        for x, expected in zip(X, series):
+            np.testing.assert_array_equal(x, expected)
+        np.testing.assert_array_equal(y, labels)
+
+
+def test_sort(variable):
+    path, labels, series = variable
+    order = np.argsort(labels, kind='stable')
+    for cache in (True, False):
+        X, y = dataset.load_ucr(path, cache=cache, sort=True)
+        np.testing.assert_array_equal(y, labels[order])
+        for x, i in zip(X, order):
+            np.testing.assert_array_equal(x, series[i])
+
+
+def test_stale_cache(fixed):
+    """ The binary file is written again when the text file changes. """
+    path, labels, series = fixed
+    dataset.load_ucr(path)
+    write_ucr(path, labels[:10], series[:10, :15] + 1)
+    X, y = dataset.load_ucr(path)
+    np.testing.assert_array_equal(X, series[:10, :15] + 1)
+    np.testing.assert_array_equal(y, labels[:10])
+
+
+def test_parse_chunks(variable):
+    """ The file is parsed by chunks, which give the same series as the whole file. """
+    path, labels, series = variable
+    chunks = list(dataset.parse_chunks(path, size=4))
+    assert [len(chunk_labels) for chunk_labels, _, _ in chunks] == [4, 2]
+    np.testing.assert_array_equal(np.concatenate([data for _, data, _ in chunks]), np.concatenate(series))
+    y, data, offsets = dataset.parse_ucr(path, size=4)
+    np.testing.assert_array_equal(data, np.concatenate(series))
+    np.testing.assert_array_equal(np.diff(offsets), [len(x) for x in series])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+""" Accuracy of the float32 DTW kernel w.r.t. the float64 one (see 'dtw.PRECISIONS'). """
+import numpy as np
+import pytest
+
+from ga_segments.segmentsf import dtw
+
+
+# maximum relative error of the float32 distances. It is about 1e-6 on these sets and on 50words
+RTOL = 1e-5
+
+WINDOWS = [
+    (None, 'sakoe_chiba'),
+    (0.1, 'sakoe_chiba'),
+    (10, 'sakoe_chiba'),
+    (0.1, 'itakura'),
+]
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    """ Series to classify and centroids, random walks of length 150. """
+    return random_walks(40, 150, 0), random_walks(6, 150, 1)
+
+
+def relative_error(d32, d64):
+    d32, d64 = np.asarray(d32, dtype=np.float64), np.asarray(d64, dtype=np.float64)
+    return np.max(np.abs(d32 - d64) / d64)
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+def test_distance(series, window, constraint):
+    X, C = series
+    for x in X[:10]:
+        for c in C:
+            d64 = dtw.dtw_distance(x, c, window, constraint)
+            d32 = dtw.dtw_distance(x, c, window, constraint, precision='float32')
+            assert np.isfinite(d64)
+            assert relative_error(d32, d64) < RTOL
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+def test_batch(series, window, constraint):
+    X, C = series
+    for x in X[:10]:
+        total64, D64 = dtw.dtw_batch(x, C, True, window, constraint)
+        total32, D32 = dtw.dtw_batch(x, C, True, window, constraint, precision='float32')
+        assert relative_error(D32, D64) < RTOL
+        assert relative_error(total32, total64) < RTOL
+        assert np.argmin(D32) == np.argmin(D64)
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+def test_cdist(series, window, constraint):
+    X, C = series
+    D64 = dtw.dtw_cdist(X, C, window, constraint)
+    D32 = dtw.dtw_cdist(X, C, window, constraint, precision='float32')
+    assert np.all(np.isfinite(D64))
+    assert relative_error(D32, D64) < RTOL
+    np.testing.assert_array_equal(np.argmin(D32, axis=1), np.argmin(D64, axis=1))
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+def test_cdist_nearest(series, window, constraint):
+    """ The pruned search of the nearest centroid finds the same centroid at both precisions. """
+    X, C = series
+    D64 = dtw.dtw_cdist(X, C, window, constraint)
+    N32 = dtw.dtw_cdist(X, C, window, constraint, nearest=True, precision='float32')
+    rows = np.arange(len(X))
+    np.testing.assert_array_equal(np.argmin(N32, axis=1), np.argmin(D64, axis=1))
+    assert relative_error(N32[rows, np.argmin(N32, axis=1)], np.min(D64, axis=1)) < RTOL
+
+
+def test_cdist_lengths():
+    """ Series of different lengths, without window. """
+    X = [random_walks(1, length, seed)[0] for seed, length in enumerate(range(100, 160, 5))]
+    C = [random_walks(1, length, 100 + seed)[0] for seed, length in enumerate((110, 130, 150))]
+    D64 = dtw.dtw_cdist(X, C)
+    D32 = dtw.dtw_cdist(X, C, precision='float32')
+    assert relative_error(D32, D64) < RTOL
+    np.testing.assert_array_equal(np.argmin(D32, axis=1), np.argmin(D64, axis=1))
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+def test_precision_error(series, window, constraint):
+    X, C = series
+    error, changes = dtw.precision_error(X, C, window, constraint)
+    assert error < RTOL
+    assert changes == 0.
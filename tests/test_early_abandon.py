@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+""" Early abandoning of the evaluation of the offspring (GA_segments(early_abandon=True)). """
+import os
+import random
+
+import numpy as np
+import pytest
+
+from ga_segments.ga import GA_segments
+
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data', '50words_TRAIN')
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return np.loadtxt(DATA, delimiter=',')
+
+
+def evolve(S, seed, **params):
+    """ Runs the GA and returns its hall of fame, its toolbox and the normalized series it evaluated. """
+    random.seed(seed)
+    np.random.seed(seed)
+    ga = GA_segments(**params)
+    captured = {}
+    ag = ga.ag
+
+    def capture(population, Sn, toolbox, **kwargs):
+        captured.update(halloffame=kwargs['halloffame'], toolbox=toolbox, S=Sn)
+        return ag(population, Sn, toolbox, **kwargs)
+
+    ga.ag = capture
+    ga.calculate_centroids(S)
+    return captured['halloffame'], captured['toolbox'], captured['S']
+
+
+@pytest.mark.parametrize('label, seed', [(5, 0), (7, 2)])
+def test_halloffame_is_exact(dataset, label, seed):
+    """ The fitness of the best individual of the hall of fame is its exact fitness, not the bound of an abandoned
+    evaluation. """
+    S = dataset[dataset[:, 0] == label][:, 1:]
+    hof, toolbox, Sn = evolve(S, seed, pop_size=10, ngen=15, mutpb=0.5, early_abandon=True)
+    for ind in hof:
+        assert ind.fitness.values[0] == pytest.approx(toolbox.evaluate(ind, Sn)[0], rel=1e-12)
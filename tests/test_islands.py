@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+""" Island model of the genetic algorithm ('GA_segments_islands'). """
+import numpy as np
+import pytest
+
+from ga_segments.ga_islands import GA_segments_islands
+from ga_segments.nc import NC
+from ga_segments.segmentsf.fitness import fitness_dtw
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    return random_walks(16, 30, 0)
+
+
+def evolve(S, **params):
+    ga = GA_segments_islands(**dict({'n_islands': 3, 'migration_interval': 2, 'migration_size': 1, 'seed': 0,
+                                     'pop_size': 6, 'ngen': 5}, **params))
+    return ga, ga.calculate_centroids(S)
+
+
+@pytest.mark.parametrize('topology, shard', [('ring', False), ('full', False), ('ring', True)])
+def test_reproducible(series, topology, shard):
+    """ With a seed, the islands give the same centroid whatever the order in which they run. """
+    _, (C1, fitness1, log1) = evolve(series, topology=topology, shard=shard)
+    _, (C2, fitness2, log2) = evolve(series, topology=topology, shard=shard)
+    np.testing.assert_array_equal(C1, C2)
+    assert fitness1 == fitness2
+    assert log1.select('min') == log2.select('min')
+
+
+def test_logbook(series):
+    """ The logbook contains the generations of every island, and the centroid is the best of their halls of fame
+    w.r.t. the whole set. """
+    ga, (C, fitness, log) = evolve(series)
+    for i in range(3):
+        assert [record['gen'] for record in log if record['island'] == i] == list(range(6))
+    assert fitness == pytest.approx(fitness_dtw(C, series)[0])
+    assert fitness == pytest.approx(min(fitness_dtw(h, series)[0] for h in ga.halloffame))
+
+
+def test_neighbours():
+    ring = GA_segments_islands(n_islands=4, topology='ring')
+    full = GA_segments_islands(n_islands=4, topology='full')
+    assert [ring.neighbours(i) for i in range(4)] == [[1], [2], [3], [0]]
+    assert full.neighbours(1) == [0, 2, 3]
+    with pytest.raises(Exception, match='topology'):
+        GA_segments_islands(topology='star')
+
+
+def test_nc(series):
+    """ NC trains the classes one after the other with the islands, even with several processes. """
+    X = np.concatenate([series[:8], series[8:] + 5])
+    y = np.repeat([1., 2.], 8)
+    params = {'n_islands': 2, 'migration_interval': 2, 'seed': 0, 'pop_size': 6, 'ngen': 3}
+    centroids = []
+    for n_jobs in (1, 2):
+        nc = NC(ga='islands', params_ga=params, n_jobs=n_jobs, seed=0)
+        nc.fit(X, y)
+        centroids.append(nc.centroids)
+    for c1, c2 in zip(*centroids):
+        np.testing.assert_array_equal(c1, c2)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+""" Refinement of the best individuals with DTW Barycenter Averaging (GA_segments(memetic=True), see 'dba'). """
+import random
+
+import numpy as np
+import pytest
+
+from ga_segments.ga import GA_segments, create_types
+from ga_segments.segmentsf import dba
+from ga_segments.segmentsf.fitness import fitness_dtw
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    return random_walks(12, 30, 0)
+
+
+@pytest.mark.parametrize('window, constraint', [(None, 'sakoe_chiba'), (3, 'sakoe_chiba')])
+def test_dba_improves(series, window, constraint):
+    """ An iteration of DBA never increases the sum of the squared DTW distances, and the individual is not
+    modified. """
+    create_types()
+    individual = np.array(series[0])
+    refined = dba.refine(individual, series, n_iter=1, window=window, constraint=constraint)
+    np.testing.assert_array_equal(individual, series[0])
+    assert not refined.fitness.valid
+    before = fitness_dtw(individual, series, window=window, constraint=constraint)[0]
+    after = fitness_dtw(refined, series, window=window, constraint=constraint)[0]
+    assert after <= before * (1 + 1e-12)
+
+
+def test_memetic_step(series, monkeypatch):
+    """ The refinement runs every 'interval' generations and the fitness of the population never gets worse. """
+    steps = []
+    original = GA_segments.refine
+
+    def refine(self, population, *args):
+        before = sorted(ind.fitness.values[0] for ind in population)
+        refined = original(self, population, *args)
+        steps.append((before, sorted(ind.fitness.values[0] for ind in population), refined))
+        return refined
+
+    monkeypatch.setattr(GA_segments, 'refine', refine)
+    random.seed(0)
+    np.random.seed(0)
+    ga = GA_segments(pop_size=6, ngen=9, memetic=True, memetic_params={'interval': 3, 'k': 2, 'n_iter': 1})
+    C, fitness, log = ga.calculate_centroids(series)
+
+    assert len(steps) == 3
+    assert [record['refined'] for record in log if record['gen'] % 3 == 0 and record['gen'] > 0] == \
+        [refined for _, _, refined in steps]
+    assert all(record['refined'] == 0 for record in log if record['gen'] % 3 != 0)
+    assert sum(refined for _, _, refined in steps) > 0
+    for before, after, refined in steps:
+        assert 0 <= refined <= 2
+        assert all(a <= b for a, b in zip(after, before))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+""" Multiscale (coarse-to-fine) evolution of GA_segments (multiscale=True). """
+import random
+
+import numpy as np
+
+from ga_segments.ga import GA_segments
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+def test_levels():
+    ga = GA_segments(ngen=20, multiscale=True)
+    assert ga.multiscale_levels(128) == [(32, 8), (64, 7), (128, 5)]
+    # the levels shorter than min_length are skipped
+    assert ga.multiscale_levels(40) == [(20, 15), (40, 5)]
+    assert ga.multiscale_levels(16) == [(16, 20)]
+
+
+def test_evolution():
+    """ The generations of every level are in the logbook, from the coarsest, and the coarse ones are cheaper. """
+    S = random_walks(10, 64, 0)
+    random.seed(0)
+    np.random.seed(0)
+    events = []
+    ga = GA_segments(pop_size=6, ngen=8, multiscale=True, observers=[events.append])
+    C, fitness, log = ga.calculate_centroids(S)
+
+    levels = ga.multiscale_levels(64)
+    assert len(C) == 64
+    assert [length for length, _ in levels] == [16, 32, 64]
+    assert sorted(set(log.select('length'))) == [16, 32, 64]
+    assert log.select('length') == sorted(log.select('length'))
+    assert log[-1]['gen'] == ga.ngen
+    for length, ngen in levels:
+        # the generation 0 of each level evaluates its initial population
+        assert log.select('length').count(length) == ngen + 1
+
+    cells = {}
+    for event, record in zip(events, log):
+        cells.setdefault(record['length'], []).append(event['dtw_cells'] / max(event['dtw_calls'], 1))
+    assert np.mean(cells[16]) < np.mean(cells[32]) < np.mean(cells[64])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+""" Training of the centroids of the classes of NC in parallel processes (NC(n_jobs > 1)). """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+from ga_segments.segmentsf import dtw
+
+
+PARAMS_GA = {'pop_size': 6, 'ngen': 3}
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def data():
+    """ Classes of different sizes, so the jobs finish in a different order than they are started. """
+    sizes = [3, 9, 5, 7]
+    X = np.concatenate([random_walks(n, 30, c) + 3 * c for c, n in enumerate(sizes)])
+    y = np.repeat(np.arange(len(sizes), dtype=np.float64), sizes)
+    return X, y
+
+
+def fit(X, y, **params):
+    nc = NC(params_ga=PARAMS_GA, seed=0, **params)
+    nc.fit(X, y)
+    return nc
+
+
+def assert_same_model(nc1, nc2):
+    np.testing.assert_array_equal(nc1.classes, nc2.classes)
+    for c1, c2 in zip(nc1.centroids, nc2.centroids):
+        np.testing.assert_array_equal(c1, c2)
+    assert nc1.inertias == nc2.inertias
+    assert nc1.inertia == nc2.inertia
+
+
+@pytest.mark.parametrize('n_jobs', [2, 3])
+def test_same_result(data, n_jobs):
+    """ With a seed, the centroids do not depend on the number of processes nor on the order in which the classes
+    finish. """
+    X, y = data
+    nc1 = fit(X, y, n_jobs=1)
+    nc2 = fit(X, y, n_jobs=n_jobs)
+    assert_same_model(nc1, nc2)
+    np.testing.assert_array_equal(nc1.predict(X), nc2.predict(X))
+
+
+def test_order_of_the_series(data):
+    """ The series of each class are the same whether the classes are contiguous or interleaved. """
+    X, y = data
+    # the series are taken in turns from each class, keeping their order within the class
+    rank = np.concatenate([np.arange(np.sum(y == c)) for c in np.unique(y)])
+    order = np.argsort(rank, kind='stable')
+    assert np.any(np.diff(y[order]) < 0)
+    assert_same_model(fit(X, y, n_jobs=2), fit(X[order], y[order], n_jobs=2))
+
+
+def test_workers_are_counted(data):
+    """ The DTW distances of the processes are added to the counters of the main process. """
+    X, y = data
+    calls = dtw.counters['calls']
+    fit(X, y, n_jobs=1)
+    serial = dtw.counters['calls'] - calls
+    calls = dtw.counters['calls']
+    fit(X, y, n_jobs=2)
+    assert dtw.counters['calls'] - calls == serial
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+""" The pruned search of the nearest centroid of NC ('search.CentroidSearch' and 'dtw.dtw_cdist') gives the same classes
+as the exhaustive search. """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+from ga_segments.segmentsf import dtw
+from ga_segments.segmentsf.dataset import SeriesSet
+
+
+DISTANCES = [
+    ('dtw', None),
+    ('sakoe_chiba', 0.1),
+    ('sakoe_chiba', 5),
+    ('itakura', 0.2),
+]
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+def exhaustive(nc, X):
+    """ Classes of the nearest centroid of each series of X, calculating every distance. """
+    window, constraint = (None, 'sakoe_chiba') if nc.distance == 'dtw' else (nc.window, nc.distance)
+    D = np.array([[dtw.dtw_distance(x, c, window, constraint) for c in nc.centroids] for x in X])
+    return nc.classes[np.argmin(D, axis=1)]
+
+
+@pytest.fixture(scope='module')
+def train():
+    X = np.concatenate([random_walks(6, 50, seed) + 3 * seed for seed in range(4)])
+    return X, np.repeat([1., 2., 3., 4.], 6)
+
+
+@pytest.mark.parametrize('distance, window', DISTANCES)
+def test_predict_is_exhaustive(train, distance, window):
+    nc = NC(params_ga={'pop_size': 6, 'ngen': 2}, distance=distance, window=window, seed=0)
+    nc.fit(*train)
+    X = random_walks(60, 50, 10) + np.repeat(np.arange(4) * 3, 15)[:, None]
+    np.testing.assert_array_equal(nc.predict(X), exhaustive(nc, X))
+
+
+@pytest.mark.parametrize('distance, window', DISTANCES)
+def test_predict_lengths_is_exhaustive(train, distance, window):
+    """ Queries of lengths different from the one of the centroids, whose envelopes are calculated on demand. """
+    nc = NC(params_ga={'pop_size': 6, 'ngen': 2}, distance=distance, window=window, seed=0)
+    nc.fit(*train)
+    series = [random_walks(1, length, seed)[0] + 3 * (seed % 4) for seed, length in enumerate(range(40, 61))]
+    X = SeriesSet(np.concatenate(series), np.cumsum([0] + [len(x) for x in series]))
+    np.testing.assert_array_equal(nc.predict(X), exhaustive(nc, X))
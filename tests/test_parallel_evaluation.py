@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+""" Evaluation of the population of GA_segments in a pool of processes (multi_jobs=True, see 'evaluation'). """
+import multiprocessing
+import random
+
+import numpy as np
+import pytest
+
+from ga_segments.ga import GA_segments
+from ga_segments.segmentsf import dtw
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    return random_walks(20, 40, 0)
+
+
+def centroid(S, seed=0, **params):
+    random.seed(seed)
+    np.random.seed(seed)
+    ga = GA_segments(pop_size=10, ngen=5, **params)
+    C, fitness, log = ga.calculate_centroids(S)
+    return C, fitness, log
+
+
+@pytest.mark.parametrize('params', [{}, {'batch_evaluate': True, 'batch_size': 0.3}, {'early_abandon': True}])
+def test_same_result(series, params):
+    """ The pool only changes where the individuals are evaluated, so the evolution is the same. """
+    C1, fitness1, log1 = centroid(series, **params)
+    C2, fitness2, log2 = centroid(series, multi_jobs=True, n_jobs=2, **params)
+    np.testing.assert_array_equal(C1, C2)
+    assert fitness1 == fitness2
+    assert log1.select('min') == log2.select('min')
+    assert log1.select('nevals') == log2.select('nevals')
+
+
+def test_workers_are_counted(series):
+    """ The DTW distances of the workers are added to the counters of the main process. """
+    calls = dtw.counters['calls']
+    centroid(series)
+    serial = dtw.counters['calls'] - calls
+    calls = dtw.counters['calls']
+    centroid(series, multi_jobs=True, n_jobs=2)
+    assert dtw.counters['calls'] - calls == serial
+
+
+def test_pool_is_closed(series):
+    """ The workers end with the evolution, also when it fails. """
+    centroid(series, multi_jobs=True, n_jobs=2)
+    assert not multiprocessing.active_children()
+
+    def fail(event):
+        raise RuntimeError('observer')
+
+    with pytest.raises(RuntimeError):
+        centroid(series, multi_jobs=True, n_jobs=2, observers=[fail])
+    assert not multiprocessing.active_children()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+""" Warm update of the centroids of NC with new series ('NC.partial_fit'). """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+
+
+WARM_NGEN = 2
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+def model(events=None):
+    params_ga = {'pop_size': 6, 'ngen': 4, 'warm_params': {'ngen': WARM_NGEN, 'old_size': 1.}}
+    if events is not None:
+        params_ga['observers'] = [events.append]
+    return NC(params_ga=params_ga, seed=0)
+
+
+@pytest.fixture(scope='module')
+def data():
+    X = np.concatenate([random_walks(6, 30, c) + 4 * c for c in range(3)])
+    X_new = np.concatenate([random_walks(3, 30, 10) + 4, random_walks(3, 30, 11) + 12])
+    return X, np.repeat([0., 1., 2.], 6), X_new, np.array([1., 1., 1., 3., 3., 3.])
+
+
+def test_update(data):
+    """ Only the classes with new series change: the known ones evolve during warm_params['ngen'] generations from
+    their hall of fame, and the new ones are calculated from scratch. """
+    X, y, X_new, y_new = data
+    events = []
+    nc = model(events)
+    nc.fit(X, y)
+    centroids = list(nc.centroids)
+    del events[:]
+
+    nc.partial_fit(X_new, y_new)
+    np.testing.assert_array_equal(nc.classes, [0., 1., 2., 3.])
+    assert nc.centroids[0] is centroids[0] and nc.centroids[2] is centroids[2]
+    assert not np.array_equal(nc.centroids[1], centroids[1])
+    assert [len(S) for S in nc.series] == [6, 9, 6, 3]
+    # generations of the warm start of the class 1 (with the generation 0) and of the class 3 from scratch
+    assert len(events) == (WARM_NGEN + 1) + (4 + 1)
+    assert nc.inertia == pytest.approx(sum(nc.inertias))
+
+
+def test_reproducible(data):
+    X, y, X_new, y_new = data
+    models = []
+    for _ in range(2):
+        nc = model()
+        nc.fit(X, y)
+        nc.partial_fit(X_new, y_new)
+        models.append(nc)
+    for c1, c2 in zip(models[0].centroids, models[1].centroids):
+        np.testing.assert_array_equal(c1, c2)
+
+
+def test_not_fitted(data):
+    """ A classifier that has not been fitted is fitted with the series. """
+    X, y, _, _ = data
+    nc1, nc2 = model(), model()
+    nc1.partial_fit(X, y)
+    nc2.fit(X, y)
+    for c1, c2 in zip(nc1.centroids, nc2.centroids):
+        np.testing.assert_array_equal(c1, c2)
+
+
+def test_loaded_model(data, tmp_path):
+    """ A classifier created by 'load' cannot be updated. """
+    X, y, X_new, y_new = data
+    nc = model()
+    nc.fit(X, y)
+    path = str(tmp_path / 'model.bin')
+    nc.save(path)
+    with pytest.raises(Exception, match='training state'):
+        NC.load(path).partial_fit(X_new, y_new)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+""" Lower bounds of the DTW distance used to prune the search of the nearest centroid ('search'). """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+from ga_segments.segmentsf import dtw
+from ga_segments.segmentsf.search import CentroidSearch
+
+
+WINDOWS = [
+    (None, 'sakoe_chiba'),
+    (0.1, 'sakoe_chiba'),
+    (3, 'sakoe_chiba'),
+    (0.2, 'itakura'),
+]
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.mark.parametrize('window, constraint', WINDOWS)
+@pytest.mark.parametrize('length', [30, 40, 50])
+def test_bounds(window, constraint, length):
+    """ LB_Kim and LB_Keogh never exceed the DTW distance, also for queries of other lengths than the centroids. """
+    C = random_walks(8, 40, 0)
+    X = random_walks(30, length, 1)
+    bounds = CentroidSearch(C, window, constraint).bounds(X)
+    D = np.array([[dtw.dtw_distance(x, c, window, constraint) for c in C] for x in X])
+    assert np.all(bounds <= D)
+    # the bounds prune: most of them are not trivial
+    assert np.mean(bounds > 0) > 0.5
+
+
+@pytest.mark.parametrize('distance, window', [('dtw', None), ('sakoe_chiba', 0.1), ('itakura', 0.2)])
+def test_pretrained_predict(distance, window):
+    """ The pruned search gives the index of the nearest centroid of the exhaustive search, ties included. """
+    C = random_walks(10, 40, 2)
+    C = np.concatenate([C, C[:2]])
+    X = np.concatenate([random_walks(40, 40, 3), C[:3]])
+    nc = NC(distance=distance, window=window)
+    constraint = 'sakoe_chiba' if distance == 'dtw' else distance
+    D = np.array([[dtw.dtw_distance(x, c, nc.window, constraint) for c in C] for x in X])
+    np.testing.assert_array_equal(nc.pretrained_predict(C, X), np.argmin(D, axis=1))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+""" Criteria that stop the evolution of GA_segments before ngen generations (stop_params). """
+import random
+import time
+
+import numpy as np
+import pytest
+
+from ga_segments.ga import GA_segments
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def series():
+    return random_walks(10, 30, 0)
+
+
+def evolve(S, ngen, **stop_params):
+    random.seed(0)
+    np.random.seed(0)
+    ga = GA_segments(pop_size=6, ngen=ngen, stop_params=stop_params)
+    start = time.time()
+    C, fitness, log = ga.calculate_centroids(S)
+    return ga, log, time.time() - start
+
+
+def test_no_criteria(series):
+    ga, log, _ = evolve(series, 5)
+    assert ga.stop_reason is None
+    assert log[-1]['gen'] == 5
+
+
+def test_time(series):
+    ga, log, elapsed = evolve(series, 100000, time=0.3)
+    assert ga.stop_reason == 'time'
+    assert log[-1]['gen'] < 100000
+    assert elapsed < 0.3 + 1.
+
+
+def test_stall(series):
+    """ An improvement must be greater than tol (100 %, so there is none): the evolution stops after stall
+    generations. """
+    ga, log, _ = evolve(series, 50, stall=3, tol=1.)
+    assert ga.stop_reason == 'stall'
+    assert log.select('gen') == [0, 1, 2, 3]
+
+
+def test_target(series):
+    """ The evolution stops as soon as the best fitness reaches the target. """
+    ga, log, _ = evolve(series, 50)
+    target = log[3]['min']
+    ga, log, _ = evolve(series, 50, target=target)
+    assert ga.stop_reason == 'target'
+    assert log[-1]['min'] <= target
+    assert all(record['min'] > target for record in log[:-1])
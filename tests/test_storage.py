@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+""" Binary files of the models of NC ('NC.save', 'NC.load' and 'storage'). """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+from ga_segments.segmentsf import storage
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def data():
+    X = np.concatenate([random_walks(8, 40, seed) + 4 * seed for seed in range(3)])
+    X_test = random_walks(30, 40, 10) + np.repeat(np.arange(3) * 4, 10)[:, None]
+    return X, np.repeat([1., 2., 3.], 8), X_test
+
+
+@pytest.mark.parametrize('distance, window', [('dtw', None), ('sakoe_chiba', 0.1)])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load(data, tmp_path, distance, window, mmap):
+    X, y, X_test = data
+    nc = NC(params_ga={'pop_size': 6, 'ngen': 2}, distance=distance, window=window, seed=0)
+    nc.fit(X, y)
+    path = str(tmp_path / 'model.bin')
+    nc.save(path)
+
+    loaded = NC.load(path, mmap=mmap)
+    np.testing.assert_array_equal(loaded.predict(X_test), nc.predict(X_test))
+    np.testing.assert_array_equal(loaded.classes, nc.classes)
+    for c, expected in zip(loaded.centroids, nc.centroids):
+        np.testing.assert_array_equal(c, expected)
+    assert loaded.inertia == nc.inertia
+
+
+def test_string_classes(data, tmp_path):
+    X, y, X_test = data
+    labels = np.array(['a', 'b', 'c'])[y.astype(int) - 1]
+    nc = NC(params_ga={'pop_size': 6, 'ngen': 2}, seed=0)
+    nc.fit(X, labels)
+    path = str(tmp_path / 'model.bin')
+    nc.save(path)
+    loaded = NC.load(path)
+    np.testing.assert_array_equal(loaded.classes, nc.classes)
+    np.testing.assert_array_equal(next(loaded.predict_stream([X_test]))[0], next(nc.predict_stream([X_test]))[0])
+
+
+def test_arrays(tmp_path):
+    """ The arrays keep their type and shape, and those of other types are stored as float64. """
+    path = str(tmp_path / 'arrays.bin')
+    arrays = {'f8': np.arange(6.).reshape(2, 3), 'f4': np.arange(5, dtype=np.float32), 'i8': np.arange(3),
+              'i4': np.arange(7, dtype=np.int32), 'u1': np.arange(3, dtype=np.uint8), 'empty': np.empty(0)}
+    storage.save_arrays(path, arrays, {'name': 'test'})
+    for mmap in (True, False):
+        loaded, meta = storage.load_arrays(path, mmap=mmap)
+        assert meta == {'name': 'test'}
+        for name, a in arrays.items():
+            expected = a if name != 'u1' else a.astype(np.float64)
+            assert loaded[name].dtype == expected.dtype
+            np.testing.assert_array_equal(loaded[name], expected)
+
+
+def test_bad_magic(tmp_path):
+    path = str(tmp_path / 'model.bin')
+    storage.save_arrays(path, {'a': np.arange(3.)})
+    with open(path, 'r+b') as f:
+        f.write(b'NOTAMODL')
+    with pytest.raises(Exception, match='not a model file'):
+        storage.load_arrays(path)
+
+
+def test_newer_version(tmp_path):
+    path = str(tmp_path / 'model.bin')
+    storage.save_arrays(path, {'a': np.arange(3.)})
+    with open(path, 'r+b') as f:
+        magic, version, size = storage.PREFIX.unpack(f.read(storage.PREFIX.size))
+        f.seek(0)
+        f.write(storage.PREFIX.pack(magic, storage.VERSION + 1, size))
+    with pytest.raises(Exception, match='Version {} '.format(storage.VERSION + 1)):
+        storage.load_arrays(path)
+    with pytest.raises(Exception, match='Version'):
+        NC.load(path)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+""" Classification of a set of series by chunks ('NC.predict_stream' and the iterators of 'stream'). """
+import numpy as np
+import pytest
+
+from ga_segments.nc import NC
+from ga_segments.segmentsf import stream
+from ga_segments.segmentsf.dataset import SeriesSet
+
+
+def random_walks(n, length, seed):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.normal(size=(n, length)), axis=1)
+
+
+@pytest.fixture(scope='module')
+def model():
+    X = np.concatenate([random_walks(8, 40, 0), random_walks(8, 40, 1) + 5])
+    y = np.repeat([1., 2.], 8)
+    nc = NC(params_ga={'pop_size': 6, 'ngen': 2}, seed=0)
+    nc.fit(X, y)
+    return nc
+
+
+@pytest.fixture(scope='module')
+def ragged():
+    """ Series of different lengths, stored in a 'SeriesSet'. """
+    series = [random_walks(1, length, seed)[0] + 5 * (seed % 2) for seed, length in enumerate(range(30, 52, 2))]
+    offsets = np.cumsum([0] + [len(x) for x in series])
+    return SeriesSet(np.concatenate(series), offsets)
+
+
+def classes(results):
+    return np.concatenate([labels for labels, _ in results])
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_ragged_chunks(model, ragged, n_jobs):
+    """ The chunks of a 'SeriesSet' are classified as the whole set, also by the pool. """
+    expected = model.predict(ragged)
+    np.testing.assert_array_equal(classes(model.predict_stream(stream.chunks(ragged, 4), n_jobs=n_jobs)), expected)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_fuzzy_chunks(model, ragged, n_jobs):
+    expected = model.fuzzy_predict(ragged)
+    results = list(model.predict_stream(stream.chunks(ragged, 3), fuzzy=True, n_jobs=n_jobs))
+    np.testing.assert_allclose(np.concatenate([beliefs for _, beliefs in results]), expected)
+
+
+def test_read_chunks(model, ragged, tmp_path):
+    """ The chunks of a file with series of different lengths, padded with NaN, are the series of the file. """
+    path = str(tmp_path / 'ragged_TEST')
+    width = max(ragged.lengths())
+    with open(path, 'w') as f:
+        for i, x in enumerate(ragged):
+            padded = np.concatenate([x, np.full(width - len(x), np.nan)])
+            f.write(','.join([str(i % 2 + 1)] + [repr(float(v)) for v in padded]) + '\n')
+
+    chunks = list(stream.read_chunks(path, size=4))
+    assert [len(labels) for labels, _ in chunks] == [4, 4, 3]
+    series = [x for _, X in chunks for x in X]
+    for x, expected in zip(series, ragged):
+        np.testing.assert_array_equal(x, expected)
+    predicted = classes(model.predict_stream((X for _, X in stream.read_chunks(path, size=4)), n_jobs=2))
+    np.testing.assert_array_equal(predicted, model.predict(ragged))